@@ -1,25 +1,29 @@
-import openai
 import os
+import sys
 from typing import Dict, Union
-import tiktoken
-import signal
-import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "functions"))
+from common.async_runtime import run_on_loop
+from common.llm_clients import get_async_openai_client, get_openai_client
+from common.retry import RetryEngine
+from common.tokens import count_message_tokens, count_tokens
 
 key = os.getenv("OPEN_API_KEY", "")
-client = openai.OpenAI(api_key=key) 
+client = get_openai_client(key)
+# The engine owns retries, so the SDK's built-in ones are turned off
+retry_client = client.with_options(max_retries=0)
+engine = RetryEngine(deadline=float(os.getenv("OPENAI_REQUEST_DEADLINE", 100)))
 
 def num_tokens_from_messages(message, model="gpt-3.5-turbo-0301"):
-    """Returns the number of tokens used by a list of messages."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
+    """
+    Returns the number of tokens used by a string or a list of chat messages.
+
+    For a list, every message is counted along with the per-message and
+    reply-priming overhead the chat API adds.
+    """
     if isinstance(message, list):
-        # use last message.
-        num_tokens = len(encoding.encode(message[0]["content"]))
-    else:
-        num_tokens = len(encoding.encode(message))
-    return num_tokens
+        return count_message_tokens(message, model)
+    return count_tokens(message, model)
 
 def create_chatgpt_config(
     message: Union[str, list],
@@ -50,33 +54,35 @@ def create_chatgpt_config(
         }
     return config
 
-def request_chatgpt_engine(config):
-    ret = None
-    while ret is None:
-        try:
-            signal.signal(signal.SIGALRM, handler)
-            signal.alarm(100)
-            ret = client.chat.completions.create(**config)
-            signal.alarm(0)
-        except openai._exceptions.BadRequestError as e:
-            print(e)
-            signal.alarm(0)
-        except openai._exceptions.RateLimitError as e:
-            print("Rate limit exceeded. Waiting...")
-            print(e)
-            signal.alarm(0)
-            time.sleep(5)
-        except openai._exceptions.APIConnectionError as e:
-            print("API connection error. Waiting...")
-            signal.alarm(0)
-            time.sleep(5)
-        except Exception as e:
-            print("Unknown error. Waiting...")
-            print(e)
-            signal.alarm(0)
-            time.sleep(1)
-    return ret
+def request_chatgpt_engine(config, deadline=None):
+    """
+    Send a chat completion request, retrying transient failures.
+
+    Rate limits, timeouts, connection errors and 5xx responses are retried with
+    jittered exponential backoff (honoring Retry-After) until `deadline`
+    seconds have passed; other errors such as BadRequestError are raised at once.
+    Safe to call from any thread.
+    """
+    return engine.call(
+        lambda timeout: retry_client.chat.completions.create(**config, timeout=timeout),
+        deadline,
+    )
+
+async def arequest_chatgpt_engine(config, deadline=None):
+    """
+    Async version of `request_chatgpt_engine`, callable from any event loop.
+
+    The pooled AsyncOpenAI client's connections belong to the instance's
+    background loop, so the request and its retries run there.
+    """
+    async def _request():
+        aclient = get_async_openai_client(key).with_options(max_retries=0)
+        return await engine.acall(
+            lambda timeout: aclient.chat.completions.create(**config, timeout=timeout),
+            deadline,
+        )
 
+    return await run_on_loop(_request())
 
 if __name__ == "__main__":
     print(num_tokens_from_messages("Hello, how are you?"))
@@ -90,4 +96,5 @@ if __name__ == "__main__":
     )
     ret = request_chatgpt_engine(cfg)
     print(ret)
+    print(engine.report())
 
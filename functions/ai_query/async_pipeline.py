@@ -0,0 +1,148 @@
+"""
+Async retrieval and generation for the chat endpoint.
+
+Same results as neo4j_graphrag_retriever, but every network call is awaited
+on the instance's background loop (common/async_runtime.py):
+- The Neo4j query goes through the async driver.
+- Embeddings go through the pooled AsyncOpenAI client behind the shared
+  embedding cache.
+- Completions also use the pooled AsyncOpenAI client.
+
+Because nothing blocks a thread, independent steps can be overlapped with
+`asyncio.gather` and many requests can be in flight on one instance.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from ai_query.neo4j_graphrag_retriever import (
+    RETRIEVAL_QUERY,
+    build_prompt,
+    cfg,
+    pack_prompt_context,
+    record_to_result,
+    registry,
+)
+from common.async_neo4j import get_async_registry
+from common.embedding_cache import CachedEmbedder
+from common.llm_clients import CHAT_TIMEOUT, PooledOpenAIEmbeddings, call_timeout, get_async_openai_client
+from common.neo4j_registry import RECONNECT_ERRORS
+from common.rate_limiter import INTERACTIVE, get_rate_limiter
+from common.vector_index import get_vector_index
+
+INDEX_NAME = "advice_embedding"
+
+# The vector search VectorCypherRetriever runs before the retrieval query
+ASYNC_RETRIEVAL_QUERY = """
+        CALL db.index.vector.queryNodes($vector_index_name, $top_k, $query_vector)
+        YIELD node, score
+""" + RETRIEVAL_QUERY
+
+
+# Shares the process-wide embedding cache with the synchronous retrievers
+async_embedder = CachedEmbedder(
+    PooledOpenAIEmbeddings(model=cfg.embedding_model_name, api_key=cfg.openai_api_key),
+    model_name=cfg.embedding_model_name,
+)
+
+
+async def aretrieve_from_knowledge_graph(
+    query: str,
+    limit: int = 5,
+    query_vector: Optional[List[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Async version of `retrieve_from_knowledge_graph`.
+
+    Args:
+        query (str): The user's query
+        limit (int): Maximum number of results to return
+        query_vector (List[float], optional): Embedding of `query`, if the caller already has it
+
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries containing the retrieved information
+    """
+    start_time = time.perf_counter()
+    if cfg.retrieval_backend == "memory":
+        vector = query_vector or await async_embedder.async_embed_query(query)
+        # get_vector_index reads the KG version through the sync driver (and loads
+        # every Advice on first use), so it runs on a worker thread, not the loop
+        return await asyncio.to_thread(lambda: get_vector_index(registry).search(vector, top_k=limit))
+
+    async_registry = get_async_registry(cfg)
+    try:
+        if query_vector is None:
+            # Embed while the (memoized) index check is in flight
+            query_vector, exists = await asyncio.gather(
+                async_embedder.async_embed_query(query),
+                async_registry.index_exists(INDEX_NAME),
+            )
+        else:
+            exists = await async_registry.index_exists(INDEX_NAME)
+        if not exists:
+            logging.error(f"Vector index '{INDEX_NAME}' does not exist")
+            return []
+
+        records = await async_registry.query(
+            ASYNC_RETRIEVAL_QUERY,
+            {"vector_index_name": INDEX_NAME, "top_k": limit, "query_vector": query_vector},
+        )
+    except RECONNECT_ERRORS as e:
+        if not os.getenv("KG_SNAPSHOT_PATH"):
+            raise
+        logging.warning(f"Neo4j unreachable ({e}); answering from the KG snapshot")
+        # The embedding finished (and was cached) even if the index check failed first
+        vector = query_vector or await async_embedder.async_embed_query(query)
+        return await asyncio.to_thread(lambda: get_vector_index(registry).search(vector, top_k=limit))
+    result_list = [record_to_result(record) for record in records]
+    logging.info(f"Retrieved {len(result_list)} results in {time.perf_counter() - start_time:.3f}s (async)")
+    return result_list
+
+
+async def agenerate_response_with_openai(query: str, context: str, history: str = "") -> str:
+    """
+    Async version of `generate_response_with_openai`.
+
+    Args:
+        query (str): The user's query
+        context (str): The context from the knowledge graph
+        history (str): Transcript of the earlier conversation, if any
+
+    Returns:
+        str: The generated response
+    """
+    response = await get_rate_limiter().achat_completion(
+        get_async_openai_client(cfg.openai_api_key),
+        INTERACTIVE,
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": build_prompt(query, context, history)}
+        ],
+        temperature=0.7,
+        max_tokens=1000,
+        timeout=call_timeout(CHAT_TIMEOUT)
+    )
+    return response.choices[0].message.content
+
+
+async def arun_retrieval_and_generate(
+    query: str,
+    query_vector: Optional[List[float]] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+) -> str:
+    """
+    Async version of `run_retrieval_and_generate`.
+
+    Args:
+        query (str): The user's query
+        query_vector (List[float], optional): Embedding of `query`, if the caller already has it
+        history (List[Dict[str, str]], optional): Earlier turns (role, content), oldest first
+
+    Returns:
+        str: The generated response
+    """
+    results = await aretrieve_from_knowledge_graph(query, query_vector=query_vector)
+    context, transcript = pack_prompt_context(results, history)
+    return await agenerate_response_with_openai(query, context, transcript)
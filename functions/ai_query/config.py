@@ -23,6 +23,18 @@ class Config:
         self.openai_embedding_version = "2023-05-15"
         self.embedding_model_name = "text-embedding-ada-002"
         self.model_name = "gpt-4o-mini"
+        # "neo4j" queries the Neo4j vector index; "memory" ranks an in-process copy of the embeddings
+        self.retrieval_backend = os.getenv('RETRIEVAL_BACKEND', 'neo4j')
+        # Stream chat replies into Firestore as they are generated, flushing at most once per interval
+        self.chat_streaming = os.getenv('CHAT_STREAMING', '0') == '1'
+        self.stream_flush_interval = float(os.getenv('STREAM_FLUSH_INTERVAL', 1.0))
+        # Serve get_chat through the async pipeline on the instance's background event loop
+        self.async_pipeline = os.getenv('ASYNC_PIPELINE', '0') == '1'
+        # Tokens of chat history plus retrieved passages allowed in a prompt, and history's share of them
+        self.context_token_budget = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000))
+        self.history_token_share = float(os.getenv('HISTORY_TOKEN_SHARE', 0.35))
+        # Word-shingle Jaccard similarity at which a retrieved passage counts as a near-duplicate
+        self.passage_dedup_threshold = float(os.getenv('PASSAGE_DEDUP_THRESHOLD', 0.8))
 
         assert self.URI, "NEO4J_URI is not set"
         assert self.AUTH[1], "NEO4J_PASSWORD is not set"
@@ -2,31 +2,64 @@ import os
 import sys
 import logging
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Import Neo4j and OpenAI dependencies
-import neo4j
-from openai import OpenAI
-
 # Import the Config class from the parent directory
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from ai_query.config import Config
-
-# Import the retriever and embeddings classes
-from neo4j_graphrag.retrievers import VectorCypherRetriever
-from neo4j_graphrag.embeddings import OpenAIEmbeddings
+from common.context_packer import ContextPacker
+from common.passage_selection import PassageSelector
+from common.llm_clients import CHAT_TIMEOUT, PooledOpenAIEmbeddings, call_timeout, connection_report, get_openai_client
+from common.neo4j_registry import RECONNECT_ERRORS, get_registry
+from common.rate_limiter import INTERACTIVE, get_rate_limiter
+from common.embedding_cache import CachedEmbedder
+from common.retrieval_queries import VECTOR_ANCHOR, advice_details_query
+from common.vector_index import get_vector_index
 
 # Configuration
 cfg = Config()
 
-def index_exists(driver, index_name: str) -> bool:
-    """Check if a vector index exists in the Neo4j database."""
-    with driver.session() as session:
-        result = session.run(f"SHOW INDEXES YIELD name RETURN name")
-        return any(row["name"] == index_name for row in result)
+# Shared across warm invocations; the registry owns the pooled driver
+registry = get_registry(cfg)
+# Query embeddings go through the shared (model, normalized query) cache
+embedder = CachedEmbedder(
+    PooledOpenAIEmbeddings(model=cfg.embedding_model_name, api_key=cfg.openai_api_key),
+    model_name=cfg.embedding_model_name,
+)
+# Bounds the passages and chat history that go into each prompt; passages are
+# score-ordered and near-duplicates dropped before packing
+context_packer = ContextPacker(cfg.context_token_budget, history_share=cfg.history_token_share)
+passage_selector = PassageSelector(context_packer, text_threshold=cfg.passage_dedup_threshold)
+
+# Appended after the vector search. It is a fixed string with the result count
+# passed as $top_k, so Neo4j plans it once and reuses the plan for every query.
+RETRIEVAL_QUERY = VECTOR_ANCHOR + advice_details_query()
+
+def record_to_result(record) -> Dict[str, Any]:
+    """Convert a retrieval query record into the result dictionary the prompts use."""
+    return {
+        'id': record.get('id', 'Unknown'),
+        'text': record.get('text', ''),
+        'topics': record.get('topics', []),
+        'subtopics': record.get('subtopics', []),
+        'age_groups': record.get('age_groups', []),
+        'guidance_styles': record.get('guidance_styles', []),
+        'actionable_advice': record.get('actionable_advice', []),
+        'scenario_notes': record.get('scenario_notes', []),
+        'authors': record.get('authors', []),
+        'score': record.get('score', 0)
+    }
+
+def search_in_memory(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Rank against the in-process copy of the Advice embeddings; no Neo4j round trip."""
+    start_time = time.perf_counter()
+    result_list = get_vector_index(registry).search(embedder.embed_query(query), top_k=limit)
+    logging.info(f"Retrieved {len(result_list)} results from in-memory index in {time.perf_counter() - start_time:.3f}s")
+    logging.info(f"Embedding cache stats: {embedder.cache.report()}")
+    return result_list
 
 def retrieve_from_knowledge_graph(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     """
@@ -41,121 +74,49 @@ def retrieve_from_knowledge_graph(query: str, limit: int = 5) -> List[Dict[str,
     """
     logging.info(f"Retrieving from knowledge graph for query: {query}")
 
-    # Connect to Neo4j
-    with neo4j.GraphDatabase.driver(cfg.URI, auth=cfg.AUTH) as driver:
-        # Initialize the embeddings model
-        # TODO: Add the OpenAI key here
-        embedder = OpenAIEmbeddings(api_key="")
-        
-        # Check if the vector index exists
+    if cfg.retrieval_backend == "memory":
+        return search_in_memory(query, limit)
+
+    try:
+        # Check if the vector index exists (memoized per warm instance)
         index_name = "advice_embedding"
-        if not index_exists(driver, index_name):
+        if not registry.index_exists(index_name):
             logging.error(f"Vector index '{index_name}' does not exist")
             return []
 
-        # Create the retriever
-        graph_retriever = VectorCypherRetriever(
-            driver,
-            index_name=index_name,
-            embedder=embedder,
-            retrieval_query=f"""
-            // Match advice nodes that are relevant to the query
-            MATCH (a:Advice)
-            WHERE a.name IS NOT NULL OR a.content IS NOT NULL
-
-            // Find related topics, subtopics, and age groups
-            OPTIONAL MATCH (a)-[:HAS_TOPIC]->(topic:Topic)
-            OPTIONAL MATCH (a)-[:HAS_SUBTOPIC]->(subtopic:SubTopic)
-            OPTIONAL MATCH (a)-[:RECOMMENDED_FOR]->(age:AgeGroup)
-            OPTIONAL MATCH (a)-[:USES_STYLE]->(style:GuidanceStyle)
-
-            // Get actionable advice if available
-            OPTIONAL MATCH (a)-[:HAS_ACTIONABLE_ADVICE]->(actionable:ActionableAdvice)
-
-            // Get scenario notes if available
-            OPTIONAL MATCH (a)-[:HAS_SCENARIO_NOTE]->(scenario:ScenarioNote)
-
-            // Get author information
-            OPTIONAL MATCH (a)-[:WRITTEN_BY]->(author:Author)
-
-            // Collect all the related information
-            WITH a,
-                 collect(DISTINCT topic) AS topics,
-                 collect(DISTINCT subtopic) AS subtopics,
-                 collect(DISTINCT age) AS age_groups,
-                 collect(DISTINCT style) AS guidance_styles,
-                 collect(DISTINCT actionable) AS actionable_advice,
-                 collect(DISTINCT scenario) AS scenario_notes,
-                 collect(DISTINCT author) AS authors,
-                 score
-
-            // Calculate relevance score with additional factors
-            WITH a, topics, subtopics, age_groups, guidance_styles,
-                 actionable_advice, scenario_notes, authors, score,
-                 // Boost score if actionable advice is available
-                 CASE WHEN size(actionable_advice) > 0 THEN 0.2 ELSE 0 END AS actionable_boost,
-                 // Boost score based on scenario notes relevance
-                 CASE WHEN size(scenario_notes) > 0 THEN 0.1 ELSE 0 END AS scenario_boost
-
-            // Calculate final score with boosts
-            WITH a, topics, subtopics, age_groups, guidance_styles,
-                 actionable_advice, scenario_notes, authors,
-                 score + actionable_boost + scenario_boost AS final_score
-
-            // Return comprehensive information about the advice
-            RETURN
-                a.id AS id,
-                // Use content property if available, otherwise fall back to name
-                CASE WHEN a.content IS NOT NULL THEN a.content ELSE a.name END AS text,
-                [topic IN topics | topic.name] AS topics,
-                [subtopic IN subtopics | subtopic.name] AS subtopics,
-                [age IN age_groups | age.name] AS age_groups,
-                [style IN guidance_styles | style.name] AS guidance_styles,
-                [advice IN actionable_advice | CASE WHEN advice.content IS NOT NULL THEN advice.content ELSE advice.name END] AS actionable_advice,
-                [note IN scenario_notes | CASE WHEN note.name IS NOT NULL THEN note.name ELSE '' END] AS scenario_notes,
-                [author IN authors | author.name] AS authors,
-                final_score AS score
-            ORDER BY score DESC
-            LIMIT {limit}
-            """
+        # Retrieve results through the cached retriever for this index and query template
+        results = registry.search(
+            (index_name, RETRIEVAL_QUERY),
+            index_name,
+            RETRIEVAL_QUERY,
+            embedder,
+            query_text=query,
+            top_k=limit,
         )
+    except RECONNECT_ERRORS as e:
+        if not os.getenv("KG_SNAPSHOT_PATH"):
+            raise
+        logging.warning(f"Neo4j unreachable ({e}); answering from the KG snapshot")
+        return search_in_memory(query, limit)
 
-        # Retrieve results
-        results = graph_retriever.get_search_results(query_text=query)
-
-        # Convert results to a list of dictionaries
-        result_list = []
-        for record in results.records:
-            result_dict = {
-                'id': record.get('id', 'Unknown'),
-                'text': record.get('text', ''),
-                'topics': record.get('topics', []),
-                'subtopics': record.get('subtopics', []),
-                'age_groups': record.get('age_groups', []),
-                'guidance_styles': record.get('guidance_styles', []),
-                'actionable_advice': record.get('actionable_advice', []),
-                'scenario_notes': record.get('scenario_notes', []),
-                'authors': record.get('authors', []),
-                'score': record.get('score', 0)
-            }
-            result_list.append(result_dict)
-
-        logging.info(f"Retrieved {len(result_list)} results from knowledge graph")
-        return result_list
+    # Convert results to a list of dictionaries
+    result_list = [record_to_result(record) for record in results.records]
 
-def format_results_for_llm(results: List[Dict[str, Any]]) -> str:
+    logging.info(f"Retrieved {len(result_list)} results from knowledge graph")
+    logging.info(f"Embedding cache stats: {embedder.cache.report()}")
+    logging.debug(f"Query texts: {registry.query_text_report()}")
+    return result_list
+
+def format_passages(results: List[Dict[str, Any]]) -> List[str]:
     """
-    Format the retrieved results into a string that can be used as context for the LLM.
+    Format each retrieved result as a numbered passage, best first.
 
     Args:
         results (List[Dict[str, Any]]): The retrieved results
 
     Returns:
-        str: A formatted string containing the retrieved information
+        List[str]: One passage per result
     """
-    if not results:
-        return "No relevant information found in the knowledge graph."
-
     formatted_passages = []
 
     for i, result in enumerate(results):
@@ -185,22 +146,55 @@ def format_results_for_llm(results: List[Dict[str, Any]]) -> str:
 
         formatted_passages.append(passage)
 
-    return "\n\n".join(formatted_passages)
+    return formatted_passages
 
-def generate_response_with_openai(query: str, context: str) -> str:
+def pack_prompt_context(
+    results: List[Dict[str, Any]],
+    history: Optional[List[Dict[str, str]]] = None,
+) -> Tuple[str, str]:
     """
-    Generate a response using the OpenAI API.
+    Select passages and fit them and the conversation into the prompt token budget.
+
+    Args:
+        results (List[Dict[str, Any]]): The retrieved results
+        history (List[Dict[str, str]], optional): Earlier turns (role, content), oldest first
+
+    Returns:
+        Tuple[str, str]: The knowledge graph context and the conversation transcript
+    """
+    packed = passage_selector.select(results, format_passages, history)
+    context = packed.passages_text() or "No relevant information found in the knowledge graph."
+    return context, packed.history_text()
+
+def format_results_for_llm(results: List[Dict[str, Any]]) -> str:
+    """
+    Format the retrieved results into a string that can be used as context for the LLM.
+
+    Args:
+        results (List[Dict[str, Any]]): The retrieved results
+
+    Returns:
+        str: A formatted string containing the retrieved information
+    """
+    return pack_prompt_context(results)[0]
+
+def build_prompt(query: str, context: str, history: str = "") -> str:
+    """
+    Build the system prompt for a chat reply.
 
     Args:
         query (str): The user's query
         context (str): The context from the knowledge graph
+        history (str): Transcript of the earlier conversation, if any
 
     Returns:
-        str: The generated response
+        str: The prompt sent as the system message
     """
-    client = OpenAI(api_key=cfg.openai_api_key)
-    
-    prompt = f"""You are a warm, emotionally attuned parenting expert assistant named Hestia.
+    conversation = f"""
+Here is your conversation with this parent so far, oldest first. Use it to understand follow-up questions:
+{history}
+""" if history else ""
+    return f"""You are a warm, emotionally attuned parenting expert assistant named Hestia.
 Your role is to help caregivers of young children (ages 0–6) navigate parenting challenges with gentle guidance grounded in research-backed advice.
 
 You are replying to a parent's question. Use a tone that feels like a supportive, well-read friend who understands what raising a young child is really like.
@@ -215,28 +209,80 @@ Use these principles:
 Use the following expert advice from our structured knowledge base as input. Do not quote it directly. Instead, synthesize relevant concepts and present them naturally in your own words:
 
 {context}
-
+{conversation}
 Here is the parent's question:
 {query}
 """
 
-    response = client.chat.completions.create(
+def generate_response_with_openai(query: str, context: str, history: str = "") -> str:
+    """
+    Generate a response using the OpenAI API.
+
+    Args:
+        query (str): The user's query
+        context (str): The context from the knowledge graph
+        history (str): Transcript of the earlier conversation, if any
+
+    Returns:
+        str: The generated response
+    """
+    # Shared client; its pooled connection usually survives from the last call
+    client = get_openai_client(cfg.openai_api_key)
+
+    # Chat replies queue ahead of background community replies for the shared quota
+    response = get_rate_limiter().chat_completion(
+        client,
+        INTERACTIVE,
         model="gpt-4o",
         messages=[
-            {"role": "system", "content": prompt}
+            {"role": "system", "content": build_prompt(query, context, history)}
         ],
         temperature=0.7,
-        max_tokens=1000
+        max_tokens=1000,
+        timeout=call_timeout(CHAT_TIMEOUT)
     )
+    logging.info(f"OpenAI connection reuse: {connection_report()}")
 
     return response.choices[0].message.content
 
-def run_retrieval_and_generate(query: str) -> str:
+def stream_response_with_openai(query: str, context: str, history: str = "") -> Iterator[str]:
+    """
+    Generate a response using the OpenAI API, yielding text as it is produced.
+
+    Args:
+        query (str): The user's query
+        context (str): The context from the knowledge graph
+        history (str): Transcript of the earlier conversation, if any
+
+    Yields:
+        str: Consecutive pieces of the response
+    """
+    client = get_openai_client(cfg.openai_api_key)
+
+    request = {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": build_prompt(query, context, history)}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 1000,
+    }
+    # Streams don't report usage, so the estimate stands
+    rate_limiter = get_rate_limiter()
+    rate_limiter.acquire(request["model"], rate_limiter.estimate_tokens(request), INTERACTIVE)
+    stream = client.chat.completions.create(**request, stream=True, timeout=call_timeout(CHAT_TIMEOUT))
+
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def run_retrieval_and_generate(query: str, history: Optional[List[Dict[str, str]]] = None) -> str:
     """
     Run the full retrieval and response generation pipeline.
 
     Args:
         query (str): The user's query
+        history (List[Dict[str, str]], optional): Earlier turns (role, content), oldest first
 
     Returns:
         str: The generated response
@@ -244,10 +290,25 @@ def run_retrieval_and_generate(query: str) -> str:
     # Retrieve information from the knowledge graph
     results = retrieve_from_knowledge_graph(query)
 
-    # Format the results for the LLM
-    context = format_results_for_llm(results)
+    # Fit the results and the conversation into the prompt budget
+    context, transcript = pack_prompt_context(results, history)
 
     # Generate a response using the OpenAI API
-    response = generate_response_with_openai(query, context)
+    response = generate_response_with_openai(query, context, transcript)
 
     return response
+
+def stream_retrieval_and_generate(query: str, history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+    """
+    Run retrieval, then stream the generated response.
+
+    Args:
+        query (str): The user's query
+        history (List[Dict[str, str]], optional): Earlier turns (role, content), oldest first
+
+    Yields:
+        str: Consecutive pieces of the response
+    """
+    results = retrieve_from_knowledge_graph(query)
+    context, transcript = pack_prompt_context(results, history)
+    yield from stream_response_with_openai(query, context, transcript)
@@ -0,0 +1,7 @@
+"""
+Shared runtime helpers for the Hestia Cloud Functions.
+
+Modules in this package hold process-wide state (database drivers, caches,
+clients) that is created once per warm instance and reused by both the
+ai_query and get_auto_response code paths.
+"""
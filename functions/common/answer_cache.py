@@ -0,0 +1,190 @@
+"""
+Semantic answer cache for the chat and community endpoints.
+
+Many parents ask nearly the same question. Before running retrieval and a
+gpt-4o generation, the query embedding is compared against previously
+answered queries; if one is similar enough (cosine similarity above the
+threshold), was produced under the same filters and against the same
+knowledge graph version, its stored answer is returned instead.
+
+A None version means the stamp couldn't be read (or the graph was never
+stamped). The cache is bypassed for such requests rather than cleared, so a
+transient Neo4j error doesn't throw away answers that are still valid.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, Any], ...]:
+    """Turn a filters dict into a hashable key; None and {} are equivalent."""
+    if not filters:
+        return ()
+    return tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+
+
+@dataclass
+class CachedAnswer:
+    """A previously generated answer and the context it is valid for."""
+    query: str
+    answer: str
+    kg_version: Optional[str]
+    created_at: float
+
+
+class _Bucket:
+    """Answers sharing one filters key, with their unit-normalized embeddings stacked."""
+
+    def __init__(self, dimensions: int):
+        self.entries: List[CachedAnswer] = []
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+
+    def append(self, entry: CachedAnswer, vector: np.ndarray):
+        self.entries.append(entry)
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+
+    def keep(self, mask: np.ndarray):
+        self.entries = [e for e, k in zip(self.entries, mask) if k]
+        self.vectors = self.vectors[mask]
+
+
+class SemanticAnswerCache:
+    """
+    Stores answers by query embedding and returns them for similar queries.
+
+    Args:
+        threshold: Minimum cosine similarity for a hit
+        ttl: Seconds an answer stays valid
+        max_entries: Maximum answers kept per filters key; oldest are evicted first
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 6 * 3600, max_entries: int = 2000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._kg_version: Optional[str] = None
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "unversioned": 0}
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, kg_version: str):
+        # A rebuilt graph makes every stored answer stale
+        if kg_version != self._kg_version:
+            if self._buckets:
+                logging.info(f"KG version changed ({self._kg_version} -> {kg_version}); clearing answer cache")
+                self.stats["invalidations"] += 1
+            self._buckets.clear()
+            self._kg_version = kg_version
+
+    def lookup(
+        self,
+        embedding: Sequence[float],
+        filters: Optional[Dict[str, Any]] = None,
+        kg_version: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Return a stored answer for a semantically equivalent query.
+
+        Args:
+            embedding: Embedding of the incoming query
+            filters: Filters the answer must have been generated under
+            kg_version: Current knowledge graph version stamp; None (unknown) always misses
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss
+        """
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            if kg_version is None:
+                self.stats["unversioned"] += 1
+                return None
+            self._check_version(kg_version)
+            bucket = self._buckets.get(filters_key(filters))
+            if bucket is None or not bucket.entries:
+                self.stats["misses"] += 1
+                return None
+
+            fresh = np.array([now - e.created_at <= self.ttl for e in bucket.entries])
+            if not fresh.all():
+                bucket.keep(fresh)
+                if not bucket.entries:
+                    self.stats["misses"] += 1
+                    return None
+
+            similarities = bucket.vectors @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+
+            entry = bucket.entries[best]
+            self.stats["hits"] += 1
+            logging.info(f"Answer cache hit (similarity {similarities[best]:.3f}) for cached query: {entry.query}")
+            return entry.answer
+
+    def store(
+        self,
+        query: str,
+        embedding: Sequence[float],
+        answer: str,
+        filters: Optional[Dict[str, Any]] = None,
+        kg_version: Optional[str] = None,
+    ):
+        """Remember `answer` for `query` under the given filters and KG version; skipped if the version is unknown."""
+        if kg_version is None:
+            return
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_version(kg_version)
+            key = filters_key(filters)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(vector.shape[0])
+            bucket.append(CachedAnswer(query, answer, kg_version, time.time()), vector)
+            if len(bucket.entries) > self.max_entries:
+                mask = np.ones(len(bucket.entries), dtype=bool)
+                mask[: len(bucket.entries) - self.max_entries] = False
+                bucket.keep(mask)
+            self.stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self.stats)
+            report["entries"] = sum(len(b.entries) for b in self._buckets.values())
+        return report
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Return the process-wide answer cache, configured from ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL and ANSWER_CACHE_MAX_ENTRIES.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache(
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95)),
+                ttl=float(os.getenv("ANSWER_CACHE_TTL", 6 * 3600)),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 2000)),
+            )
+        return _cache
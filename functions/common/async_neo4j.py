@@ -0,0 +1,162 @@
+"""
+Async counterpart of the Neo4j registry.
+
+Holds one pooled `neo4j.AsyncDriver` for the background event loop
+(common/async_runtime.py). It memoizes index existence and the KG version
+like `Neo4jRegistry`, and counts query texts for the same query-text report.
+All methods must be awaited on that loop.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import neo4j
+
+from common.neo4j_registry import KG_VERSION_RETRY_INTERVAL, RECONNECT_ERRORS
+
+
+class AsyncNeo4jRegistry:
+    """Owns a single pooled async driver plus the state derived from it."""
+
+    def __init__(
+        self,
+        uri: str,
+        auth: Tuple[str, str],
+        database: Optional[str] = None,
+        max_connection_pool_size: int = 50,
+        max_connection_lifetime: int = 300,
+        liveness_check_timeout: float = 30.0,
+    ):
+        self.uri = uri
+        self.auth = auth
+        self.database = database
+        self.driver_kwargs = {
+            "max_connection_pool_size": max_connection_pool_size,
+            "max_connection_lifetime": max_connection_lifetime,
+            "liveness_check_timeout": liveness_check_timeout,
+            "keep_alive": True,
+        }
+        self._lock = asyncio.Lock()
+        self._driver: Optional[neo4j.AsyncDriver] = None
+        self._indexes: Dict[str, bool] = {}
+        self._kg_version: Optional[Tuple[Optional[str], float]] = None
+        self._kg_version_failed_at: Optional[float] = None
+        self._query_counts: Dict[str, int] = {}
+        self.stats = {"drivers_created": 0, "reconnects": 0}
+
+    async def get_driver(self) -> neo4j.AsyncDriver:
+        """Return the shared async driver, creating it on first use."""
+        async with self._lock:
+            if self._driver is None:
+                logging.info(f"Opening pooled async Neo4j driver for {self.uri}")
+                driver = neo4j.AsyncGraphDatabase.driver(self.uri, auth=self.auth, **self.driver_kwargs)
+                await driver.verify_connectivity()
+                self._driver = driver
+                self.stats["drivers_created"] += 1
+            return self._driver
+
+    async def _close_driver(self):
+        # Index lookups belong to the old driver, so drop them too; the next
+        # get_driver() call opens a fresh one
+        async with self._lock:
+            self._indexes.clear()
+            if self._driver is not None:
+                try:
+                    await self._driver.close()
+                except Exception as e:
+                    logging.warning(f"Error closing async Neo4j driver: {e}")
+                self._driver = None
+
+    async def _reconnect(self):
+        logging.warning("Rebuilding async Neo4j driver after connection failure")
+        self.stats["reconnects"] += 1
+        await self._close_driver()
+
+    async def query(self, cypher: str, parameters: Optional[Dict[str, Any]] = None) -> list:
+        """
+        Run a read query with `parameters` and return its records, rebuilding
+        the driver and retrying once if the connection was lost.
+        """
+        digest = hashlib.sha1(cypher.encode("utf-8")).hexdigest()
+        self._query_counts[digest] = self._query_counts.get(digest, 0) + 1
+
+        async def _read():
+            driver = await self.get_driver()
+            records, _, _ = await driver.execute_query(
+                cypher,
+                parameters or {},
+                database_=self.database,
+                routing_=neo4j.RoutingControl.READ,
+            )
+            return records
+
+        try:
+            return await _read()
+        except RECONNECT_ERRORS as e:
+            logging.warning(f"Neo4j connection lost ({e}); reconnecting and retrying")
+            await self._reconnect()
+            return await _read()
+
+    async def index_exists(self, index_name: str) -> bool:
+        """Check if an index exists, querying the database only once per driver."""
+        if index_name not in self._indexes:
+            records = await self.query("SHOW INDEXES YIELD name RETURN name")
+            for record in records:
+                self._indexes[record["name"]] = True
+        return self._indexes.setdefault(index_name, False)
+
+    async def kg_version(self, max_age: float = 300.0) -> Optional[str]:
+        """
+        Return the KG builder's version stamp, re-read at most every `max_age` seconds.
+
+        Like `Neo4jRegistry.kg_version`, a failed read returns None and is not
+        retried for KG_VERSION_RETRY_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if self._kg_version is not None and now - self._kg_version[1] <= max_age:
+            return self._kg_version[0]
+        if self._kg_version_failed_at is not None and now - self._kg_version_failed_at < KG_VERSION_RETRY_INTERVAL:
+            return None
+        try:
+            records = await self.query("MATCH (m:KGMeta) RETURN m.version AS version LIMIT 1")
+        except Exception as e:
+            logging.warning(f"Could not read KG version: {e}; not retrying for {KG_VERSION_RETRY_INTERVAL:.0f}s")
+            self._kg_version_failed_at = time.monotonic()
+            return None
+        version = records[0]["version"] if records else None
+        self._kg_version = (version, time.monotonic())
+        self._kg_version_failed_at = None
+        return version
+
+    def query_text_report(self) -> Dict[str, float]:
+        """Distinct query texts sent and executions; a client-side count, not server plan-cache hits."""
+        executions = sum(self._query_counts.values())
+        return {
+            "query_texts": len(self._query_counts),
+            "executions": executions,
+            "repeated_executions": executions - len(self._query_counts),
+        }
+
+    async def close(self):
+        """Close the driver and drop all derived state."""
+        await self._close_driver()
+
+
+_registries: Dict[Tuple[str, str, Optional[str]], AsyncNeo4jRegistry] = {}
+
+
+def get_async_registry(cfg) -> AsyncNeo4jRegistry:
+    """
+    Return the async registry for the database described by `cfg`.
+
+    Only call this from the background event loop; the registry and its
+    driver belong to that loop.
+    """
+    key = (cfg.URI, cfg.AUTH[0], cfg.DATABASE)
+    registry = _registries.get(key)
+    if registry is None:
+        registry = AsyncNeo4jRegistry(cfg.URI, cfg.AUTH, database=cfg.DATABASE)
+        _registries[key] = registry
+    return registry
@@ -0,0 +1,60 @@
+"""
+One long-lived asyncio event loop per function instance.
+
+Cloud Function handlers are synchronous, but the async Neo4j driver,
+AsyncOpenAI and the async Firestore client are bound to the event loop that
+created them. A fresh `asyncio.run()` per request would rebuild all of them
+every time. Instead one loop runs in a daemon thread for the life of the
+instance, and handlers submit coroutines to it. Concurrent requests on the
+same instance then share that loop and its connection pools. They interleave
+their I/O on the loop instead of each holding a thread for the whole request.
+"""
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the instance's background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_async(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """
+    Run `coro` on the background loop and block the calling handler until it finishes.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait before raising TimeoutError (and cancelling it)
+
+    Returns:
+        The coroutine's result; its exceptions are re-raised here
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+async def run_on_loop(coro: Coroutine) -> Any:
+    """
+    Await `coro` on the background loop from any other event loop.
+
+    For async callers with their own loop (e.g. `asyncio.run`) that need the
+    loop-bound pooled clients. Cancelling the caller cancels `coro`.
+
+    Returns:
+        The coroutine's result; its exceptions are re-raised here
+    """
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
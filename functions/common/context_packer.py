@@ -0,0 +1,182 @@
+"""
+Fit chat history and retrieved passages into a fixed prompt token budget.
+
+Without a bound, a long conversation or a few long Advice texts can push a
+prompt past the context window or make every reply slow and expensive.
+The packer decides what the model sees:
+
+- History gets at most `history_share` of the budget, newest message first,
+  so the turns the question most likely refers to survive.
+- Passages fill the rest in retrieval rank order, including any history
+  share left unused.
+- The first item that does not fit is cut at a token boundary (when at least
+  `min_truncated_tokens` remain) and everything after it is dropped.
+
+The result depends only on the inputs, so the same conversation and passages
+always produce the same prompt.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from common.tokens import DEFAULT_MODEL, count_tokens, truncate_to_tokens
+
+ASSISTANT_SENDER = "_copilot"
+TRUNCATION_MARKER = " …"
+ROLE_LABELS = {"user": "Parent", "assistant": "Hestia"}
+
+
+def chat_history(messages: List[Dict], query: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Convert Firestore chat messages into role/content turns.
+
+    Args:
+        messages: Message dicts (`sent_by`, `content`) in chronological order
+        query: The question being answered; dropped if it is the last user message
+
+    Returns:
+        List[Dict[str, str]]: Turns with `role` ("user" or "assistant") and `content`
+    """
+    history = [
+        {
+            "role": "assistant" if message.get("sent_by") == ASSISTANT_SENDER else "user",
+            "content": str(message["content"]),
+        }
+        for message in messages
+        if message.get("content")
+    ]
+    # The app saves the parent's message before calling get_chat
+    if query and history and history[-1]["role"] == "user" and history[-1]["content"].strip() == query.strip():
+        history.pop()
+    return history
+
+
+def history_key(history: Optional[List[Dict[str, str]]]) -> Optional[str]:
+    """Stable digest of a conversation, for keying answers that depend on it; None when empty."""
+    if not history:
+        return None
+    blob = json.dumps([[turn["role"], turn["content"]] for turn in history], ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def format_turn(turn: Dict[str, str]) -> str:
+    return f"{ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['content']}"
+
+
+@dataclass
+class PackedContext:
+    """What made it into the prompt, plus what was cut."""
+    passages: List[str] = field(default_factory=list)
+    history: List[Dict[str, str]] = field(default_factory=list)
+    tokens: int = 0
+    passage_tokens: int = 0
+    dropped: int = 0
+    truncated: int = 0
+    # Set by PassageSelector
+    duplicates: int = 0
+    tokens_saved: int = 0
+
+    def passages_text(self) -> str:
+        return "\n\n".join(self.passages)
+
+    def history_text(self) -> str:
+        return "\n".join(format_turn(turn) for turn in self.history)
+
+
+class ContextPacker:
+    """
+    Packs passages and history into `budget` tokens.
+
+    Args:
+        budget: Total tokens available for passages and history
+        history_share: Fraction of the budget history may use
+        model: Model whose tokenizer does the counting
+        min_truncated_tokens: Smallest remainder worth filling with a truncated item
+    """
+
+    def __init__(
+        self,
+        budget: int = 3000,
+        history_share: float = 0.35,
+        model: str = DEFAULT_MODEL,
+        min_truncated_tokens: int = 48,
+    ):
+        self.budget = budget
+        self.history_share = history_share
+        self.model = model
+        self.min_truncated_tokens = min_truncated_tokens
+
+    def _fill(
+        self,
+        texts: Iterable[str],
+        budget: int,
+        packed: PackedContext,
+        prefixes: Optional[List[str]] = None,
+    ) -> Tuple[List[str], int]:
+        """
+        Take texts in order until `budget` runs out; returns the kept texts and tokens used.
+
+        A text that starts with its entry in `prefixes` (e.g. a speaker label) is only
+        truncated after the prefix, and is dropped if nothing past the prefix fits.
+        """
+        texts = list(texts)
+        kept, used = [], 0
+        for text in texts:
+            tokens = count_tokens(text, self.model)
+            if used + tokens <= budget:
+                kept.append(text)
+                used += tokens
+                continue
+            remaining = budget - used
+            if remaining >= self.min_truncated_tokens:
+                prefix = prefixes[len(kept)] if prefixes else ""
+                body = text[len(prefix):]
+                limit = remaining - count_tokens(prefix + TRUNCATION_MARKER, self.model)
+                truncated = prefix + truncate_to_tokens(body, limit, self.model) + TRUNCATION_MARKER
+                tokens = count_tokens(truncated, self.model)
+                # BPE can merge across the joins, and a cut inside a multi-byte character
+                # decodes to a longer replacement character, so the re-count may not match;
+                # shorten until the result really fits
+                while tokens > remaining and limit > 0:
+                    limit -= tokens - remaining
+                    truncated = prefix + truncate_to_tokens(body, limit, self.model) + TRUNCATION_MARKER
+                    tokens = count_tokens(truncated, self.model)
+                if limit > 0 and tokens <= remaining:
+                    kept.append(truncated)
+                    used += tokens
+                    packed.truncated += 1
+            packed.dropped += len(texts) - len(kept)
+            break
+        return kept, used
+
+    def pack(self, passages: List[str], history: Optional[List[Dict[str, str]]] = None) -> PackedContext:
+        """
+        Select and truncate history and passages to fit the budget.
+
+        Args:
+            passages: Formatted passages, best first
+            history: Conversation turns, oldest first
+
+        Returns:
+            PackedContext: Kept passages in rank order and kept turns oldest first
+        """
+        packed = PackedContext()
+        history = history or []
+
+        history_budget = int(self.budget * self.history_share)
+        # Newest first while filling, so the oldest turns are the ones cut
+        newest_first = list(reversed(history))
+        labels = [format_turn({**turn, "content": ""}) for turn in newest_first]
+        kept_turns, history_tokens = self._fill(
+            (format_turn(turn) for turn in newest_first), history_budget, packed, labels
+        )
+        packed.history = [
+            {"role": turn["role"], "content": text[len(label):]}
+            for turn, label, text in zip(newest_first, labels, kept_turns)
+        ][::-1]
+
+        packed.passages, passage_tokens = self._fill(passages, self.budget - history_tokens, packed)
+        packed.passage_tokens = passage_tokens
+        packed.tokens = history_tokens + passage_tokens
+        return packed
@@ -0,0 +1,285 @@
+"""
+Two-tier cache for query embeddings.
+
+Repeated questions ("How do I handle toddler tantrums?") should not pay an
+OpenAI embedding round trip every time. Lookups go to an in-process LRU
+first and then to an optional SQLite file that survives instance restarts.
+Entries are keyed by (embedding model name, normalized query text).
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from neo4j_graphrag.embeddings.base import Embedder
+
+CacheKey = Tuple[str, str]
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share an entry."""
+    return " ".join(text.split()).casefold()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class DiskEmbeddingStore:
+    """SQLite-backed store of float32 vectors; safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (model, query))"
+        )
+        self._conn.commit()
+
+    def get(self, key: CacheKey, ttl: Optional[float]) -> Optional[Tuple[List[float], float]]:
+        """Return (vector, age in seconds) for `key`; an expired row is deleted and counts as a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM embeddings WHERE model = ? AND query = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            blob, created_at = row
+            age = max(time.time() - created_at, 0.0)
+            if ttl is not None and age > ttl:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ? AND query = ?", key)
+                self._conn.commit()
+                return None
+        return _unpack(blob), age
+
+    def purge(self, ttl: float) -> int:
+        """Delete every row older than `ttl` seconds and return how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - ttl,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def put(self, key: CacheKey, vector: List[float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (model, query, vector, created_at) VALUES (?, ?, ?, ?)",
+                (key[0], key[1], _pack(vector), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """
+    In-process LRU with size and TTL bounds, optionally backed by a disk store.
+
+    Args:
+        max_size: Maximum number of vectors kept in memory
+        ttl: Seconds an entry stays valid (None disables expiry)
+        disk_path: SQLite file for the second tier (None keeps the cache in memory only)
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 24 * 3600, disk_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[float]]]" = OrderedDict()
+        self.disk: Optional[DiskEmbeddingStore] = None
+        if disk_path:
+            try:
+                self.disk = DiskEmbeddingStore(disk_path)
+                if ttl is not None:
+                    removed = self.disk.purge(ttl)
+                    if removed:
+                        logging.info(f"Removed {removed} expired embeddings from {disk_path}")
+            except (sqlite3.Error, OSError) as e:
+                logging.warning(f"Embedding disk cache disabled, could not open {disk_path}: {e}")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> CacheKey:
+        return (model_name, normalize_query(text))
+
+    def get(self, key: CacheKey) -> Optional[List[float]]:
+        """Return the cached vector for `key`, or None on a miss."""
+        vector = self._get_memory(key)
+        if vector is None:
+            vector = self._get_disk(key)
+        return vector
+
+    async def aget(self, key: CacheKey) -> Optional[List[float]]:
+        """Like `get`, but reads the SQLite tier on a worker thread so the event loop never blocks."""
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        if self.disk is None:
+            return self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: CacheKey) -> Optional[List[float]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if self.ttl is None or now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return vector
+                del self._entries[key]
+        return None
+
+    def _get_disk(self, key: CacheKey) -> Optional[List[float]]:
+        """Look `key` up on disk after a memory miss; counts the disk hit or the miss."""
+        if self.disk is not None:
+            found = self.disk.get(key, self.ttl)
+            if found is not None:
+                vector, age = found
+                # Keep the disk entry's age so it expires from memory when it would on disk
+                self._remember(key, vector, age)
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return vector
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: CacheKey, vector: List[float]):
+        """Store `vector` in both tiers."""
+        self._remember(key, vector)
+        self._persist(key, vector)
+
+    async def aput(self, key: CacheKey, vector: List[float]):
+        """Like `put`, but writes the SQLite tier on a worker thread."""
+        self._remember(key, vector)
+        if self.disk is not None:
+            await asyncio.to_thread(self._persist, key, vector)
+
+    def _persist(self, key: CacheKey, vector: List[float]):
+        if self.disk is not None:
+            try:
+                self.disk.put(key, vector)
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to persist embedding to disk cache: {e}")
+
+    def _remember(self, key: CacheKey, vector: List[float], age: float = 0.0):
+        with self._lock:
+            self._entries[key] = (time.monotonic() - age, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def report(self) -> Dict[str, float]:
+        """Return hit/miss counters plus the current size and hit rate."""
+        with self._lock:
+            report = dict(self.stats)
+            report["size"] = len(self._entries)
+        report["hit_rate"] = self.hit_rate()
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedEmbedder(Embedder):
+    """
+    Embedder wrapper that consults an `EmbeddingCache` before calling the
+    underlying model. Can be passed anywhere a neo4j_graphrag embedder is expected.
+    """
+
+    def __init__(self, embedder: Embedder, model_name: str, cache: Optional[EmbeddingCache] = None):
+        super().__init__()
+        self.embedder = embedder
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(self.model_name, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embedder.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    async def async_embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(self.model_name, text)
+        vector = await self.cache.aget(key)
+        if vector is None:
+            vector = await self.embedder.async_embed_query(text)
+            await self.cache.aput(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed many texts, sending only the uncached ones in a single request.
+
+        Args:
+            texts: Texts to embed; repeats are embedded once
+
+        Returns:
+            List[List[float]]: Vectors aligned with `texts`
+        """
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        vectors: List[Optional[List[float]]] = [self.cache.get(key) for key in keys]
+        missing: Dict[CacheKey, List[int]] = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            positions = list(missing.values())
+            embedded = self.embedder.embed_documents([texts[indexes[0]] for indexes in positions])
+            for indexes, vector in zip(positions, embedded):
+                self.cache.put(keys[indexes[0]], vector)
+                for i in indexes:
+                    vectors[i] = vector
+        return vectors
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache.
+
+    Sized from EMBEDDING_CACHE_SIZE / EMBEDDING_CACHE_TTL; the disk tier is
+    enabled by pointing EMBEDDING_CACHE_PATH at a writable file.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = float(os.getenv("EMBEDDING_CACHE_TTL", 24 * 3600))
+            _cache = EmbeddingCache(
+                max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", 1024)),
+                ttl=ttl if ttl > 0 else None,
+                disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            )
+        return _cache
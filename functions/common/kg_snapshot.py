@@ -0,0 +1,230 @@
+"""
+Versioned, memory-mapped snapshot of the Advice retrieval data.
+
+A new Cloud Function instance otherwise has to read every Advice from Neo4j
+before the in-memory index can answer. A snapshot file holds the same data
+laid out so that opening it costs almost nothing:
+
+    b"HSNAP1\n"
+    [uint64 little-endian header length][JSON header]
+    [JSON array of Advice rows: id, text, facet lists]
+    [zero padding up to a 64-byte boundary]
+    [float32 matrix of unit-normalized embeddings, row-major]
+
+The header records the KG version, row count, dimensions and the byte
+offsets of both blocks. The embedding block is opened with `np.memmap`, so
+pages are loaded lazily by the OS and nothing is parsed or copied.
+
+Usage (from functions/):
+    python -m common.kg_snapshot export kg_snapshot.hsnap
+    python -m common.kg_snapshot info kg_snapshot.hsnap
+"""
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"HSNAP1\n"
+SNAPSHOT_SUFFIX = ".hsnap"
+ALIGNMENT = 64
+_HEADER_LENGTH = struct.Struct("<Q")
+
+# Everything the retrieval query returns for an Advice, plus its embedding
+LOAD_QUERY = """
+MATCH (a:Advice)
+WHERE a.embedding IS NOT NULL AND (a.name IS NOT NULL OR a.content IS NOT NULL)
+RETURN
+    a.id AS id,
+    coalesce(a.content, a.name) AS text,
+    [(a)-[:HAS_TOPIC]->(topic:Topic) | topic.name] AS topics,
+    [(a)-[:HAS_SUBTOPIC]->(subtopic:SubTopic) | subtopic.name] AS subtopics,
+    [(a)-[:RECOMMENDED_FOR]->(age:AgeGroup) | age.name] AS age_groups,
+    [(a)-[:USES_STYLE]->(style:GuidanceStyle) | style.name] AS guidance_styles,
+    [(a)-[:HAS_ACTIONABLE_ADVICE]->(advice:ActionableAdvice) | coalesce(advice.content, advice.name)] AS actionable_advice,
+    [(a)-[:HAS_SCENARIO_NOTE]->(note:ScenarioNote) | coalesce(note.name, '')] AS scenario_notes,
+    [(a)-[:WRITTEN_BY]->(author:Author) | author.name] AS authors,
+    a.embedding AS embedding
+"""
+
+FACET_FIELDS = (
+    "topics", "subtopics", "age_groups", "guidance_styles",
+    "actionable_advice", "scenario_notes", "authors",
+)
+
+
+def fetch_advice(registry) -> Tuple[List[Dict[str, Any]], List[List[float]], Optional[str]]:
+    """
+    Read every embedded Advice node with its facets.
+
+    Args:
+        registry: Neo4jRegistry to read through
+
+    Returns:
+        Tuple of (row dicts, embeddings aligned with the rows, KG version)
+    """
+    version = registry.kg_version()
+    rows, embeddings = [], []
+    for record in registry.query(LOAD_QUERY):
+        row = {"id": record["id"], "text": record["text"]}
+        for field in FACET_FIELDS:
+            row[field] = record[field] or []
+        rows.append(row)
+        embeddings.append(record["embedding"])
+    return rows, embeddings, version
+
+
+def write_snapshot(path: str, rows: List[Dict[str, Any]], embeddings, version: Optional[str]) -> Dict[str, Any]:
+    """
+    Write rows and their embeddings to a snapshot file.
+
+    The file is written next to `path` and renamed into place, so instances
+    reading the old snapshot never see a partial file.
+
+    Args:
+        path: Destination file
+        rows: Advice row dicts
+        embeddings: Vectors aligned with `rows`
+        version: KG version the rows were read at
+
+    Returns:
+        Dict[str, Any]: The header that was written
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(rows), -1) if len(rows) else np.empty((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = np.ascontiguousarray(matrix / norms, dtype="<f4")
+
+    rows_blob = json.dumps(rows, ensure_ascii=False).encode("utf-8")
+    header = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "count": len(rows),
+        "dimensions": int(matrix.shape[1]) if matrix.size else 0,
+        "dtype": "<f4",
+        "rows_length": len(rows_blob),
+    }
+    # Offsets depend on the header's own length, so settle them before writing
+    header["rows_offset"] = 0
+    header["embeddings_offset"] = 0
+    while True:
+        header_blob = json.dumps(header).encode("utf-8")
+        rows_offset = len(MAGIC) + _HEADER_LENGTH.size + len(header_blob)
+        embeddings_offset = -(-(rows_offset + len(rows_blob)) // ALIGNMENT) * ALIGNMENT
+        if header["rows_offset"] == rows_offset and header["embeddings_offset"] == embeddings_offset:
+            break
+        header["rows_offset"] = rows_offset
+        header["embeddings_offset"] = embeddings_offset
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header_blob)))
+        f.write(header_blob)
+        f.write(rows_blob)
+        f.write(b"\0" * (embeddings_offset - rows_offset - len(rows_blob)))
+        f.write(matrix.tobytes())
+    os.replace(tmp_path, path)
+    return header
+
+
+class KGSnapshot:
+    """
+    An opened snapshot: the header, the Advice rows and a read-only memory
+    map of the embedding matrix.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any], rows: List[Dict[str, Any]], embeddings: np.ndarray):
+        self.path = path
+        self.header = header
+        self.version: Optional[str] = header["version"]
+        self.rows = rows
+        self.embeddings = embeddings
+
+    @classmethod
+    def open(cls, path: str) -> "KGSnapshot":
+        """
+        Open a snapshot written by `write_snapshot`.
+
+        Raises:
+            ValueError: If the file is not a snapshot or is truncated
+        """
+        start_time = time.perf_counter()
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a {SNAPSHOT_SUFFIX} snapshot")
+            (header_length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+            header = json.loads(f.read(header_length))
+            f.seek(header["rows_offset"])
+            rows = json.loads(f.read(header["rows_length"]))
+
+        shape = (header["count"], header["dimensions"])
+        expected = header["embeddings_offset"] + shape[0] * shape[1] * 4
+        if os.path.getsize(path) < expected:
+            raise ValueError(f"Truncated snapshot {path}")
+        if shape[0] and shape[1]:
+            embeddings = np.memmap(path, dtype=header["dtype"], mode="r", offset=header["embeddings_offset"], shape=shape)
+        else:
+            embeddings = np.empty((0, 0), dtype=np.float32)
+
+        logging.info(
+            f"Opened KG snapshot {path} (version {header['version']}, {header['count']} rows) "
+            f"in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+        )
+        return cls(path, header, rows, embeddings)
+
+
+def export_snapshot(registry, path: str) -> Dict[str, Any]:
+    """
+    Export the current graph's Advice rows and embeddings to `path`.
+
+    Args:
+        registry: Neo4jRegistry to read through
+        path: Destination snapshot file
+
+    Returns:
+        Dict[str, Any]: The snapshot header
+    """
+    start_time = time.perf_counter()
+    rows, embeddings, version = fetch_advice(registry)
+    header = write_snapshot(path, rows, embeddings, version)
+    logging.info(
+        f"Exported {header['count']} Advice rows (version {version}) to {path} "
+        f"in {time.perf_counter() - start_time:.2f}s ({os.path.getsize(path) / 1e6:.1f} MB)"
+    )
+    return header
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or inspect a KG retrieval snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write a snapshot of the current graph")
+    export_parser.add_argument("path", help=f"Output {SNAPSHOT_SUFFIX} file")
+    info_parser = subparsers.add_parser("info", help="Print a snapshot's header")
+    info_parser.add_argument("path", help=f"{SNAPSHOT_SUFFIX} file to inspect")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "info":
+        print(json.dumps(KGSnapshot.open(args.path).header, indent=2))
+        return
+
+    from ai_query.config import Config
+    from common.neo4j_registry import get_registry
+
+    registry = get_registry(Config())
+    try:
+        export_snapshot(registry, args.path)
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Process-wide OpenAI clients with pooled keep-alive connections.
+
+Building an `OpenAI(...)` client per call also builds a new HTTP connection
+pool, so every completion paid a TCP connect and TLS handshake before the
+request was even sent. Here one client per API key (and one async client for
+the background event loop) lives for the whole warm instance:
+
+- Connections are kept alive for `OPENAI_KEEPALIVE_EXPIRY` seconds, so
+  back-to-back requests reuse them.
+- Each call passes its own timeout (`call_timeout`); chat and embedding
+  calls have separate defaults.
+- Every request is traced, and `connection_report()` shows how many needed
+  a new connection.
+"""
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from neo4j_graphrag.embeddings import OpenAIEmbeddings
+
+from common.tokens import count_tokens_batch, truncate_to_tokens
+
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 120))
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+CHAT_TIMEOUT = float(os.getenv("OPENAI_CHAT_TIMEOUT", 60))
+EMBEDDING_TIMEOUT = float(os.getenv("OPENAI_EMBEDDING_TIMEOUT", 10))
+# Per-request bounds for embed_documents; the API allows 2048 inputs and 300k tokens
+EMBEDDING_BATCH_SIZE = int(os.getenv("OPENAI_EMBEDDING_BATCH_SIZE", 256))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("OPENAI_EMBEDDING_BATCH_TOKENS", 200000))
+# Longest single input the embedding models accept
+MAX_EMBEDDING_INPUT_TOKENS = 8191
+
+
+def call_timeout(seconds: float) -> httpx.Timeout:
+    """Timeout for one API call: `seconds` overall, with the shared connect timeout."""
+    return httpx.Timeout(seconds, connect=min(CONNECT_TIMEOUT, seconds))
+
+
+class ConnectionStats:
+    """Counts requests and the connections and TLS handshakes they needed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "connections_opened": 0, "tls_handshakes": 0}
+
+    def record(self, event: str):
+        if event.endswith(".started"):
+            # httpcore traces every phase; only whole requests and new connections matter
+            if event.endswith("send_request_headers.started"):
+                self._add("requests")
+        elif event == "connection.connect_tcp.complete":
+            self._add("connections_opened")
+        elif event == "connection.start_tls.complete":
+            self._add("tls_handshakes")
+
+    def _add(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def report(self) -> Dict[str, float]:
+        with self._lock:
+            report = dict(self.counts)
+        report["reused"] = max(report["requests"] - report["connections_opened"], 0)
+        report["reuse_rate"] = round(report["reused"] / report["requests"], 3) if report["requests"] else 0.0
+        return report
+
+
+stats = ConnectionStats()
+
+
+def _trace(event: str, info: Dict[str, Any]):
+    stats.record(event)
+
+
+async def _atrace(event: str, info: Dict[str, Any]):
+    stats.record(event)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _attach_trace(request: httpx.Request):
+    request.extensions["trace"] = _trace
+
+
+async def _attach_atrace(request: httpx.Request):
+    request.extensions["trace"] = _atrace
+
+
+_clients: Dict[Optional[str], OpenAI] = {}
+_async_clients: Dict[Optional[str], AsyncOpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: Optional[str] = None) -> OpenAI:
+    """
+    Return the shared OpenAI client for `api_key`, creating it on first use.
+
+    Args:
+        api_key: OpenAI API key; None lets the SDK read OPENAI_API_KEY
+
+    Returns:
+        OpenAI: A client whose connection pool is reused by every caller
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            logging.info("Opening pooled OpenAI client")
+            http_client = httpx.Client(
+                limits=_limits(),
+                timeout=call_timeout(CHAT_TIMEOUT),
+                event_hooks={"request": [_attach_trace]},
+            )
+            client = OpenAI(api_key=api_key, http_client=http_client)
+            _clients[api_key] = client
+        return client
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for `api_key`.
+
+    Only use it on the instance's background event loop
+    (common/async_runtime.py); its connections belong to that loop.
+    """
+    with _clients_lock:
+        client = _async_clients.get(api_key)
+        if client is None:
+            logging.info("Opening pooled AsyncOpenAI client")
+            http_client = httpx.AsyncClient(
+                limits=_limits(),
+                timeout=call_timeout(CHAT_TIMEOUT),
+                event_hooks={"request": [_attach_atrace]},
+            )
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+            _async_clients[api_key] = client
+        return client
+
+
+def connection_report() -> Dict[str, float]:
+    """Requests sent through the shared clients and how many reused a pooled connection."""
+    return stats.report()
+
+
+class PooledOpenAIEmbeddings(OpenAIEmbeddings):
+    """
+    OpenAIEmbeddings on the shared clients, with a per-call timeout.
+
+    `embed_query` uses the pooled sync client; `async_embed_query` awaits the
+    pooled async client. `embed_documents` embeds many texts in as few
+    requests as the per-request input and token bounds allow.
+    """
+
+    def __init__(self, model: str, api_key: Optional[str] = None, timeout: float = EMBEDDING_TIMEOUT):
+        self.api_key = api_key
+        self.timeout = timeout
+        super().__init__(model=model, api_key=api_key)
+
+    def _initialize_client(self, **kwargs: Any) -> OpenAI:
+        return get_openai_client(kwargs.get("api_key"))
+
+    def embed_query(self, text: str, **kwargs: Any) -> List[float]:
+        kwargs.setdefault("timeout", call_timeout(self.timeout))
+        return super().embed_query(text, **kwargs)
+
+    async def async_embed_query(self, text: str, **kwargs: Any) -> List[float]:
+        kwargs.setdefault("timeout", call_timeout(self.timeout))
+        response = await get_async_openai_client(self.api_key).embeddings.create(
+            input=text, model=self.model, **kwargs
+        )
+        return response.data[0].embedding
+
+    def embed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        """
+        Embed `texts` in order, in requests of at most EMBEDDING_BATCH_SIZE
+        inputs and EMBEDDING_BATCH_TOKENS tokens.
+
+        Inputs longer than the model accepts are truncated to their first
+        MAX_EMBEDDING_INPUT_TOKENS tokens.
+        """
+        kwargs.setdefault("timeout", call_timeout(self.timeout))
+        texts = list(texts)
+        counts = count_tokens_batch(texts, self.model)
+        for i, count in enumerate(counts):
+            if count > MAX_EMBEDDING_INPUT_TOKENS:
+                texts[i] = truncate_to_tokens(texts[i], MAX_EMBEDDING_INPUT_TOKENS, self.model)
+                counts[i] = MAX_EMBEDDING_INPUT_TOKENS
+
+        client = get_openai_client(self.api_key)
+        vectors: List[List[float]] = []
+        start = 0
+        while start < len(texts):
+            end, tokens = start, 0
+            while end < len(texts) and end - start < EMBEDDING_BATCH_SIZE and (
+                end == start or tokens + counts[end] <= EMBEDDING_BATCH_TOKENS
+            ):
+                tokens += counts[end]
+                end += 1
+            response = client.embeddings.create(input=texts[start:end], model=self.model, **kwargs)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+            start = end
+        return vectors
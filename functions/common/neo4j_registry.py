@@ -0,0 +1,335 @@
+"""
+Process-wide Neo4j driver and retriever registry.
+
+Cloud Function instances stay warm between invocations, so opening a new
+driver per request pays the TLS handshake, routing-table fetch and
+`SHOW INDEXES` scan every time. The registry keeps one pooled driver per
+(URI, user, database), memoizes index existence and caches built
+`VectorCypherRetriever` objects until the connection has to be rebuilt.
+
+Neo4j caches execution plans by query text, so retrieval Cypher should be
+a fixed template with every value passed as a parameter. The registry counts
+executions per query text, which shows whether callers keep sending the same
+texts. It can't see whether the server's plan cache served them; PROFILE the
+queries (test/profile_retrieval_queries.py) or read the database's query-cache
+metrics for that.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import neo4j
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+
+from neo4j_graphrag.retrievers import VectorCypherRetriever
+
+# Errors that mean the pooled connections are gone and the driver must be rebuilt
+RECONNECT_ERRORS = (ServiceUnavailable, SessionExpired)
+# After a failed KG version read, callers get None without a new attempt for this many seconds
+KG_VERSION_RETRY_INTERVAL = 30.0
+
+
+class Neo4jRegistry:
+    """Owns a single pooled driver plus the state derived from it."""
+
+    def __init__(
+        self,
+        uri: str,
+        auth: Tuple[str, str],
+        database: Optional[str] = None,
+        max_connection_pool_size: int = 50,
+        max_connection_lifetime: int = 300,
+        liveness_check_timeout: float = 30.0,
+        health_check_interval: float = 60.0,
+    ):
+        self.uri = uri
+        self.auth = auth
+        self.database = database
+        self.driver_kwargs = {
+            "max_connection_pool_size": max_connection_pool_size,
+            "max_connection_lifetime": max_connection_lifetime,
+            "liveness_check_timeout": liveness_check_timeout,
+            "keep_alive": True,
+        }
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.RLock()
+        self._driver: Optional[neo4j.Driver] = None
+        self._last_health_check = 0.0
+        self._indexes: Dict[str, bool] = {}
+        self._retrievers: Dict[Hashable, VectorCypherRetriever] = {}
+        self._kg_version: Optional[Tuple[Optional[str], float]] = None
+        self._kg_version_failed_at: Optional[float] = None
+        self._query_counts: Dict[str, int] = {}
+        self.stats = {"drivers_created": 0, "reconnects": 0, "retrievers_built": 0, "retriever_hits": 0}
+
+    def _connect(self) -> neo4j.Driver:
+        logging.info(f"Opening pooled Neo4j driver for {self.uri}")
+        driver = neo4j.GraphDatabase.driver(self.uri, auth=self.auth, **self.driver_kwargs)
+        driver.verify_connectivity()
+        self.stats["drivers_created"] += 1
+        self._last_health_check = time.monotonic()
+        return driver
+
+    def get_driver(self) -> neo4j.Driver:
+        """
+        Return the shared driver, creating it on first use.
+
+        A connectivity check runs at most once per `health_check_interval`;
+        a failed check rebuilds the driver.
+        """
+        with self._lock:
+            if self._driver is None:
+                self._driver = self._connect()
+            elif time.monotonic() - self._last_health_check > self.health_check_interval:
+                if not self.health_check():
+                    self._reconnect()
+            return self._driver
+
+    def health_check(self) -> bool:
+        """Verify the current driver can still reach the database."""
+        with self._lock:
+            if self._driver is None:
+                return False
+            try:
+                self._driver.verify_connectivity()
+            except Exception as e:
+                logging.warning(f"Neo4j health check failed: {e}")
+                return False
+            self._last_health_check = time.monotonic()
+            return True
+
+    def _reconnect(self) -> neo4j.Driver:
+        with self._lock:
+            logging.warning("Rebuilding Neo4j driver after connection failure")
+            self.stats["reconnects"] += 1
+            self._close_driver()
+            self._driver = self._connect()
+            return self._driver
+
+    def _close_driver(self):
+        # Retrievers and index lookups hold on to the old driver, so drop them too
+        self._retrievers.clear()
+        self._indexes.clear()
+        if self._driver is not None:
+            try:
+                self._driver.close()
+            except Exception as e:
+                logging.warning(f"Error closing Neo4j driver: {e}")
+            self._driver = None
+
+    def run(self, work: Callable[[neo4j.Driver], Any]) -> Any:
+        """
+        Run `work(driver)`, rebuilding the driver and retrying once if the
+        connection was lost underneath it.
+        """
+        try:
+            return work(self.get_driver())
+        except RECONNECT_ERRORS as e:
+            logging.warning(f"Neo4j connection lost ({e}); reconnecting and retrying")
+            return work(self._reconnect())
+
+    def note_query(self, cypher: str):
+        """Count one execution of `cypher` for the query-text report."""
+        digest = hashlib.sha1(cypher.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._query_counts[digest] = self._query_counts.get(digest, 0) + 1
+
+    def query_text_report(self) -> Dict[str, float]:
+        """
+        Summarize how many distinct query texts this process has sent.
+
+        A client-side count only: a low number of texts means parameters are
+        kept out of the Cypher, not that the server reused any plan.
+
+        Returns:
+            Dict with distinct query texts, executions and repeated_executions
+        """
+        with self._lock:
+            executions = sum(self._query_counts.values())
+            texts = len(self._query_counts)
+        return {
+            "query_texts": texts,
+            "executions": executions,
+            "repeated_executions": executions - texts,
+        }
+
+    def query(self, cypher: str, parameters: Optional[Dict[str, Any]] = None) -> list:
+        """
+        Run a read query with `parameters` and return its records.
+
+        Args:
+            cypher: A query template; values belong in `parameters`, not the text
+            parameters: Query parameters
+
+        Returns:
+            list: neo4j.Record results
+        """
+        self.note_query(cypher)
+
+        def _read(driver):
+            records, _, _ = driver.execute_query(
+                cypher,
+                parameters or {},
+                database_=self.database,
+                routing_=neo4j.RoutingControl.READ,
+            )
+            return records
+
+        return self.run(_read)
+
+    def index_exists(self, index_name: str) -> bool:
+        """Check if an index exists, querying the database only once per driver."""
+        with self._lock:
+            if index_name in self._indexes:
+                return self._indexes[index_name]
+
+        def _lookup(driver):
+            with driver.session(database=self.database) as session:
+                result = session.run("SHOW INDEXES YIELD name RETURN name")
+                return {row["name"] for row in result}
+
+        names = self.run(_lookup)
+        with self._lock:
+            for name in names:
+                self._indexes[name] = True
+            return self._indexes.setdefault(index_name, False)
+
+    def mark_index(self, index_name: str, exists: bool = True):
+        """Record an index created (or dropped) by this process."""
+        with self._lock:
+            self._indexes[index_name] = exists
+
+    def kg_version(self, max_age: float = 300.0) -> Optional[str]:
+        """
+        Return the version stamp the KG builder writes on the :KGMeta node.
+
+        The value is re-read at most every `max_age` seconds. Returns None if
+        the graph has never been stamped or cannot be reached. A failed read
+        is not retried for KG_VERSION_RETRY_INTERVAL seconds, so requests
+        during an outage don't each wait out a connect timeout.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._kg_version is not None and now - self._kg_version[1] <= max_age:
+                return self._kg_version[0]
+            if self._kg_version_failed_at is not None and now - self._kg_version_failed_at < KG_VERSION_RETRY_INTERVAL:
+                return None
+
+        def _lookup(driver):
+            with driver.session(database=self.database) as session:
+                record = session.run("MATCH (m:KGMeta) RETURN m.version AS version LIMIT 1").single()
+                return record["version"] if record else None
+
+        try:
+            version = self.run(_lookup)
+        except Exception as e:
+            logging.warning(f"Could not read KG version: {e}; not retrying for {KG_VERSION_RETRY_INTERVAL:.0f}s")
+            with self._lock:
+                self._kg_version_failed_at = time.monotonic()
+            return None
+        with self._lock:
+            self._kg_version = (version, time.monotonic())
+            self._kg_version_failed_at = None
+        return version
+
+    def get_retriever(
+        self,
+        key: Hashable,
+        index_name: str,
+        retrieval_query: str,
+        embedder: Any = None,
+    ) -> VectorCypherRetriever:
+        """
+        Return a cached `VectorCypherRetriever` for `key`, building it on a miss.
+
+        Args:
+            key: Cache key, typically (index_name, query template)
+            index_name: Name of the vector index to search
+            retrieval_query: Cypher appended after the vector search
+            embedder: Embedder used for text queries
+
+        Returns:
+            VectorCypherRetriever: A retriever bound to the shared driver
+        """
+        with self._lock:
+            retriever = self._retrievers.get(key)
+            if retriever is not None:
+                self.stats["retriever_hits"] += 1
+                return retriever
+
+        def _build(driver):
+            return VectorCypherRetriever(
+                driver,
+                index_name=index_name,
+                embedder=embedder,
+                retrieval_query=retrieval_query,
+                neo4j_database=self.database,
+            )
+
+        retriever = self.run(_build)
+        with self._lock:
+            self.stats["retrievers_built"] += 1
+            return self._retrievers.setdefault(key, retriever)
+
+    def search(
+        self,
+        key: Hashable,
+        index_name: str,
+        retrieval_query: str,
+        embedder: Any = None,
+        **search_kwargs,
+    ):
+        """
+        Run `get_search_results` on the cached retriever for `key`.
+
+        If the connection drops mid-query the driver is rebuilt, the
+        retriever is recreated against it and the search is retried once.
+        """
+        retriever = self.get_retriever(key, index_name, retrieval_query, embedder)
+        self.note_query(retrieval_query)
+        try:
+            return retriever.get_search_results(**search_kwargs)
+        except RECONNECT_ERRORS as e:
+            logging.warning(f"Neo4j connection lost during search ({e}); reconnecting and retrying")
+            self._reconnect()
+            retriever = self.get_retriever(key, index_name, retrieval_query, embedder)
+            return retriever.get_search_results(**search_kwargs)
+
+    def close(self):
+        """Close the driver and drop all derived state."""
+        with self._lock:
+            self._close_driver()
+
+
+_registries: Dict[Tuple[str, str, Optional[str]], Neo4jRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(cfg) -> Neo4jRegistry:
+    """
+    Return the process-wide registry for the database described by `cfg`.
+
+    Args:
+        cfg: A Config instance exposing URI, AUTH and DATABASE
+
+    Returns:
+        Neo4jRegistry: The shared registry, created on first use
+    """
+    key = (cfg.URI, cfg.AUTH[0], cfg.DATABASE)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = Neo4jRegistry(cfg.URI, cfg.AUTH, database=cfg.DATABASE)
+            _registries[key] = registry
+        return registry
+
+
+def close_all():
+    """Close every registry; used by tests and local scripts."""
+    with _registries_lock:
+        for registry in _registries.values():
+            registry.close()
+        _registries.clear()
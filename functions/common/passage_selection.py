@@ -0,0 +1,162 @@
+"""
+Choose which retrieved passages go into a prompt.
+
+Retrieval returns the top_k Advice nodes, and often two of them say nearly
+the same thing (the same advice extracted from two papers, or a summary and
+its source). Sending both costs prompt tokens and generation time and adds
+nothing. Before packing, the selector:
+
+1. Orders results by score, best first.
+2. Drops any result that is a near-duplicate of a better one. When both
+   results carry embeddings it compares them by cosine similarity;
+   otherwise it compares word shingles of their text (Jaccard).
+3. Packs the survivors into the token budget with `ContextPacker`.
+
+Every call records how many passage tokens it kept out of the prompt.
+"""
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from common.context_packer import ContextPacker, PackedContext
+from common.tokens import count_tokens_batch
+
+SHINGLE_SIZE = 3
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[Tuple[str, ...]]:
+    """Set of `size`-word windows of `text`, case-folded; short texts yield a single window."""
+    words = _WORD.findall(text.casefold())
+    if len(words) <= size:
+        return frozenset([tuple(words)]) if words else frozenset()
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+def order_by_score(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Results sorted by descending score; ties keep their retrieval order."""
+    return sorted(results, key=lambda result: -(result.get("score") or 0.0))
+
+
+def drop_near_duplicates(
+    results: List[Dict[str, Any]],
+    text_threshold: float = 0.8,
+    embedding_threshold: float = 0.97,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Keep each result unless it nearly repeats one kept before it.
+
+    Args:
+        results: Results in priority order
+        text_threshold: Shingle Jaccard similarity at or above which texts are duplicates
+        embedding_threshold: Cosine similarity at or above which embeddings are duplicates
+
+    Returns:
+        Tuple of (kept results in the same order, number dropped)
+    """
+    kept, kept_shingles = [], []
+    for result in results:
+        embedding = result.get("embedding")
+        result_shingles = shingles(result.get("text") or "")
+        duplicate = False
+        for other, other_shingles in zip(kept, kept_shingles):
+            other_embedding = other.get("embedding")
+            if embedding is not None and other_embedding is not None:
+                duplicate = cosine(embedding, other_embedding) >= embedding_threshold
+            else:
+                duplicate = jaccard(result_shingles, other_shingles) >= text_threshold
+            if duplicate:
+                break
+        if not duplicate:
+            kept.append(result)
+            kept_shingles.append(result_shingles)
+    return kept, len(results) - len(kept)
+
+
+class PassageSelector:
+    """
+    Score-ordered, deduplicated, token-budgeted passage selection.
+
+    Args:
+        packer: Packs the selected passages (and any history) into the budget
+        text_threshold: See `drop_near_duplicates`
+        embedding_threshold: See `drop_near_duplicates`
+    """
+
+    def __init__(self, packer: ContextPacker, text_threshold: float = 0.8, embedding_threshold: float = 0.97):
+        self.packer = packer
+        self.text_threshold = text_threshold
+        self.embedding_threshold = embedding_threshold
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "passages_in": 0, "duplicates": 0, "tokens_in": 0, "tokens_saved": 0}
+
+    def select(
+        self,
+        results: List[Dict[str, Any]],
+        format_passages: Callable[[List[Dict[str, Any]]], List[str]],
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> PackedContext:
+        """
+        Order, deduplicate and pack `results`.
+
+        Args:
+            results: Retrieved results with `text` and `score` (and optionally `embedding`)
+            format_passages: Turns results into numbered prompt passages
+            history: Conversation turns to pack alongside, oldest first
+
+        Returns:
+            PackedContext: The kept passages and history, with `duplicates` and
+            `tokens_saved` set for this request
+        """
+        ordered = order_by_score(results)
+        unique, duplicates = drop_near_duplicates(ordered, self.text_threshold, self.embedding_threshold)
+
+        passages = format_passages(unique)
+        packed = self.packer.pack(passages, history)
+        # Measure against what the prompt used to get: every result, in full. The
+        # kept passages' counts are memoized by the packer, so only the dropped ones
+        # are encoded here (numbered after the kept ones, which is off by a token at most)
+        kept = {id(result) for result in unique}
+        dropped = [result for result in ordered if id(result) not in kept]
+        tokens_in = sum(count_tokens_batch(passages, self.packer.model))
+        if dropped:
+            tokens_in += sum(count_tokens_batch(format_passages(dropped), self.packer.model))
+        packed.duplicates = duplicates
+        packed.tokens_saved = max(tokens_in - packed.passage_tokens, 0)
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["passages_in"] += len(results)
+            self.stats["duplicates"] += duplicates
+            self.stats["tokens_in"] += tokens_in
+            self.stats["tokens_saved"] += packed.tokens_saved
+        if duplicates or packed.tokens_saved:
+            logging.info(
+                f"Passage selection kept {len(packed.passages)}/{len(results)} passages "
+                f"({duplicates} near-duplicates, {packed.truncated} truncated), "
+                f"saving {packed.tokens_saved}/{tokens_in} tokens"
+            )
+        return packed
+
+    def report(self) -> Dict[str, float]:
+        """Running totals, plus the share of passage tokens kept out of prompts."""
+        with self._lock:
+            report = dict(self.stats)
+        report["saved_rate"] = round(report["tokens_saved"] / report["tokens_in"], 3) if report["tokens_in"] else 0.0
+        return report
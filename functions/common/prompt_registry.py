@@ -0,0 +1,173 @@
+"""
+Prompt templates loaded once per instance instead of once per request.
+
+A `PromptRegistry` reads a YAML file of named templates at warm-up. It checks
+each template's placeholders against the fields its callers supply, and keeps
+every template pre-parsed into literal and field segments. Rendering is then
+pure string joining: no file reads, no YAML parsing and no format-string
+parsing on the request path.
+
+Templates that are missing from the file, or whose placeholders don't match,
+fall back to the built-in defaults, and the error is logged once at load
+time rather than on every request. An optional daemon thread watches the
+file's mtime and swaps in a re-validated set when it changes.
+"""
+import logging
+import os
+import threading
+import time
+from string import Formatter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import yaml
+
+
+class PromptTemplate:
+    """
+    A format-string template parsed once.
+
+    Args:
+        name: Template name
+        text: Template text using `str.format` placeholders
+        source: Where the text came from ("default" or a file path)
+    """
+
+    def __init__(self, name: str, text: str, source: str = "default"):
+        self.name = name
+        self.text = text
+        self.source = source
+        # (literal, field name, conversion, format spec) per segment
+        self.segments: List[Tuple[str, Optional[str], Optional[str], str]] = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(text):
+            self.segments.append((literal, field_name, conversion, format_spec or ""))
+        self.fields: FrozenSet[str] = frozenset(
+            field_name for _, field_name, _, _ in self.segments if field_name
+        )
+
+    def render(self, **values: Any) -> str:
+        """Same result as `text.format(**values)`, without re-parsing the template."""
+        parts = []
+        for literal, field_name, conversion, format_spec in self.segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            value = values[field_name]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            elif conversion == "s":
+                value = str(value)
+            parts.append(format(value, format_spec))
+        return "".join(parts)
+
+
+def validate_template(template: PromptTemplate, required: FrozenSet[str]) -> Optional[str]:
+    """Return why `template` can't be rendered with exactly the `required` fields, or None if it can."""
+    if any(not field_name.isidentifier() for field_name in template.fields):
+        return f"unsupported placeholders {sorted(f for f in template.fields if not f.isidentifier())}"
+    missing = required - template.fields
+    unknown = template.fields - required
+    if missing or unknown:
+        return f"missing placeholders {sorted(missing)}, unknown placeholders {sorted(unknown)}"
+    return None
+
+
+class PromptRegistry:
+    """
+    Named, validated prompt templates backed by a YAML file.
+
+    Args:
+        path: YAML file mapping template names to template text
+        defaults: Built-in text per template name, used when the file lacks a valid one
+        fields: Placeholders each template must use, by name
+    """
+
+    def __init__(self, path: str, defaults: Dict[str, str], fields: Dict[str, FrozenSet[str]]):
+        self.path = path
+        self.defaults = defaults
+        self.fields = fields
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._watcher: Optional[threading.Thread] = None
+        self.stats = {"loads": 0, "rejected": 0}
+        self._templates: Dict[str, PromptTemplate] = {}
+        self.reload()
+
+    def _build(self, loaded: Dict[str, Any]) -> Dict[str, PromptTemplate]:
+        templates = {}
+        for name, default in self.defaults.items():
+            text = loaded.get(name)
+            if isinstance(text, str) and text.strip():
+                try:
+                    template = PromptTemplate(name, text, source=self.path)
+                    problem = validate_template(template, self.fields[name])
+                except ValueError as e:
+                    # Unbalanced braces and the like
+                    problem = str(e)
+                if problem is None:
+                    templates[name] = template
+                    continue
+                logging.error(f"Prompt '{name}' in {self.path} rejected: {problem}; using the built-in prompt")
+                self.stats["rejected"] += 1
+            templates[name] = PromptTemplate(name, default)
+        return templates
+
+    def reload(self) -> bool:
+        """
+        Re-read the file if its mtime changed since the last load.
+
+        Returns:
+            bool: True if the templates were rebuilt
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        with self._lock:
+            if self.stats["loads"] and mtime == self._mtime:
+                return False
+            loaded = {}
+            if mtime is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        loaded = yaml.safe_load(f) or {}
+                    if not isinstance(loaded, dict):
+                        raise ValueError(f"expected a mapping of prompt names, got {type(loaded).__name__}")
+                except (OSError, yaml.YAMLError, ValueError) as e:
+                    logging.error(f"Could not load prompts from {self.path}: {e}; using built-in prompts")
+                    loaded = {}
+            else:
+                logging.info(f"No prompt file at {self.path}; using built-in prompts")
+            templates = self._build(loaded)
+            self._templates = templates
+            self._mtime = mtime
+            self.stats["loads"] += 1
+        sources = ", ".join(f"{name} ({template.source})" for name, template in templates.items())
+        logging.info(f"Loaded prompts: {sources}")
+        return True
+
+    def get(self, name: str) -> PromptTemplate:
+        """Return the current template for `name`; never touches the file."""
+        return self._templates[name]
+
+    def from_file(self, name: str) -> bool:
+        """Whether `name` is currently served from the prompt file rather than the built-in default."""
+        return self._templates[name].source != "default"
+
+    def watch(self, interval: float = 30.0):
+        """Start a daemon thread that reloads the file whenever its mtime changes."""
+        with self._lock:
+            if self._watcher is not None:
+                return
+
+            def _poll():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        logging.warning(f"Prompt reload failed: {e}")
+
+            self._watcher = threading.Thread(target=_poll, name="prompt-watcher", daemon=True)
+            self._watcher.start()
@@ -0,0 +1,326 @@
+"""
+Client-side request and token budgets for OpenAI calls, with priorities.
+
+Interactive `get_chat` replies and background `auto_respond_post` replies
+share one RPM/TPM quota. When a burst of community posts arrives, the
+background calls should wait rather than push a parent's chat reply into
+429s and backoff. Each model gets two token buckets, one for requests per
+minute and one for tokens per minute. Callers queue in (priority, arrival)
+order, and only the head of a model's queue may take from its buckets. A
+lower priority number is served first.
+
+Token use is estimated before the call: the prompt tokens plus
+`max_tokens`. `Lease.settle` corrects the bucket with the real usage
+afterwards.
+
+The limiter only sees one instance's traffic. Set the limits to this
+instance's share of the organization's quota.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.tokens import count_message_tokens
+
+INTERACTIVE = 0
+BACKGROUND = 10
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+# Completion budget assumed when a request doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+# Longest a blocked caller sleeps before re-checking; wakeups normally come from notify
+MAX_WAIT = 1.0
+# Async callers can't be notified, so they re-check at least this often
+ASYNC_POLL = 0.05
+
+
+class TokenBucket:
+    """
+    Holds up to `capacity` units and refills at `rate` units per second.
+
+    The level may go negative when a settled lease used more than it reserved.
+    """
+
+    def __init__(self, capacity: float, rate: float, clock: Callable[[], float]):
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.level = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        # A request larger than the whole bucket may go once the bucket is full
+        needed = min(amount, self.capacity) - self.level
+        return max(needed / self.rate, 0.0)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ModelBudget:
+    """The request and token buckets for one model; either may be absent."""
+
+    def __init__(self, rpm: Optional[float], tpm: Optional[float], clock: Callable[[], float]):
+        self.requests = TokenBucket(rpm, rpm / 60.0, clock) if rpm else None
+        self.tokens = TokenBucket(tpm, tpm / 60.0, clock) if tpm else None
+
+    def delay(self, tokens: int) -> float:
+        delays = [0.0]
+        if self.requests is not None:
+            delays.append(self.requests.delay(1))
+        if self.tokens is not None:
+            delays.append(self.tokens.delay(tokens))
+        return max(delays)
+
+    def take(self, tokens: int):
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+
+class Lease:
+    """A granted reservation; `settle` replaces the token estimate with real usage."""
+
+    def __init__(self, limiter: "RateLimiter", model: str, tokens: int, waited: float):
+        self.limiter = limiter
+        self.model = model
+        self.tokens = tokens
+        self.waited = waited
+
+    def settle(self, actual_tokens: Optional[int]):
+        """Charge or refund the difference between the estimate and `actual_tokens`."""
+        if actual_tokens is None:
+            return
+        self.limiter._adjust(self.model, self.tokens - actual_tokens)
+        self.tokens = actual_tokens
+
+
+class RateLimiter:
+    """
+    Priority-ordered RPM/TPM limiter per model.
+
+    Args:
+        limits: {model: (requests per minute, tokens per minute)}. Models not
+            listed, and None limits, are not throttled but are still measured
+        clock: Monotonic time source
+        max_wait: Longest a blocked caller waits between re-checks
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[Optional[float], Optional[float]]],
+        clock: Callable[[], float] = time.monotonic,
+        max_wait: float = MAX_WAIT,
+    ):
+        self.clock = clock
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._budgets = {model: ModelBudget(rpm, tpm, clock) for model, (rpm, tpm) in limits.items()}
+        self._queues: Dict[str, List[Tuple[int, int]]] = {}
+        self._sequence = itertools.count()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def _priority_stats(self, priority: int) -> Dict[str, float]:
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        return self.stats.setdefault(
+            name, {"granted": 0, "waiting": 0, "max_waiting": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        )
+
+    def _enqueue(self, model: str, priority: int) -> Tuple[int, int]:
+        entry = (priority, next(self._sequence))
+        heapq.heappush(self._queues.setdefault(model, []), entry)
+        stats = self._priority_stats(priority)
+        stats["waiting"] += 1
+        stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+        return entry
+
+    def _try_grant(self, model: str, tokens: int, entry: Tuple[int, int]) -> Optional[float]:
+        """
+        Grant `entry` if it heads its queue and the budget allows it.
+
+        Returns:
+            None if granted, otherwise seconds to wait before checking again
+        """
+        queue = self._queues[model]
+        if queue[0] != entry:
+            return self.max_wait
+        budget = self._budgets.get(model)
+        delay = budget.delay(tokens) if budget is not None else 0.0
+        if delay > 0:
+            return min(delay, self.max_wait)
+        if budget is not None:
+            budget.take(tokens)
+        heapq.heappop(queue)
+        # The next caller in line may be able to go now
+        self._cond.notify_all()
+        return None
+
+    def _granted(self, model: str, tokens: int, priority: int, start: float) -> Lease:
+        waited = self.clock() - start
+        stats = self._priority_stats(priority)
+        stats["waiting"] -= 1
+        stats["granted"] += 1
+        stats["wait_seconds"] += waited
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+        if waited > 0:
+            logging.info(f"Rate limiter held a {PRIORITY_NAMES.get(priority, priority)} {model} call for {waited:.2f}s")
+        return Lease(self, model, tokens, waited)
+
+    def _abandon(self, model: str, entry: Tuple[int, int]):
+        queue = self._queues[model]
+        if entry in queue:
+            queue.remove(entry)
+            heapq.heapify(queue)
+            self._priority_stats(entry[0])["waiting"] -= 1
+            self._cond.notify_all()
+
+    def acquire(self, model: str, tokens: int, priority: int = INTERACTIVE) -> Lease:
+        """
+        Block until a request of `tokens` estimated tokens may be sent to `model`.
+
+        Args:
+            model: Model the request is for
+            tokens: Estimated prompt plus completion tokens
+            priority: Lower goes first (INTERACTIVE, BACKGROUND)
+
+        Returns:
+            Lease: Settle it with the real token usage after the call
+        """
+        start = self.clock()
+        with self._cond:
+            entry = self._enqueue(model, priority)
+            try:
+                while True:
+                    wait = self._try_grant(model, tokens, entry)
+                    if wait is None:
+                        return self._granted(model, tokens, priority, start)
+                    self._cond.wait(wait)
+            except BaseException:
+                self._abandon(model, entry)
+                raise
+
+    async def acquire_async(self, model: str, tokens: int, priority: int = INTERACTIVE) -> Lease:
+        """Like `acquire`, but waits with asyncio.sleep so the event loop keeps running."""
+        start = self.clock()
+        with self._cond:
+            entry = self._enqueue(model, priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_grant(model, tokens, entry)
+                    if wait is None:
+                        return self._granted(model, tokens, priority, start)
+                await asyncio.sleep(min(wait, ASYNC_POLL))
+        except BaseException:
+            with self._cond:
+                self._abandon(model, entry)
+            raise
+
+    def _adjust(self, model: str, refund: int):
+        with self._cond:
+            budget = self._budgets.get(model)
+            if budget is not None and budget.tokens is not None:
+                if refund >= 0:
+                    budget.tokens.give(refund)
+                else:
+                    budget.tokens.take(-refund)
+            self._cond.notify_all()
+
+    def notify(self):
+        """Wake blocked callers to re-check their budgets (after the clock moved, in tests)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def queue_depth(self, model: Optional[str] = None) -> int:
+        """Callers currently waiting, for one model or all."""
+        with self._cond:
+            if model is not None:
+                return len(self._queues.get(model, []))
+            return sum(len(queue) for queue in self._queues.values())
+
+    def report(self) -> Dict[str, Any]:
+        """Per-priority grants, queue depth and wait times, plus current queue depth."""
+        with self._cond:
+            report = {name: dict(stats) for name, stats in self.stats.items()}
+            depth = sum(len(queue) for queue in self._queues.values())
+        for stats in report.values():
+            stats["avg_wait_seconds"] = round(stats["wait_seconds"] / stats["granted"], 3) if stats["granted"] else 0.0
+        report["queue_depth"] = depth
+        return report
+
+    @staticmethod
+    def estimate_tokens(request: Dict[str, Any]) -> int:
+        """Prompt tokens of a chat completion request plus its completion budget."""
+        model = request.get("model", "gpt-4o")
+        completion = request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+        return count_message_tokens(request.get("messages", []), model) + completion
+
+    def chat_completion(self, client, priority: int = INTERACTIVE, **request: Any):
+        """
+        Send `client.chat.completions.create(**request)` once the budget allows it.
+
+        Args:
+            client: OpenAI client (or anything with the same `chat.completions.create`)
+            priority: Queue priority for this call
+            **request: Chat completion arguments
+
+        Returns:
+            The API response
+        """
+        lease = self.acquire(request["model"], self.estimate_tokens(request), priority)
+        response = client.chat.completions.create(**request)
+        usage = getattr(response, "usage", None)
+        lease.settle(getattr(usage, "total_tokens", None))
+        return response
+
+    async def achat_completion(self, client, priority: int = INTERACTIVE, **request: Any):
+        """Async version of `chat_completion` for an AsyncOpenAI client."""
+        lease = await self.acquire_async(request["model"], self.estimate_tokens(request), priority)
+        response = await client.chat.completions.create(**request)
+        usage = getattr(response, "usage", None)
+        lease.settle(getattr(usage, "total_tokens", None))
+        return response
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """
+    Parse "model=rpm:tpm,model=rpm:tpm"; an empty rpm or tpm means unlimited.
+
+    Example: "gpt-4o=500:30000,text-embedding-ada-002=3000:"
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm) if rpm.strip() else None, float(tpm) if tpm.strip() else None)
+    return limits
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the instance's limiter, configured from OPENAI_RATE_LIMITS (unthrottled if unset)."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(parse_limits(os.getenv("OPENAI_RATE_LIMITS", "")))
+        return _limiter
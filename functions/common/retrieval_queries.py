@@ -0,0 +1,62 @@
+"""
+Cypher shared by the chat and community retrievers.
+
+Each Advice node's facets are gathered with one pattern comprehension per
+relationship type. Chaining OPTIONAL MATCH clauses instead would produce a
+row for every combination of topic x subtopic x age x style x ... before
+`collect(DISTINCT ...)` folds them back. That cost grows multiplicatively
+with facet counts. Pattern comprehensions keep exactly one row per Advice.
+"""
+
+# Anchors the details query on the nodes returned by the vector index
+VECTOR_ANCHOR = """
+        WITH node AS a, score
+        WHERE a.name IS NOT NULL OR a.content IS NOT NULL
+"""
+
+
+def advice_details_query(filter_clause: str = "") -> str:
+    """
+    Build the Cypher that expands scored Advice nodes (`a`, `score`) into results.
+
+    Args:
+        filter_clause (str): Optional WHERE clause over the facet name lists
+            (topics, subtopics, age_groups, guidance_styles, ...)
+
+    Returns:
+        str: Cypher to append after a clause binding `a` and `score`; the
+            result count comes from the `$top_k` parameter
+    """
+    return f"""
+        // One list per facet, without multiplying rows
+        WITH a, score,
+             [(a)-[:HAS_TOPIC]->(topic:Topic) | topic.name] AS topics,
+             [(a)-[:HAS_SUBTOPIC]->(subtopic:SubTopic) | subtopic.name] AS subtopics,
+             [(a)-[:RECOMMENDED_FOR]->(age:AgeGroup) | age.name] AS age_groups,
+             [(a)-[:USES_STYLE]->(style:GuidanceStyle) | style.name] AS guidance_styles,
+             [(a)-[:HAS_ACTIONABLE_ADVICE]->(advice:ActionableAdvice) | coalesce(advice.content, advice.name)] AS actionable_advice,
+             [(a)-[:HAS_SCENARIO_NOTE]->(note:ScenarioNote) | coalesce(note.name, '')] AS scenario_notes,
+             [(a)-[:WRITTEN_BY]->(author:Author) | author.name] AS authors
+
+        // Apply filters if specified
+        {filter_clause}
+
+        // Return comprehensive information about the advice
+        RETURN
+            a.id AS id,
+            // Use content property if available, otherwise fall back to name
+            coalesce(a.content, a.name) AS text,
+            topics,
+            subtopics,
+            age_groups,
+            guidance_styles,
+            actionable_advice,
+            scenario_notes,
+            authors,
+            // Boost actionable advice and advice with scenario notes
+            score
+                + CASE WHEN size(actionable_advice) > 0 THEN 0.2 ELSE 0 END
+                + CASE WHEN size(scenario_notes) > 0 THEN 0.1 ELSE 0 END AS score
+        ORDER BY score DESC
+        LIMIT $top_k
+        """
@@ -0,0 +1,211 @@
+"""
+Deadline-bounded retries for OpenAI calls.
+
+Every call gets an overall deadline. Within it, failures the API marks as
+transient are retried with exponential backoff and full jitter:
+- rate limits, timeouts and dropped connections;
+- 408, 409, 429 and 5xx responses.
+A server's Retry-After hint is honored as a floor on the delay. Other
+errors are fatal and raised at once: bad requests, authentication,
+permissions, not found and unprocessable.
+
+Nothing here uses signals, so the engine works from any thread. It has a
+blocking entry point and an asyncio one, and records attempt, retry and
+latency statistics.
+"""
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import openai
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.InternalServerError,
+)
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call did not succeed before its deadline; the last error is chained as `__cause__`."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether `error` is transient and the same request may succeed if sent again."""
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait (retry-after-ms or Retry-After), if it said."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryEngine:
+    """
+    Runs a call until it succeeds, fails fatally or runs out of time.
+
+    The wrapped function receives the seconds left before the deadline and
+    should use them as its request timeout, so a single slow attempt cannot
+    overrun the deadline.
+
+    Args:
+        deadline: Default overall seconds per call, across all attempts
+        base_delay: Backoff ceiling for the first retry; doubles per retry
+        max_delay: Largest backoff ceiling
+        max_attempts: Optional cap on attempts in addition to the deadline
+        clock: Monotonic time source
+        sleep: Blocking sleep, used by `call`
+        async_sleep: Awaitable sleep, used by `acall`
+        rand: Uniform [0, 1) source for jitter
+    """
+
+    def __init__(
+        self,
+        deadline: float = 120.0,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        max_attempts: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        rand: Callable[[], float] = random.random,
+    ):
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self.rand = rand
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0, "attempts": 0, "retries": 0, "successes": 0,
+            "fatal_errors": 0, "deadline_exceeded": 0,
+            "total_latency": 0.0, "max_latency": 0.0, "backoff_seconds": 0.0,
+        }
+
+    def _count(self, **increments: float):
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def _finish(self, start: float, outcome: str):
+        latency = self.clock() - start
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats["total_latency"] += latency
+            self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+
+    def _next_delay(self, error: BaseException, retry: int, start: float, deadline: float) -> float:
+        """
+        Delay before retry number `retry`, or raise if `error` must not be retried.
+        """
+        if not is_retryable(error):
+            self._finish(start, "fatal_errors")
+            raise error
+        if self.max_attempts is not None and retry >= self.max_attempts:
+            self._finish(start, "deadline_exceeded")
+            raise DeadlineExceeded(f"Gave up after {retry} attempts") from error
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (retry - 1)))
+        delay = self.rand() * ceiling
+        hinted = retry_after(error)
+        if hinted is not None:
+            delay = max(delay, hinted)
+        remaining = start + deadline - self.clock()
+        if delay >= remaining:
+            self._finish(start, "deadline_exceeded")
+            raise DeadlineExceeded(
+                f"No time left for retry {retry} (needs {delay:.2f}s, {max(remaining, 0):.2f}s left)"
+            ) from error
+        logging.warning(f"Retrying in {delay:.2f}s after {type(error).__name__}: {error}")
+        self._count(retries=1, backoff_seconds=delay)
+        return delay
+
+    def call(self, fn: Callable[[float], Any], deadline: Optional[float] = None) -> Any:
+        """
+        Call `fn(seconds_left)` with retries, blocking the calling thread.
+
+        Args:
+            fn: The request; takes the remaining seconds to use as its timeout
+            deadline: Overall seconds for this call; defaults to the engine's
+
+        Returns:
+            Whatever `fn` returns on its first successful attempt
+
+        Raises:
+            DeadlineExceeded: If the deadline (or max_attempts) ran out
+            Exception: The first fatal error `fn` raised
+        """
+        deadline = self.deadline if deadline is None else deadline
+        start = self.clock()
+        self._count(calls=1)
+        retry = 0
+        while True:
+            self._count(attempts=1)
+            try:
+                result = fn(max(start + deadline - self.clock(), 0.0))
+            except Exception as error:
+                retry += 1
+                self.sleep(self._next_delay(error, retry, start, deadline))
+                continue
+            self._finish(start, "successes")
+            return result
+
+    async def acall(self, fn: Callable[[float], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """
+        Async version of `call`; `fn(seconds_left)` returns an awaitable and
+        backoff sleeps don't block the event loop.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        start = self.clock()
+        self._count(calls=1)
+        retry = 0
+        while True:
+            self._count(attempts=1)
+            try:
+                result = await fn(max(start + deadline - self.clock(), 0.0))
+            except Exception as error:
+                retry += 1
+                await self.async_sleep(self._next_delay(error, retry, start, deadline))
+                continue
+            self._finish(start, "successes")
+            return result
+
+    def report(self) -> Dict[str, float]:
+        """Counters plus average latency per call and retries per call."""
+        with self._lock:
+            report = dict(self.stats)
+        finished = report["successes"] + report["fatal_errors"] + report["deadline_exceeded"]
+        report["avg_latency"] = round(report["total_latency"] / finished, 3) if finished else 0.0
+        report["retries_per_call"] = round(report["retries"] / report["calls"], 3) if report["calls"] else 0.0
+        return report
@@ -0,0 +1,83 @@
+"""
+Incremental delivery of a streamed completion into a Firestore document.
+
+Clients already listen to the chat message collection, so updating the reply
+document while tokens arrive lets parents read the answer as it is
+written. Firestore sustains about one write per second on a single
+document. Partial content is therefore flushed as soon as the first tokens
+arrive and then at most once per `min_interval`. The document is finalized
+with the complete text at the end.
+"""
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class StreamingMessageWriter:
+    """
+    Writes a reply into `doc_ref` while it is being generated.
+
+    Args:
+        doc_ref: Firestore DocumentReference for the reply message
+        fields: Fields stored with the message besides `content` (sender, type, timestamp)
+        min_interval: Minimum seconds between partial-content writes
+        clock: Monotonic time source; replaceable in tests
+    """
+
+    def __init__(
+        self,
+        doc_ref,
+        fields: Dict[str, Any],
+        min_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.doc_ref = doc_ref
+        self.fields = fields
+        self.min_interval = min_interval
+        self.clock = clock
+        self._created = False
+        self._last_flush: Optional[float] = None
+        self.stats = {"writes": 0, "time_to_first_token": None, "seconds": None}
+
+    def _write(self, content: str, streaming: bool):
+        if self._created:
+            self.doc_ref.update({"content": content, "streaming": streaming})
+        else:
+            self.doc_ref.set({**self.fields, "content": content, "streaming": streaming})
+            self._created = True
+        self.stats["writes"] += 1
+        self._last_flush = self.clock()
+
+    def write_stream(self, chunks: Iterable[str]) -> str:
+        """
+        Consume text chunks, flushing partial content at a bounded rate.
+
+        Args:
+            chunks: Text deltas in generation order
+
+        Returns:
+            str: The complete text
+        """
+        start_time = self.clock()
+        parts = []
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if self.stats["time_to_first_token"] is None:
+                    self.stats["time_to_first_token"] = self.clock() - start_time
+                parts.append(chunk)
+                if self._last_flush is None or self.clock() - self._last_flush >= self.min_interval:
+                    self._write("".join(parts), streaming=True)
+        except Exception:
+            # Don't leave a half-written reply marked as still streaming
+            if self._created:
+                self._write("".join(parts), streaming=False)
+            raise
+        self.stats["seconds"] = self.clock() - start_time
+        return "".join(parts)
+
+    def finalize(self, content: str):
+        """Write the complete reply and mark the message as no longer streaming."""
+        self._write(content, streaming=False)
+        logging.info(f"Streamed reply of {len(content)} chars: {self.stats}")
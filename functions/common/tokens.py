@@ -0,0 +1,152 @@
+"""
+Token counting for prompt budgets.
+
+Importable from the deployed functions, and also used by the repo-root
+api.py. Prompt assembly counts tokens on every request, so it is kept cheap:
+- The tiktoken encoding is resolved once per model.
+- Counts of recently seen strings are memoized. The same Advice passages
+  and chat turns come back request after request.
+- Batches are encoded in one call across tiktoken's native threads.
+
+Chat messages are counted the way the API bills them: the content plus a
+fixed overhead per message and for priming the reply.
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-4o"
+FALLBACK_ENCODING = "cl100k_base"
+COUNT_CACHE_SIZE = 8192
+# Every reply is primed with <|start|>assistant<|message|>
+REPLY_PRIMING_TOKENS = 3
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Return the tiktoken encoding for `model`, falling back to cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+
+def message_overhead(model: str) -> Tuple[int, int]:
+    """(tokens per message, tokens per `name` field) for `model`'s chat format."""
+    if model == "gpt-3.5-turbo-0301":
+        # <|start|>{role/name}\n{content}<|end|>\n; a name replaces the role
+        return 4, -1
+    return 3, 1
+
+
+_counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def _cached_count(key: Tuple[str, str]) -> Optional[int]:
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+        return count
+
+
+def _remember(key: Tuple[str, str], count: int):
+    with _counts_lock:
+        _counts[key] = count
+        _counts.move_to_end(key)
+        if len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Number of tokens `text` encodes to for `model`."""
+    key = (model, text)
+    count = _cached_count(key)
+    if count is None:
+        # encode_ordinary: text that looks like a special token is still just text
+        count = len(get_encoding(model).encode_ordinary(text))
+        _remember(key, count)
+    return count
+
+
+def count_tokens_batch(texts: Sequence[str], model: str = DEFAULT_MODEL, num_threads: int = 8) -> List[int]:
+    """
+    Count tokens for many strings at once.
+
+    Strings already in the count cache are not re-encoded; the rest are
+    encoded together on tiktoken's thread pool.
+
+    Args:
+        texts: Strings to count
+        model: Model whose tokenizer does the counting
+        num_threads: tiktoken worker threads for the uncached strings
+
+    Returns:
+        List[int]: Token counts aligned with `texts`
+    """
+    counts: List[int] = [0] * len(texts)
+    missing: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        count = None if text in missing else _cached_count((model, text))
+        if count is None:
+            missing.setdefault(text, []).append(i)
+        else:
+            counts[i] = count
+    if missing:
+        unique = list(missing)
+        encoded = get_encoding(model).encode_ordinary_batch(unique, num_threads=num_threads)
+        for text, tokens in zip(unique, encoded):
+            _remember((model, text), len(tokens))
+            for i in missing[text]:
+                counts[i] = len(tokens)
+    return counts
+
+
+def count_message_tokens(messages: Sequence[Dict[str, str]], model: str = DEFAULT_MODEL) -> int:
+    """
+    Tokens a chat completion request's `messages` use, as the API counts them.
+
+    Args:
+        messages: Dicts with `role` and `content`, optionally `name`
+        model: Model the request is for
+
+    Returns:
+        int: Prompt tokens including per-message and reply-priming overhead
+    """
+    per_message, per_name = message_overhead(model)
+    texts = []
+    names = 0
+    for message in messages:
+        for key, value in message.items():
+            texts.append(str(value))
+            if key == "name":
+                names += 1
+    return (
+        sum(count_tokens_batch(texts, model))
+        + per_message * len(messages)
+        + per_name * names
+        + REPLY_PRIMING_TOKENS
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """
+    Keep the first `max_tokens` tokens of `text`.
+
+    Args:
+        text: Text to shorten
+        max_tokens: Number of leading tokens to keep
+        model: Model whose tokenizer defines the boundary
+
+    Returns:
+        str: `text` unchanged if it fits, otherwise its decoded prefix
+    """
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max(max_tokens, 0)])
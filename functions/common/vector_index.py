@@ -0,0 +1,233 @@
+"""
+In-process vector index over Advice embeddings.
+
+The corpus is small enough to hold in memory, so a warm instance can rank
+Advice without a network hop to the Neo4j vector index. At warm-up every
+Advice id, embedding and facet list is loaded once. The unit-normalized
+embeddings are stacked into one contiguous float32 matrix, and a query is
+ranked with a single matrix-vector product.
+
+Exact search is the default. For large corpora an IVF-style approximate mode
+clusters the rows with k-means and only scores the `nprobe` clusters closest
+to the query.
+
+Results have the same fields and scores as the Cypher retrieval query
+(common/retrieval_queries.py): Neo4j's cosine score (1 + cos) / 2 plus the
+actionable-advice and scenario-note boosts.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from common.kg_snapshot import KGSnapshot, fetch_advice
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class InMemoryVectorIndex:
+    """
+    Exact (or IVF-approximate) cosine top-k over a fixed set of Advice rows.
+
+    Args:
+        rows: Advice metadata, one dict per row with the retrieval query's fields
+        embeddings: Matrix (or sequence of vectors) aligned with `rows`
+        approximate: Search only the clusters nearest the query instead of every row
+        nlist: Number of k-means clusters in approximate mode (default sqrt(n))
+        nprobe: Clusters scored per query in approximate mode
+        version: KG version the rows were loaded from
+        normalized: The embeddings are already unit-length float32 (e.g. a
+            memory-mapped snapshot) and are used as-is, without a copy
+    """
+
+    def __init__(
+        self,
+        rows: List[Dict[str, Any]],
+        embeddings,
+        approximate: bool = False,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        version: Optional[str] = None,
+        normalized: bool = False,
+    ):
+        self.rows = rows
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            # An empty graph yields no vectors at all
+            matrix = matrix.reshape(len(rows), -1) if len(rows) else np.empty((0, 0), dtype=np.float32)
+        self.matrix = np.ascontiguousarray(matrix if normalized else _normalize_rows(matrix))
+        if len(rows) != self.matrix.shape[0]:
+            raise ValueError(f"{len(rows)} rows but {self.matrix.shape[0]} embeddings")
+        self.version = version
+        # Boosts depend only on the row, so compute them once
+        self.boosts = np.array(
+            [(0.2 if row.get("actionable_advice") else 0.0) + (0.1 if row.get("scenario_notes") else 0.0)
+             for row in rows],
+            dtype=np.float32,
+        )
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        if approximate and len(rows) > 0:
+            self._build_ivf(nlist or max(1, int(np.sqrt(len(rows)))))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _build_ivf(self, nlist: int, iterations: int = 10, seed: int = 0):
+        """Cluster the rows with spherical k-means and keep one row list per cluster."""
+        nlist = min(nlist, len(self.rows))
+        rng = np.random.default_rng(seed)
+        centroids = self.matrix[rng.choice(len(self.rows), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(self.matrix @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = self.matrix[assignment == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize_rows(centroids)
+        assignment = np.argmax(self.matrix @ centroids.T, axis=1)
+        self.centroids = np.ascontiguousarray(centroids)
+        self.lists = [np.flatnonzero(assignment == c) for c in range(nlist)]
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self.centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self.lists))
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[c] for c in nearest])
+
+    def search(self, query_vector: Sequence[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the `top_k` rows most similar to `query_vector`.
+
+        Like the Cypher retrieval path, the top_k rows by vector similarity are
+        chosen first and then re-ordered by their boosted score.
+
+        Args:
+            query_vector: Query embedding
+            top_k: Number of results
+
+        Returns:
+            List[Dict[str, Any]]: Row dicts with a `score` field and their unit
+            `embedding` (a view into the index matrix), best first
+        """
+        if not self.rows or top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        candidates = self._candidates(query)
+        matrix = self.matrix if candidates is None else self.matrix[candidates]
+        similarities = matrix @ query
+
+        k = min(top_k, len(similarities))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        scores = (1.0 + similarities[best]) / 2.0
+        positions = best if candidates is None else candidates[best]
+        final = scores + self.boosts[positions]
+
+        results = []
+        for i in np.argsort(-final, kind="stable"):
+            row = dict(self.rows[positions[i]])
+            row["score"] = float(final[i])
+            row["embedding"] = self.matrix[positions[i]]
+            results.append(row)
+        return results
+
+    @classmethod
+    def load(cls, registry, **kwargs) -> "InMemoryVectorIndex":
+        """
+        Load every embedded Advice node from Neo4j.
+
+        Args:
+            registry: Neo4jRegistry to read through
+            **kwargs: Passed to the constructor (approximate, nlist, nprobe)
+
+        Returns:
+            InMemoryVectorIndex: The loaded index, tagged with the current KG version
+        """
+        start_time = time.perf_counter()
+        rows, embeddings, version = fetch_advice(registry)
+        index = cls(rows, embeddings, version=version, **kwargs)
+        logging.info(
+            f"Loaded {len(index)} Advice embeddings into memory in {time.perf_counter() - start_time:.2f}s "
+            f"({index.matrix.nbytes / 1e6:.1f} MB, approximate={index.centroids is not None})"
+        )
+        return index
+
+
+_index: Optional[InMemoryVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def _index_options() -> Dict[str, Any]:
+    nlist = os.getenv("VECTOR_INDEX_NLIST")
+    return {
+        "approximate": os.getenv("VECTOR_INDEX_APPROXIMATE", "0") == "1",
+        "nlist": int(nlist) if nlist else None,
+        "nprobe": int(os.getenv("VECTOR_INDEX_NPROBE", 8)),
+    }
+
+
+def _open_snapshot(path: Optional[str]) -> Optional[KGSnapshot]:
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return KGSnapshot.open(path)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not open KG snapshot {path}: {e}")
+        return None
+
+
+def _snapshot_index(snapshot: KGSnapshot) -> InMemoryVectorIndex:
+    # Snapshot embeddings are stored unit-normalized, so the memory map is used as-is
+    return InMemoryVectorIndex(
+        snapshot.rows, snapshot.embeddings, version=snapshot.version, normalized=True, **_index_options()
+    )
+
+
+def get_vector_index(registry) -> InMemoryVectorIndex:
+    """
+    Return the process-wide in-memory index, loading it on first use.
+
+    When KG_SNAPSHOT_PATH points at a snapshot whose version matches the
+    graph, the index is memory-mapped from it instead of read from Neo4j.
+    If the graph is unreachable, the current index (or the snapshot, even if
+    stale) keeps serving. The index is reloaded when the KG builder stamps a
+    new graph version. VECTOR_INDEX_APPROXIMATE=1 enables the IVF mode,
+    tuned by VECTOR_INDEX_NLIST and VECTOR_INDEX_NPROBE.
+    """
+    global _index
+    # None when the graph was never stamped or cannot be reached; after a failed
+    # read the registry answers None at once until its retry interval passes
+    version = registry.kg_version()
+    with _index_lock:
+        if _index is not None and (version is None or _index.version == version):
+            return _index
+
+        snapshot = _open_snapshot(os.getenv("KG_SNAPSHOT_PATH"))
+        if snapshot is not None and (version is None or snapshot.version == version):
+            _index = _snapshot_index(snapshot)
+            return _index
+
+        try:
+            _index = InMemoryVectorIndex.load(registry, **_index_options())
+        except Exception as e:
+            if snapshot is None:
+                raise
+            logging.warning(
+                f"Could not load Advice from Neo4j ({e}); serving snapshot version {snapshot.version} "
+                f"although the graph is at {version}"
+            )
+            _index = _snapshot_index(snapshot)
+        return _index
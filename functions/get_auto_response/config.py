@@ -23,6 +23,15 @@ class Config:
         self.openai_embedding_version = "2023-05-15"
         self.embedding_model_name = "text-embedding-ada-002"
         self.model_name = "gpt-4o-mini"
+        # Tokens of retrieved passages allowed in a community prompt
+        self.context_token_budget = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000))
+        # Word-shingle Jaccard similarity at which a retrieved passage counts as a near-duplicate
+        self.passage_dedup_threshold = float(os.getenv('PASSAGE_DEDUP_THRESHOLD', 0.8))
+        # Community prompt templates, read at warm-up; checked for edits every interval seconds (0 disables)
+        self.prompts_path = os.getenv('PROMPTS_PATH', os.path.join(root_dir, 'data', 'prompts', 'prompts.yaml'))
+        self.prompt_reload_interval = float(os.getenv('PROMPT_RELOAD_INTERVAL', 30))
+        # Community answers generated at once by a batch auto-response job
+        self.auto_response_concurrency = int(os.getenv('AUTO_RESPONSE_CONCURRENCY', 4))
 
         assert self.URI, "NEO4J_URI is not set"
         assert self.AUTH[1], "NEO4J_PASSWORD is not set"
@@ -6,13 +6,21 @@ import os
 import logging 
 import openai
 import neo4j
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 # Add the parent directory to the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 # Import the necessary modules
-from get_auto_response.retriever_community import run_graphrag_retrieval_with_prompt
+from get_auto_response.retriever_community import (
+    batch_search,
+    cfg,
+    embedder,
+    generate_answer_from_chunks_with_post,
+    run_graphrag_retrieval_with_prompt,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -41,4 +49,74 @@ def getAutoResponse(postTitle, postContent):
     )
 
     print("Generated auto-response")
-    return response
\ No newline at end of file
+    return response
+
+
+def getAutoResponses(posts, max_concurrency=None, vectors=None):
+    """
+    Generate auto-responses for many community posts as one job.
+
+    Post embeddings are computed in batched requests (one unless the batch
+    exceeds the per-request bounds) and the vector lookups run as one
+    UNWIND query. Generations then run concurrently, at most
+    `max_concurrency` at a time, at background rate-limiter priority.
+
+    Args:
+        posts (list): Dicts with "postTitle" and "postContent"
+        max_concurrency (int, optional): Generations in flight at once;
+            defaults to AUTO_RESPONSE_CONCURRENCY
+        vectors (list, optional): Precomputed query embeddings aligned with `posts`
+
+    Returns:
+        tuple: (responses, report). responses[i] is the answer for posts[i],
+            or None if its generation failed. report has per-post latency and
+            total throughput.
+    """
+    start_time = time.perf_counter()
+    queries = [f"{post['postTitle']} {post['postContent']}" for post in posts]
+    print(f"Generating auto-responses for {len(posts)} posts")
+
+    if vectors is None:
+        vectors = embedder.embed_documents(queries)
+    embedded_at = time.perf_counter()
+
+    results = batch_search(vectors)
+    retrieved_at = time.perf_counter()
+
+    def generate(i):
+        post = posts[i]
+        generation_start = time.perf_counter()
+        response = generate_answer_from_chunks_with_post(
+            results[i], queries[i], post["postTitle"], post["postContent"]
+        )
+        return response, time.perf_counter() - generation_start
+
+    responses = [None] * len(posts)
+    per_post = [{"post": i} for i in range(len(posts))]
+    workers = max(1, min(max_concurrency or cfg.auto_response_concurrency, len(posts) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auto-response") as pool:
+        futures = {pool.submit(generate, i): i for i in range(len(posts))}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                responses[i], generation_seconds = future.result()
+                per_post[i]["generation_seconds"] = round(generation_seconds, 3)
+            except Exception as e:
+                logging.error(f"Auto-response for post {i} failed: {e}")
+                per_post[i]["error"] = str(e)
+            # Time from the start of the job until this post's answer was ready
+            per_post[i]["latency_seconds"] = round(time.perf_counter() - start_time, 3)
+
+    total = time.perf_counter() - start_time
+    report = {
+        "posts": len(posts),
+        "succeeded": sum(response is not None for response in responses),
+        "concurrency": workers,
+        "embedding_seconds": round(embedded_at - start_time, 3),
+        "retrieval_seconds": round(retrieved_at - embedded_at, 3),
+        "total_seconds": round(total, 3),
+        "posts_per_second": round(len(posts) / total, 3) if total > 0 else 0.0,
+        "per_post": per_post,
+    }
+    print(f"Batch auto-response: {len(posts)} posts in {total:.2f}s ({report['posts_per_second']} posts/s)")
+    return responses, report
@@ -9,28 +9,86 @@ logging.basicConfig(level=logging.INFO)
 
 from neo4j_graphrag.indexes import create_vector_index
 
-import neo4j
-from neo4j_graphrag.embeddings import OpenAIEmbeddings
 from openai import AzureOpenAI
 # from neo4j_graphrag.llms import AzureOpenAILLM
-from neo4j_graphrag.retrievers import VectorRetriever
-from neo4j_graphrag.retrievers import VectorCypherRetriever
 from dataclasses import dataclass
-from typing import List, Dict, Any
-import yaml
-
-from langchain.schema import SystemMessage
-from langchain_core.messages import HumanMessage
-from langchain.chat_models import ChatOpenAI
+from functools import lru_cache
+from typing import List, Dict, Tuple
 
 import time
 
 
 # Import shared config
 from get_auto_response.config import Config
+from common.context_packer import ContextPacker
+from common.passage_selection import PassageSelector
+from common.prompt_registry import PromptRegistry
+from common.neo4j_registry import get_registry
+from common.embedding_cache import CachedEmbedder
+from common.llm_clients import CHAT_TIMEOUT, PooledOpenAIEmbeddings, call_timeout, connection_report, get_openai_client
+from common.rate_limiter import BACKGROUND, get_rate_limiter
+from common.retrieval_queries import VECTOR_ANCHOR, advice_details_query
 
 cfg = Config()
 
+# Shared across warm invocations; the registry owns the pooled driver
+registry = get_registry(cfg)
+# Query embeddings go through the shared (model, normalized query) cache
+embedder = CachedEmbedder(
+    PooledOpenAIEmbeddings(model=cfg.embedding_model_name, api_key=cfg.openai_api_key),
+    model_name=cfg.embedding_model_name,
+)
+# Score-orders, deduplicates and bounds the passages that go into each community prompt
+passage_selector = PassageSelector(ContextPacker(cfg.context_token_budget), text_threshold=cfg.passage_dedup_threshold)
+
+# Built-in prompts, used when prompts.yaml is missing or a template in it
+# doesn't use exactly these placeholders
+DEFAULT_PROMPTS = {
+    "community_prompt": """
+        You are a warm, emotionally attuned parenting expert assistant responding publicly in a community forum for Hestia AI.
+
+        Your role is to help caregivers of young children (ages 0–6) navigate parenting challenges with gentle guidance grounded in research-backed advice.
+
+        You are replying to a public post from a parent. Use a tone that feels like a supportive, well-read friend who understands what raising a young child is really like.
+
+        Use these principles:
+        - Validate the parent's emotional experience before offering any suggestions.
+        - Make your language gentle, encouraging, and non-judgmental.
+        - Offer practical, specific strategies that are easy to try—even for tired or overwhelmed caregivers.
+        - Keep your reply focused: one helpful, clear, and affirming response is better than a list of options.
+        - If useful, briefly share a developmental insight (e.g., "It's normal at this age for kids to…")
+        - Do not include or assume any personal user details.
+        - End your response with a gentle invitation for other parents to share their experiences or tips on this topic, fostering a supportive community discussion.
+
+        Use the following expert advice from our structured knowledge base as input. Do not quote it directly. Instead, synthesize relevant concepts and present them naturally in your own words:
+
+        {context_combined}
+
+        Here is the parent's post:
+
+        Title: {post_title}
+        Content: {post_content}
+        """,
+    "query_prompt": """
+        You are a warm, emotionally attuned parenting expert assistant designed to help caregivers
+        navigate challenges with young children. Synthesize the following information to provide a
+        thoughtful response:
+
+        {context_combined}
+
+        User Question: {user_query}
+        """,
+}
+PROMPT_FIELDS = {
+    "community_prompt": frozenset({"context_combined", "post_title", "post_content"}),
+    "query_prompt": frozenset({"context_combined", "user_query"}),
+}
+
+# Loaded once per instance; handlers only render the pre-parsed templates
+prompts = PromptRegistry(cfg.prompts_path, DEFAULT_PROMPTS, PROMPT_FIELDS)
+if cfg.prompt_reload_interval > 0:
+    prompts.watch(cfg.prompt_reload_interval)
+
 @dataclass
 class GraphSchema:
     """Represents the knowledge graph schema"""
@@ -57,10 +115,141 @@ schema = GraphSchema(
 )
 
 
-def index_exists(driver, index_name: str) -> bool:
-    with driver.session() as session:
-        result = session.run(f"SHOW INDEXES YIELD name RETURN name")
-        return any(row["name"] == index_name for row in result)
+# Facet filters applied before scoring: only Advice linked to a matching facet is ranked
+PREFILTER_CONDITIONS = {
+    "age_filter": """
+            EXISTS {
+                MATCH (a)-[:RECOMMENDED_FOR]->(age:AgeGroup)
+                WHERE age.name CONTAINS $age_filter OR age.name = 'Any'
+            }""",
+    "guidance_style": """
+            EXISTS {
+                MATCH (a)-[:USES_STYLE]->(style:GuidanceStyle)
+                WHERE style.name CONTAINS $guidance_style
+            }""",
+}
+
+# Facet filters applied to the vector index's top-k, over the facet name lists
+POSTFILTER_CONDITIONS = {
+    "age_filter": "ANY(age_name IN age_groups WHERE age_name CONTAINS $age_filter OR age_name = 'Any')",
+    "guidance_style": "ANY(style_name IN guidance_styles WHERE style_name CONTAINS $guidance_style)",
+}
+
+
+@lru_cache(maxsize=None)
+def retrieval_template(filters: Tuple[str, ...] = (), prefilter: bool = False) -> str:
+    """
+    Return the retrieval Cypher for a set of active filters, built once per process.
+
+    Only which filters are active changes the text; filter values and the
+    result limit are always parameters, so every call with the same filter
+    names reuses the same Neo4j execution plan.
+
+    Args:
+        filters (Tuple[str, ...]): Names of the active filters, e.g. ("age_filter",)
+        prefilter (bool): Build the candidate-restricting query instead of the
+            vector-index retrieval query
+
+    Returns:
+        str: A full query (prefilter) or the retrieval query appended after the vector search
+    """
+    if prefilter:
+        conditions = " AND ".join(PREFILTER_CONDITIONS[name] for name in filters)
+        return f"""
+        MATCH (a:Advice)
+        WHERE a.embedding IS NOT NULL
+          AND (a.name IS NOT NULL OR a.content IS NOT NULL)
+          AND {conditions}
+        WITH a, vector.similarity.cosine(a.embedding, $query_vector) AS score
+        ORDER BY score DESC
+        LIMIT $top_k
+        """ + advice_details_query()
+
+    filter_clause = ""
+    if filters:
+        filter_clause = "WHERE " + " AND ".join(POSTFILTER_CONDITIONS[name] for name in filters)
+    return VECTOR_ANCHOR + advice_details_query(filter_clause)
+
+
+def prefiltered_search(question: str, limit: int, filter_params: Dict[str, str]) -> list:
+    """
+    Rank only the Advice nodes that match the facet filters.
+
+    The vector index can only filter after it has picked its top-k, so a
+    narrow filter often leaves fewer than `limit` results. Here the facet
+    match runs first and exact cosine similarity is computed over the
+    surviving candidates, so `limit` results come back whenever that many
+    Advice nodes match.
+
+    Args:
+        question (str): The text to embed and rank against
+        limit (int): Number of candidates to rank and expand
+        filter_params (Dict[str, str]): Active filters, e.g. {"age_filter": "2 years old"}
+
+    Returns:
+        list: neo4j.Record results in the same shape as the vector retriever's
+    """
+    query = retrieval_template(tuple(filter_params), prefilter=True)
+    parameters = {**filter_params, "query_vector": embedder.embed_query(question), "top_k": limit}
+    return registry.query(query, parameters)
+
+
+def ensure_vector_index(index_name: str = "advice_embedding"):
+    """Create the Advice vector index if this instance hasn't seen it yet."""
+    if not registry.index_exists(index_name):
+        # Create vector index on Advice nodes instead of Chunk nodes
+        registry.run(lambda driver: create_vector_index(
+            driver,
+            name=index_name,
+            label="Advice",
+            embedding_property="embedding",
+            dimensions=1536,
+            similarity_fn="cosine"
+        ))
+        registry.mark_index(index_name)
+
+
+# One vector search and detail expansion per post, all in a single round trip.
+# The subquery runs once per UNWIND row, so ORDER BY / LIMIT $top_k apply per post.
+BATCH_RETRIEVAL_QUERY = """
+        UNWIND $queries AS q
+        CALL {
+            WITH q
+            CALL db.index.vector.queryNodes($index_name, $top_k, q.vector) YIELD node, score
+""" + VECTOR_ANCHOR + advice_details_query() + """
+        }
+        RETURN q.post AS post, id, text, topics, subtopics, age_groups, guidance_styles,
+               actionable_advice, scenario_notes, authors, score
+        """
+
+
+def batch_search(vectors: List[List[float]], limit: int = 5, index_name: str = "advice_embedding") -> List[list]:
+    """
+    Retrieve the top Advice for many query vectors with one UNWIND query.
+
+    Args:
+        vectors: One query embedding per post
+        limit: Results per post
+        index_name: Vector index to search
+
+    Returns:
+        List[list]: Per post, records in the same shape as the vector retriever's, best first
+    """
+    if not vectors:
+        return []
+    ensure_vector_index(index_name)
+    queries = [{"post": i, "vector": vector} for i, vector in enumerate(vectors)]
+    records = registry.query(
+        BATCH_RETRIEVAL_QUERY,
+        {"queries": queries, "index_name": index_name, "top_k": limit},
+    )
+    results: List[list] = [[] for _ in vectors]
+    for record in records:
+        results[record["post"]].append(record)
+    for post_results in results:
+        post_results.sort(key=lambda record: record["score"], reverse=True)
+    return results
+
 
 def run_graphrag_retrieval(
     query="How do I avoid passing on my insecurities to my child through my words?",
@@ -70,7 +259,8 @@ def run_graphrag_retrieval(
     temporal_context=None,
     source_type=None,
     guidance_style=None,
-    return_results=False
+    return_results=False,
+    filter_mode="prefilter"
 ):
     """
     Run a GraphRAG retrieval query against the knowledge graph with optional filters.
@@ -86,189 +276,121 @@ def run_graphrag_retrieval(
         temporal_context (str, optional): Filter by time of day context (e.g., "Morning", "Evening")
         source_type (str, optional): Filter by source type (e.g., "Book", "Podcast")
         guidance_style (str, optional): Filter by parenting guidance style
+        filter_mode (str): "prefilter" ranks only Advice matching the filters, so up to
+            `limit` results are always found; "postfilter" filters the vector index's top-k
 
     Returns:
         None: Results are printed to console and a final answer is generated
     """
-    with neo4j.GraphDatabase.driver(cfg.URI, auth=cfg.AUTH) as driver:
-        embedder = OpenAIEmbeddings(api_key=cfg.openai_api_key)
-
-        # Log the schema being used
-        logging.info("Using schema with nodes: %s", schema.nodes)
-        logging.info("Using schema with relationships: %s", schema.relationships)
-
-        if not index_exists(driver, index_name):
-            # Create vector index on Advice nodes instead of Chunk nodes
-            create_vector_index(
-                driver,
-                name=index_name,
-                label="Advice",
-                embedding_property="embedding",
-                dimensions=1536,
-                similarity_fn="cosine"
-            )
-
-        # Prepare filter conditions
-        filter_conditions = []
-        if age_filter:
-            logging.info("Filtering by age: %s", age_filter)
-            filter_conditions.append(
-                f"ANY(age_name IN [age IN age_groups | age.name] "
-                f"WHERE age_name CONTAINS '{age_filter}' OR age_name = 'Any')"
+    # Log the schema being used
+    logging.info("Using schema with nodes: %s", schema.nodes)
+    logging.info("Using schema with relationships: %s", schema.relationships)
+
+    ensure_vector_index(index_name)
+
+    # Only the names of active filters shape the query; their values are parameters
+    filter_params = {}
+    if age_filter:
+        logging.info("Filtering by age: %s", age_filter)
+        filter_params["age_filter"] = age_filter
+
+    if guidance_style:
+        logging.info("Filtering by guidance style: %s", guidance_style)
+        filter_params["guidance_style"] = guidance_style
+
+    # Filters are pushed below the similarity ranking unless post-filtering was asked for
+    prefilter = bool(filter_params) and filter_mode == "prefilter"
+
+    def retrieve_context(question: str):
+        start_time = time.perf_counter()
+        if prefilter:
+            records = prefiltered_search(question, limit, filter_params)
+        else:
+            retrieval_query = retrieval_template(tuple(filter_params))
+            results = registry.search(
+                (index_name, retrieval_query),
+                index_name,
+                retrieval_query,
+                embedder,
+                query_text=question,
+                top_k=limit,
+                query_params=filter_params,
             )
-
-        if guidance_style:
-            logging.info("Filtering by guidance style: %s", guidance_style)
-            filter_conditions.append(
-                f"ANY(style IN guidance_styles "
-                f"WHERE style.name CONTAINS '{guidance_style}')"
-            )
-
-        # Combine filter conditions
-        filter_clause = ""
-        if filter_conditions:
-            filter_clause = "WHERE " + " AND ".join(filter_conditions)
-
-        # Use the schema to construct the retriever
-        graph_retriever = VectorCypherRetriever(
-            driver,
-            index_name=index_name,
-            embedder=embedder,
-            retrieval_query=f"""
-            // Match advice nodes that are relevant to the query
-            MATCH (a:Advice)
-            WHERE a.name IS NOT NULL OR a.content IS NOT NULL
-
-            // Find related topics, subtopics, and age groups
-            OPTIONAL MATCH (a)-[:HAS_TOPIC]->(topic:Topic)
-            OPTIONAL MATCH (a)-[:HAS_SUBTOPIC]->(subtopic:SubTopic)
-            OPTIONAL MATCH (a)-[:RECOMMENDED_FOR]->(age:AgeGroup)
-            OPTIONAL MATCH (a)-[:USES_STYLE]->(style:GuidanceStyle)
-
-            // Get actionable advice if available
-            OPTIONAL MATCH (a)-[:HAS_ACTIONABLE_ADVICE]->(actionable:ActionableAdvice)
-
-            // Get scenario notes if available
-            OPTIONAL MATCH (a)-[:HAS_SCENARIO_NOTE]->(scenario:ScenarioNote)
-
-            // Get author information
-            OPTIONAL MATCH (a)-[:WRITTEN_BY]->(author:Author)
-
-            // Collect all the related information
-            WITH a,
-                 collect(DISTINCT topic) AS topics,
-                 collect(DISTINCT subtopic) AS subtopics,
-                 collect(DISTINCT age) AS age_groups,
-                 collect(DISTINCT style) AS guidance_styles,
-                 collect(DISTINCT actionable) AS actionable_advice,
-                 collect(DISTINCT scenario) AS scenario_notes,
-                 collect(DISTINCT author) AS authors,
-                 score
-
-            // Apply filters if specified
-            {filter_clause}
-
-            // Calculate relevance score with additional factors
-            WITH a, topics, subtopics, age_groups, guidance_styles,
-                 actionable_advice, scenario_notes, authors, score,
-                 // Boost score if actionable advice is available
-                 CASE WHEN size(actionable_advice) > 0 THEN 0.2 ELSE 0 END AS actionable_boost,
-                 // Boost score based on scenario notes relevance
-                 CASE WHEN size(scenario_notes) > 0 THEN 0.1 ELSE 0 END AS scenario_boost
-
-            // Calculate final score with boosts
-            WITH a, topics, subtopics, age_groups, guidance_styles,
-                 actionable_advice, scenario_notes, authors,
-                 score + actionable_boost + scenario_boost AS final_score
-
-            // Return comprehensive information about the advice
-            RETURN
-                a.id AS id,
-                // Use content property if available, otherwise fall back to name
-                CASE WHEN a.content IS NOT NULL THEN a.content ELSE a.name END AS text,
-                [topic IN topics | topic.name] AS topics,
-                [subtopic IN subtopics | subtopic.name] AS subtopics,
-                [age IN age_groups | age.name] AS age_groups,
-                [style IN guidance_styles | style.name] AS guidance_styles,
-                [advice IN actionable_advice | CASE WHEN advice.content IS NOT NULL THEN advice.content ELSE advice.name END] AS actionable_advice,
-                [note IN scenario_notes | CASE WHEN note.name IS NOT NULL THEN note.name ELSE '' END] AS scenario_notes,
-                [author IN authors | author.name] AS authors,
-                final_score AS score
-            ORDER BY score DESC
-            LIMIT {limit}
-            """
+            records = list(results.records)
+        logging.info(
+            f"Retrieved {len(records)}/{limit} results in {time.perf_counter() - start_time:.3f}s "
+            f"(filter_mode={filter_mode if filter_params else 'none'})"
         )
-
-        def retrieve_context(question: str):
-            results = graph_retriever.get_search_results(query_text=question)
-            # Return full result objects for pretty-printing
-            return list(results.records)
-
-        results = retrieve_context(query)
-
-        # Print a summary of results
-        print(f"\n{'='*40}")
-        print(f"Found {len(results)} relevant advice entries")
-        print(f"{'='*40}\n")
-
-        for i, result in enumerate(results):
-            # Calculate relevance score percentage for display
-            score = result.get('score', 0)
-            relevance = min(int(score * 100), 100)  # Cap at 100%
-
-            advice_id = result.get('id', 'Unknown')
-            print(f"📝 Advice {i+1}: (ID: {advice_id}) (Relevance: {relevance}%)\n")
-
-            # Print actionable advice first if available (prioritize actionable content)
-            actionable_advice = result.get('actionable_advice', [])
-            if actionable_advice:
-                print("✅ Actionable Advice:")
-                for advice in actionable_advice:
-                    print(f"  • {advice}")
-                print()
-
-            # Print content
-            content = result.get('text', '')
-            # Truncate if too long for display
-            if len(content) > 500:
-                content = content[:500] + "... [content truncated]"
-            print(f"Content:\n{content}\n")
-
-            # Print topics and subtopics
-            topics = result.get('topics', [])
-            subtopics = result.get('subtopics', [])
-            print(f"🏷️ Topics: {', '.join(topics) if topics else 'None'}")
-            print(f"  Subtopics: {', '.join(subtopics) if subtopics else 'None'}")
-
-            # Print age groups and guidance styles
-            age_groups = result.get('age_groups', [])
-            guidance_styles = result.get('guidance_styles', [])
-            print(f"👶 Age Groups: {', '.join(age_groups) if age_groups else 'Any'}")
-            print(f"🧠 Guidance Styles: {', '.join(guidance_styles) if guidance_styles else 'None'}")
-
-            # Print scenario notes
-            scenario_notes = result.get('scenario_notes', [])
-            if scenario_notes:
-                print("\n📋 Scenario Notes:")
-                for note in scenario_notes:
-                    # Truncate if too long
-                    if len(note) > 200:
-                        note = note[:200] + "... [truncated]"
-                    print(f"  • {note}")
-
-            # Print author information
-            authors = result.get('authors', [])
-            if authors:
-                print(f"\n👤 Authors: {', '.join(authors)}")
-
-            print("\n" + "-"*80 + "\n")
-
-        # If return_results is True, return the results instead of generating an answer
-        if return_results:
-            return results
-
-        final_answer = generate_answer_from_chunks(results, query)
-        print("\nFinal Answer:\n" + "=" * 40 + f"\n{final_answer}")
+        logging.info("Embedding cache stats: %s", embedder.cache.report())
+        logging.debug("Query texts: %s", registry.query_text_report())
+        # Return full result objects for pretty-printing
+        return records
+
+    results = retrieve_context(query)
+
+    # Print a summary of results
+    print(f"\n{'='*40}")
+    print(f"Found {len(results)} relevant advice entries")
+    print(f"{'='*40}\n")
+
+    for i, result in enumerate(results):
+        # Calculate relevance score percentage for display
+        score = result.get('score', 0)
+        relevance = min(int(score * 100), 100)  # Cap at 100%
+
+        advice_id = result.get('id', 'Unknown')
+        print(f"📝 Advice {i+1}: (ID: {advice_id}) (Relevance: {relevance}%)\n")
+
+        # Print actionable advice first if available (prioritize actionable content)
+        actionable_advice = result.get('actionable_advice', [])
+        if actionable_advice:
+            print("✅ Actionable Advice:")
+            for advice in actionable_advice:
+                print(f"  • {advice}")
+            print()
+
+        # Print content
+        content = result.get('text', '')
+        # Truncate if too long for display
+        if len(content) > 500:
+            content = content[:500] + "... [content truncated]"
+        print(f"Content:\n{content}\n")
+
+        # Print topics and subtopics
+        topics = result.get('topics', [])
+        subtopics = result.get('subtopics', [])
+        print(f"🏷️ Topics: {', '.join(topics) if topics else 'None'}")
+        print(f"  Subtopics: {', '.join(subtopics) if subtopics else 'None'}")
+
+        # Print age groups and guidance styles
+        age_groups = result.get('age_groups', [])
+        guidance_styles = result.get('guidance_styles', [])
+        print(f"👶 Age Groups: {', '.join(age_groups) if age_groups else 'Any'}")
+        print(f"🧠 Guidance Styles: {', '.join(guidance_styles) if guidance_styles else 'None'}")
+
+        # Print scenario notes
+        scenario_notes = result.get('scenario_notes', [])
+        if scenario_notes:
+            print("\n📋 Scenario Notes:")
+            for note in scenario_notes:
+                # Truncate if too long
+                if len(note) > 200:
+                    note = note[:200] + "... [truncated]"
+                print(f"  • {note}")
+
+        # Print author information
+        authors = result.get('authors', [])
+        if authors:
+            print(f"\n👤 Authors: {', '.join(authors)}")
+
+        print("\n" + "-"*80 + "\n")
+
+    # If return_results is True, return the results instead of generating an answer
+    if return_results:
+        return results
+
+    final_answer = generate_answer_from_chunks(results, query)
+    print("\nFinal Answer:\n" + "=" * 40 + f"\n{final_answer}")
 
 
 
@@ -320,71 +442,23 @@ def run_graphrag_retrieval_with_prompt(
         return generate_answer_from_chunks(results, query)
 
 
-def generate_answer_from_chunks_with_post(chunks: list, _user_query: str, post_title: str, post_content: str) -> str:
+def chunk_passages(chunks: list) -> List[str]:
     """
-    Generate a comprehensive answer from retrieved knowledge graph chunks for a community post.
+    Format retrieved chunks as numbered passages, best first.
 
     Args:
         chunks: List of retrieved chunks from the knowledge graph
-        _user_query: The original user query (not used in this function)
-        post_title: The title of the post
-        post_content: The content of the post
 
     Returns:
-        str: A synthesized response that addresses the user's post
+        List[str]: One passage per chunk
     """
-    # Load prompts from YAML file
-    file_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(file_dir)
-    kg_retrieval_dir = os.path.dirname(parent_dir)
-    graphrag_dir = os.path.dirname(kg_retrieval_dir)
-    prompts_path = os.path.join(graphrag_dir, 'data', 'prompts', 'prompts.yaml')
-
-    print("Loading prompts from: %s", prompts_path)
-
-    try:
-        with open(prompts_path, 'r', encoding='utf-8') as file:
-            prompts = yaml.safe_load(file)
-            community_prompt_template = prompts.get('community_prompt', '')
-            print("Successfully loaded community prompt template")
-    except Exception as e:
-        print("Error loading prompts: %s", str(e))
-        # Fallback prompt in case of error
-        community_prompt_template = """
-        You are a warm, emotionally attuned parenting expert assistant responding publicly in a community forum for Hestia AI.
-
-        Your role is to help caregivers of young children (ages 0–6) navigate parenting challenges with gentle guidance grounded in research-backed advice.
-
-        You are replying to a public post from a parent. Use a tone that feels like a supportive, well-read friend who understands what raising a young child is really like.
-
-        Use these principles:
-        - Validate the parent's emotional experience before offering any suggestions.
-        - Make your language gentle, encouraging, and non-judgmental.
-        - Offer practical, specific strategies that are easy to try—even for tired or overwhelmed caregivers.
-        - Keep your reply focused: one helpful, clear, and affirming response is better than a list of options.
-        - If useful, briefly share a developmental insight (e.g., "It's normal at this age for kids to…")
-        - Do not include or assume any personal user details.
-        - End your response with a gentle invitation for other parents to share their experiences or tips on this topic, fostering a supportive community discussion.
-
-        Use the following expert advice from our structured knowledge base as input. Do not quote it directly. Instead, synthesize relevant concepts and present them naturally in your own words:
-
-        {context_combined}
-
-        Here is the parent's post:
-
-        Title: {post_title}
-        Content: {post_content}
-        """
-        print("Using fallback prompt template")
-
-    # Construct the context
     context_texts = []
     for i, chunk in enumerate(chunks):
         # Get the text content
         text = chunk['text']
 
         # Get actionable advice without duplicates
-        actionable_advice = chunk['actionable_advice']
+        actionable_advice = chunk.get('actionable_advice', [])
         # Remove duplicates while preserving order
         unique_advice = []
         seen = set()
@@ -399,11 +473,40 @@ def generate_answer_from_chunks_with_post(chunks: list, _user_query: str, post_t
             passage += f"\n\nActionable Advice: {', '.join(unique_advice)}"
 
         context_texts.append(passage)
+    return context_texts
+
+
+def pack_chunks(chunks: list) -> str:
+    """
+    Join the best distinct chunk passages that fit the prompt token budget.
+
+    Args:
+        chunks: List of retrieved chunks from the knowledge graph
+
+    Returns:
+        str: The passages for the prompt, best first
+    """
+    return passage_selector.select(chunks, chunk_passages).passages_text()
 
-    context_combined = "\n\n".join(context_texts)
+
+def generate_answer_from_chunks_with_post(chunks: list, _user_query: str, post_title: str, post_content: str) -> str:
+    """
+    Generate a comprehensive answer from retrieved knowledge graph chunks for a community post.
+
+    Args:
+        chunks: List of retrieved chunks from the knowledge graph
+        _user_query: The original user query (not used in this function)
+        post_title: The title of the post
+        post_content: The content of the post
+
+    Returns:
+        str: A synthesized response that addresses the user's post
+    """
+    # Construct the context within the prompt token budget
+    context_combined = pack_chunks(chunks)
 
     # Format the prompt with the context and post details
-    formatted_prompt = community_prompt_template.format(
+    formatted_prompt = prompts.get("community_prompt").render(
         context_combined=context_combined,
         post_title=post_title,
         post_content=post_content
@@ -411,21 +514,31 @@ def generate_answer_from_chunks_with_post(chunks: list, _user_query: str, post_t
 
     print("Prompt:\n", formatted_prompt)
 
-    system_prompt = SystemMessage(content=formatted_prompt)
+    system_prompt = {"role": "system", "content": formatted_prompt}
 
     # Empty user prompt since we've included the query in the system prompt
-    user_prompt = HumanMessage(content="")
+    user_prompt = {"role": "user", "content": ""}
 
-    # Use OpenAI Chat Model
-    chat = ChatOpenAI(model="gpt-4o", temperature=0.7, openai_api_key=cfg.openai_api_key)
+    # Use the shared OpenAI client; its pooled connection survives across requests
+    client = get_openai_client(cfg.openai_api_key)
 
     start_time = time.time()
-    response = chat([system_prompt, user_prompt])
+    # Background work: waits behind interactive chat calls when the quota is tight
+    response = get_rate_limiter().chat_completion(
+        client,
+        BACKGROUND,
+        model="gpt-4o",
+        messages=[system_prompt, user_prompt],
+        temperature=0.7,
+        timeout=call_timeout(CHAT_TIMEOUT)
+    )
     end_time = time.time()
     latency = end_time - start_time
     print(f"⏱️ LLM response latency: {latency:.2f} seconds")
+    print(f"OpenAI connection reuse: {connection_report()}")
+    print(f"Rate limiter: {get_rate_limiter().report()}")
 
-    return response.content
+    return response.choices[0].message.content
 
 
 def generate_answer_from_chunks(chunks: list, user_query: str) -> str:
@@ -439,127 +552,50 @@ def generate_answer_from_chunks(chunks: list, user_query: str) -> str:
     Returns:
         str: A synthesized response that addresses the user's query
     """
-    # Load prompts from YAML file
-    # The file is in the project root directory under data/prompts
-    file_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(file_dir)
-    kg_retrieval_dir = os.path.dirname(parent_dir)
-    graphrag_dir = os.path.dirname(kg_retrieval_dir)
-    prompts_path = os.path.join(graphrag_dir, 'data', 'prompts', 'prompts.yaml')
-
-    logging.info("Loading prompts from: %s", prompts_path)
-
-    try:
-        with open(prompts_path, 'r', encoding='utf-8') as file:
-            prompts = yaml.safe_load(file)
-            community_prompt_template = prompts.get('community_prompt', '')
-            logging.info("Successfully loaded community prompt template")
-    except FileNotFoundError as e:
-        logging.error("Prompt file not found: %s", str(e))
-        # Fallback prompt in case the file can't be loaded
-        community_prompt_template = """
-        You are a warm, emotionally attuned parenting expert assistant designed to help caregivers
-        navigate challenges with young children. Synthesize the following information to provide a
-        thoughtful response:
-
-        {context_combined}
-
-        User Question: {user_query}
-        """
-        logging.warning("Using fallback prompt template due to file not found")
-    except yaml.YAMLError as e:
-        logging.error("Error parsing YAML file: %s", str(e))
-        # Fallback prompt in case of YAML parsing error
-        community_prompt_template = """
-        You are a warm, emotionally attuned parenting expert assistant designed to help caregivers
-        navigate challenges with young children. Synthesize the following information to provide a
-        thoughtful response:
-
-        {context_combined}
-
-        User Question: {user_query}
-        """
-        logging.warning("Using fallback prompt template due to YAML parsing error")
-    except IOError as e:
-        logging.error("IO error reading prompt file: %s", str(e))
-        # Fallback prompt in case of IO error
-        community_prompt_template = """
-        You are a warm, emotionally attuned parenting expert assistant designed to help caregivers
-        navigate challenges with young children. Synthesize the following information to provide a
-        thoughtful response:
-
-        {context_combined}
-
-        User Question: {user_query}
-        """
-        logging.warning("Using fallback prompt template due to IO error")
-
-    # Construct the context
-    context_texts = []
-    for i, chunk in enumerate(chunks):
-        # Get the text content
-        text = chunk['text']
+    # Construct the context within the prompt token budget
+    context_combined = pack_chunks(chunks)
 
-        # Get actionable advice without duplicates
-        actionable_advice = chunk.get('actionable_advice', [])
-        # Remove duplicates while preserving order
-        unique_advice = []
-        seen = set()
-        for advice in actionable_advice:
-            if advice not in seen:
-                seen.add(advice)
-                unique_advice.append(advice)
-
-        # Format the passage
-        passage = f"Passage {i+1}: {text}"
-        if unique_advice:
-            passage += f"\n\nActionable Advice: {', '.join(unique_advice)}"
-
-        context_texts.append(passage)
-
-    context_combined = "\n\n".join(context_texts)
-
-    # Format the prompt with the context and query
-    # Check if the prompt template expects post_title and post_content
-    has_post_fields = ('{post_title}' in community_prompt_template and
-                      '{post_content}' in community_prompt_template)
-
-    if has_post_fields:
-        # Use the query as both title and content if post details aren't provided
-        formatted_prompt = community_prompt_template.format(
+    # Format the prompt with the context and query. A community prompt from
+    # prompts.yaml is used with the query standing in for the post
+    if prompts.from_file("community_prompt"):
+        formatted_prompt = prompts.get("community_prompt").render(
             context_combined=context_combined,
             post_title="User Query",
             post_content=user_query
         )
     else:
-        # Use the fallback format with user_query
-        formatted_prompt = f"""
-        You are a warm, emotionally attuned parenting expert assistant designed to help caregivers
-        navigate challenges with young children. Synthesize the following information to provide a
-        thoughtful response:
-
-        {context_combined}
-
-        User Question: {user_query}
-        """
+        formatted_prompt = prompts.get("query_prompt").render(
+            context_combined=context_combined,
+            user_query=user_query
+        )
 
     print("Prompt:\n", formatted_prompt)
 
-    system_prompt = SystemMessage(content=formatted_prompt)
+    system_prompt = {"role": "system", "content": formatted_prompt}
 
     # Empty user prompt since we've included the query in the system prompt
-    user_prompt = HumanMessage(content="")
+    user_prompt = {"role": "user", "content": ""}
 
-    # Use OpenAI Chat Model
-    chat = ChatOpenAI(model="gpt-4o", temperature=0.7)
+    # Use the shared OpenAI client; its pooled connection survives across requests
+    client = get_openai_client(cfg.openai_api_key)
 
     start_time = time.time()
-    response = chat([system_prompt, user_prompt])
+    # Background work: waits behind interactive chat calls when the quota is tight
+    response = get_rate_limiter().chat_completion(
+        client,
+        BACKGROUND,
+        model="gpt-4o",
+        messages=[system_prompt, user_prompt],
+        temperature=0.7,
+        timeout=call_timeout(CHAT_TIMEOUT)
+    )
     end_time = time.time()
     latency = end_time - start_time
     print(f"⏱️ LLM response latency: {latency:.2f} seconds")
+    print(f"OpenAI connection reuse: {connection_report()}")
+    print(f"Rate limiter: {get_rate_limiter().report()}")
 
-    return response.content
+    return response.choices[0].message.content
 
 
 
@@ -600,6 +636,12 @@ if __name__ == "__main__":
         type=str,
         help='Filter by guidance style (e.g., "Empathic / Supportive")'
     )
+    parser.add_argument(
+        '--filter-mode',
+        choices=['prefilter', 'postfilter'],
+        default='prefilter',
+        help='Apply age/style filters before ranking (prefilter) or after the vector search (postfilter)'
+    )
 
     args = parser.parse_args()
 
@@ -624,5 +666,6 @@ if __name__ == "__main__":
         age_filter=args.age,
         temporal_context=args.context,
         source_type=args.source,
-        guidance_style=args.style
+        guidance_style=args.style,
+        filter_mode=args.filter_mode
     )
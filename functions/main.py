@@ -4,19 +4,122 @@ Firebase Cloud Functions for the Hestia AI Parenting Assistant.
 This module contains the cloud functions for the Hestia AI Parenting Assistant:
 - get_chat: Handles private chat with the Hestia AI assistant
 - auto_respond_post: Automatically responds to community posts
+- auto_respond_posts: Responds to many community posts as one batch job
 - change_user_id_email: Updates a user's email address
 - test_function: A simple test function to verify deployment works
 """
+import asyncio
 import time
 from firebase_functions import https_fn
-from firebase_admin import initialize_app, firestore, auth
+from firebase_admin import initialize_app, firestore, firestore_async, auth
 from firebase_admin.firestore import SERVER_TIMESTAMP
-from ai_query.kg_query import run_query
-from get_auto_response.get_auto_response import getAutoResponse
+from ai_query.config import Config
+from ai_query.neo4j_graphrag_retriever import run_retrieval_and_generate, stream_retrieval_and_generate
+from ai_query.async_pipeline import arun_retrieval_and_generate, async_embedder
+from get_auto_response.get_auto_response import getAutoResponse, getAutoResponses
+from common.answer_cache import get_answer_cache
+from common.async_neo4j import get_async_registry
+from common.async_runtime import run_async
+from common.context_packer import chat_history, history_key
+from common.embedding_cache import CachedEmbedder
+from common.llm_clients import PooledOpenAIEmbeddings
+from common.neo4j_registry import get_registry
+from common.streaming import StreamingMessageWriter
+
+# Firestore accepts at most 500 writes per batch
+FIRESTORE_BATCH_LIMIT = 500
 
 # Initialize Firebase app
 initialize_app()
 
+cfg = Config()
+
+# Semantic answer cache shared by get_chat and auto_respond_post. Query embeddings
+# go through the shared embedding cache, so the retrievers reuse them for free.
+answer_cache = get_answer_cache()
+query_embedder = CachedEmbedder(
+    PooledOpenAIEmbeddings(model=cfg.embedding_model_name, api_key=cfg.openai_api_key),
+    model_name=cfg.embedding_model_name,
+)
+
+
+def answer_with_cache(query: str, filters: dict, generate) -> str:
+    """
+    Return a cached answer for a semantically equivalent query, or generate one.
+
+    Args:
+        query: The text whose embedding is used for the lookup
+        filters: Context the answer depends on (endpoint, retrieval filters)
+        generate: Zero-argument callable producing the answer on a miss
+
+    Returns:
+        The cached or freshly generated answer
+    """
+    try:
+        embedding = query_embedder.embed_query(query)
+        kg_version = get_registry(cfg).kg_version()
+    except Exception as e:
+        print(f"Answer cache unavailable: {e}")
+        return generate()
+
+    response = answer_cache.lookup(embedding, filters=filters, kg_version=kg_version)
+    if response is not None:
+        print(f"Answer cache hit: {answer_cache.report()}")
+        return response
+
+    response = generate()
+    answer_cache.store(query, embedding, response, filters=filters, kg_version=kg_version)
+    return response
+
+async def get_chat_async(query_text: str, uid: str) -> str:
+    """
+    Async body of get_chat, run on the instance's background event loop.
+
+    The history fetch, query embedding and KG version read are independent,
+    so they run concurrently. Retrieval then reuses the embedding instead of
+    computing it again. The Neo4j backend checks the vector index itself, so a
+    Neo4j outage doesn't fail requests served by the in-memory index.
+
+    Args:
+        query_text: The user's message
+        uid: The user ID
+
+    Returns:
+        The generated (or cached) answer
+    """
+    db = firestore_async.client()
+    async_registry = get_async_registry(cfg)
+    chat_ref = db.collection("chats").document(f"_copilot {uid}").collection("messages")
+
+    async def fetch_history():
+        messages_query = chat_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(10)
+        return [message.to_dict() for message in await messages_query.get()]
+
+    messages, embedding, kg_version = await asyncio.gather(
+        fetch_history(),
+        async_embedder.async_embed_query(query_text),
+        async_registry.kg_version(),
+    )
+    messages.reverse()
+    print(f"Chat history: {len(messages)} messages")
+    history = chat_history(messages, query_text)
+
+    filters = {"endpoint": "chat", "history": history_key(history)}
+    response = answer_cache.lookup(embedding, filters=filters, kg_version=kg_version)
+    if response is None:
+        response = await arun_retrieval_and_generate(query_text, query_vector=embedding, history=history)
+        answer_cache.store(query_text, embedding, response, filters=filters, kg_version=kg_version)
+    else:
+        print(f"Answer cache hit: {answer_cache.report()}")
+
+    await chat_ref.add({
+        "sent_by": "_copilot",
+        "content": response,
+        "type": "string",
+        "timestamp": int(time.time() * 1000)
+    })
+    return response
+
 @https_fn.on_call()
 def get_chat(req: https_fn.Request) -> dict:
     """
@@ -32,6 +135,11 @@ def get_chat(req: https_fn.Request) -> dict:
     query_text = req.data["query"]
     uid = req.data['uid']
 
+    if cfg.async_pipeline and not req.data.get("stream", cfg.chat_streaming):
+        response = run_async(get_chat_async(query_text, uid))
+        print(f"Generated response of length: {len(response)}")
+        return https_fn.Response(response)
+
     # Get Firestore client
     db = firestore.client()
 
@@ -42,9 +150,29 @@ def get_chat(req: https_fn.Request) -> dict:
     messages.reverse()
 
     print(f"Chat history: {len(messages)} messages")
+    # The reply depends on the conversation, so cached answers are keyed by it too
+    history = chat_history(messages, query_text)
+    filters = {"endpoint": "chat", "history": history_key(history)}
+
+    if req.data.get("stream", cfg.chat_streaming):
+        # Write the reply into its message document as it is generated; a cache
+        # hit skips generation and the final write delivers the whole answer
+        writer = StreamingMessageWriter(
+            chat_ref.document(),
+            {"sent_by": "_copilot", "type": "string", "timestamp": int(time.time() * 1000)},
+            min_interval=cfg.stream_flush_interval,
+        )
+        response = answer_with_cache(
+            query_text,
+            filters,
+            lambda: writer.write_stream(stream_retrieval_and_generate(query_text, history)),
+        )
+        writer.finalize(response)
+        print(f"Streamed response of length: {len(response)}")
+        return https_fn.Response(response)
 
     # Generate response using the improved knowledge graph retriever
-    response = run_query(query_text)
+    response = answer_with_cache(query_text, filters, lambda: run_retrieval_and_generate(query_text, history))
     print(f"Generated response of length: {len(response)}")
 
     # Save the response to Firestore
@@ -57,6 +185,19 @@ def get_chat(req: https_fn.Request) -> dict:
 
     return https_fn.Response(response)
 
+
+def comment_document(parent_id: str, response: str) -> dict:
+    """The Firestore comment Hestia posts under a community post."""
+    return {
+        "created_at": SERVER_TIMESTAMP,
+        "comments": 0,
+        "likes": 0,
+        "creator": "hestia",
+        "parentID": parent_id,
+        "comment": response
+    }
+
+
 @https_fn.on_call()
 def auto_respond_post(req: https_fn.Request) -> dict:
     """
@@ -80,22 +221,92 @@ def auto_respond_post(req: https_fn.Request) -> dict:
     db = firestore.client()
 
     # Generate response using the improved auto-response function
-    response = getAutoResponse(post_title, post_content)
+    response = answer_with_cache(
+        f"{post_title} {post_content}",
+        {"endpoint": "community"},
+        lambda: getAutoResponse(post_title, post_content),
+    )
     print(f"Generated auto-response of length: {len(response)}")
 
     # Save the response to Firestore
-    db.collection("comments").document(f"{parent_id}hestia").set({
-        "created_at": SERVER_TIMESTAMP,
-        "comments": 0,
-        "likes": 0,
-        "creator": "hestia",
-        "parentID": parent_id,
-        "comment": response
-    })
+    db.collection("comments").document(f"{parent_id}hestia").set(comment_document(parent_id, response))
 
     return https_fn.Response(response)
 
 
+@https_fn.on_call()
+def auto_respond_posts(req: https_fn.CallableRequest) -> dict:
+    """
+    Cloud function to respond to many community posts in one job.
+
+    Post embeddings are computed in as few bounded requests as possible and
+    checked against the answer cache. The remaining posts share one vector query and are
+    generated concurrently. All comments are committed in Firestore batched
+    writes.
+
+    Args:
+        req: The request object; `posts` is a list of {parentID, postTitle, postContent}
+
+    Returns:
+        A dictionary with the responses by parent ID and the batch report
+    """
+    posts = req.data.get("posts") or []
+    if not posts:
+        return {"success": False, "message": "No posts given"}
+    start_time = time.perf_counter()
+    queries = [f"{post['postTitle']} {post['postContent']}" for post in posts]
+    responses = [None] * len(posts)
+    filters = {"endpoint": "community"}
+
+    # Retrieval needs these too, so without them there is nothing to answer with
+    try:
+        embeddings = query_embedder.embed_documents(queries)
+    except Exception as e:
+        print(f"Could not embed posts: {e}")
+        return {"success": False, "message": "Could not embed posts"}
+
+    # None if the graph can't be reached; the answer cache is then bypassed
+    kg_version = get_registry(cfg).kg_version()
+    for i, embedding in enumerate(embeddings):
+        responses[i] = answer_cache.lookup(embedding, filters=filters, kg_version=kg_version)
+
+    pending = [i for i, response in enumerate(responses) if response is None]
+    report = {"cache_hits": len(posts) - len(pending)}
+    if pending:
+        generated, report["generation"] = getAutoResponses(
+            [posts[i] for i in pending],
+            vectors=[embeddings[i] for i in pending],
+        )
+        for i, response in zip(pending, generated):
+            responses[i] = response
+            if response is not None:
+                answer_cache.store(queries[i], embeddings[i], response, filters=filters, kg_version=kg_version)
+
+    # Save the responses to Firestore in as few commits as possible
+    db = firestore.client()
+    answered = [(post["parentID"], response) for post, response in zip(posts, responses) if response is not None]
+    for offset in range(0, len(answered), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for parent_id, response in answered[offset:offset + FIRESTORE_BATCH_LIMIT]:
+            batch.set(db.collection("comments").document(f"{parent_id}hestia"), comment_document(parent_id, response))
+        batch.commit()
+
+    total = time.perf_counter() - start_time
+    report.update({
+        "posts": len(posts),
+        "answered": len(answered),
+        "total_seconds": round(total, 3),
+        "posts_per_second": round(len(posts) / total, 3) if total > 0 else 0.0,
+    })
+    print(f"Batch auto-response report: {report}")
+
+    return {
+        "success": len(answered) == len(posts),
+        "responses": {parent_id: response for parent_id, response in answered},
+        "report": report,
+    }
+
+
 @https_fn.on_call()
 def change_user_id_email(req: https_fn.CallableRequest) -> dict:
     """
@@ -0,0 +1,290 @@
+"""
+Batched, resumable embedding stage for Advice nodes.
+
+The retrievers query the 1536-dim `advice_embedding` vector index on
+`Advice.embedding`, but the tag-extraction build path never writes it. This
+stage fills it in:
+
+- Advice text is embedded in large batches, with a bounded number of requests
+  in flight and exponential backoff (honoring Retry-After) on rate limits.
+  A batch is cut at `batch_size` texts or `batch_tokens` tokens, whichever
+  comes first, and texts longer than the model accepts are truncated, so no
+  request is rejected for its size.
+- Vectors are written back with one UNWIND statement per batch.
+- Nodes whose `embedding_hash` already matches the hash of their current
+  content are skipped, so re-runs only pay for changed text.
+- Every embedded batch is appended to a checkpoint file before it is written,
+  so an interrupted run resumes without re-embedding what it already paid for.
+
+Usage:
+    python -m graphrag.kg_builder.embedding_stage [--batch-size 256] [--batch-tokens 200000] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import neo4j
+import openai
+import tiktoken
+from openai import AsyncOpenAI
+from neo4j_graphrag.indexes import create_vector_index
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from graphrag.config import Config
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+DEFAULT_CHECKPOINT_PATH = Path("kg_embedding_checkpoint.jsonl")
+# The API takes at most 300k tokens per request and 8191 per input
+DEFAULT_BATCH_TOKENS = 200_000
+MAX_INPUT_TOKENS = 8191
+
+
+def content_hash(text: str, model: str) -> str:
+    """Hash of the text and the model that embeds it; either changing means re-embedding"""
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the API asked us to wait, if it said so"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Tokenizer for `model`, falling back to cl100k_base for unknown models"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def token_batches(nodes: List[Dict], batch_size: int, batch_tokens: int) -> List[List[Dict]]:
+    """Split nodes (each with a `tokens` count) into batches of at most `batch_size` nodes and `batch_tokens` tokens"""
+    batches, batch, tokens = [], [], 0
+    for node in nodes:
+        if batch and (len(batch) >= batch_size or tokens + node["tokens"] > batch_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(node)
+        tokens += node["tokens"]
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingStage:
+    """Embeds Advice content and writes the vectors back to Neo4j"""
+
+    def __init__(
+        self,
+        driver: neo4j.Driver,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        batch_size: int = 256,
+        batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        checkpoint_path: Optional[Path] = DEFAULT_CHECKPOINT_PATH,
+        client: Optional[AsyncOpenAI] = None,
+    ):
+        self.driver = driver
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.client = client or AsyncOpenAI()
+        self.stats = {"skipped": 0, "from_checkpoint": 0, "embedded": 0, "written": 0, "retries": 0, "truncated": 0}
+
+    def _pending_nodes(self) -> List[Dict]:
+        """Return Advice nodes whose stored embedding does not match their current content"""
+        with self.driver.session() as session:
+            records = session.run(
+                """
+                MATCH (a:Advice)
+                WHERE a.content IS NOT NULL OR a.name IS NOT NULL
+                RETURN elementId(a) AS id,
+                       coalesce(a.content, a.name) AS text,
+                       a.embedding_hash AS embedding_hash,
+                       a.embedding IS NOT NULL AS has_embedding
+                """
+            ).data()
+
+        pending = []
+        for record in records:
+            digest = content_hash(record["text"], self.model)
+            if record["has_embedding"] and record["embedding_hash"] == digest:
+                self.stats["skipped"] += 1
+                continue
+            pending.append({"id": record["id"], "text": record["text"], "hash": digest})
+        return pending
+
+    def _prepare_inputs(self, nodes: List[Dict]):
+        """Count each node's tokens and cut texts the model can't take to MAX_INPUT_TOKENS
+
+        The content hash stays that of the full text, so a truncated node is
+        not embedded again on the next run.
+        """
+        encoding = get_encoding(self.model)
+        for node, tokens in zip(nodes, encoding.encode_ordinary_batch([node["text"] for node in nodes])):
+            if len(tokens) > MAX_INPUT_TOKENS:
+                node["text"] = encoding.decode(tokens[:MAX_INPUT_TOKENS])
+                self.stats["truncated"] += 1
+            node["tokens"] = min(len(tokens), MAX_INPUT_TOKENS)
+
+    def _load_checkpoint(self) -> Dict[str, List[float]]:
+        """Read vectors embedded by an earlier, interrupted run"""
+        vectors = {}
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return vectors
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    vectors[entry["hash"]] = entry["embedding"]
+                except (json.JSONDecodeError, KeyError):
+                    # A run killed mid-write can leave a truncated last line
+                    continue
+        logging.info(f"Loaded {len(vectors)} embeddings from checkpoint {self.checkpoint_path}")
+        return vectors
+
+    def _append_checkpoint(self, nodes: List[Dict], vectors: List[List[float]]):
+        if self.checkpoint_path is None:
+            return
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            for node, vector in zip(nodes, vectors):
+                f.write(json.dumps({"hash": node["hash"], "embedding": vector}) + "\n")
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, backing off on rate limits and transient API errors"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.embeddings.create(model=self.model, input=texts)
+                return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or min(60.0, 2 ** attempt) * (0.5 + random.random())
+                self.stats["retries"] += 1
+                logging.warning(f"Embedding request failed ({type(e).__name__}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _write(self, nodes: List[Dict], vectors: List[List[float]]):
+        rows = [
+            {"id": node["id"], "embedding": vector, "hash": node["hash"]}
+            for node, vector in zip(nodes, vectors)
+        ]
+
+        def _write_batch(tx):
+            tx.run(
+                """
+                UNWIND $rows AS row
+                MATCH (a:Advice) WHERE elementId(a) = row.id
+                CALL db.create.setNodeVectorProperty(a, 'embedding', row.embedding)
+                SET a.embedding_hash = row.hash
+                """,
+                rows=rows
+            )
+
+        with self.driver.session() as session:
+            session.execute_write(_write_batch)
+        return len(rows)
+
+    def ensure_vector_index(self, index_name: str = "advice_embedding", dimensions: int = 1536):
+        """Create the vector index the retrievers query, if it is missing"""
+        create_vector_index(
+            self.driver,
+            name=index_name,
+            label="Advice",
+            embedding_property="embedding",
+            dimensions=dimensions,
+            similarity_fn="cosine"
+        )
+
+    async def run(self) -> Dict[str, float]:
+        """
+        Embed every Advice node whose content changed since the last run.
+
+        Returns:
+            Dict with skipped/embedded/written counts, retries and elapsed seconds
+        """
+        start_time = time.perf_counter()
+        self.ensure_vector_index()
+        pending = self._pending_nodes()
+        logging.info(f"{len(pending)} Advice nodes need embeddings ({self.stats['skipped']} unchanged)")
+
+        # Nodes already embedded by an interrupted run only need writing back
+        checkpoint = self._load_checkpoint()
+        resumed = [node for node in pending if node["hash"] in checkpoint]
+        to_embed = [node for node in pending if node["hash"] not in checkpoint]
+        for i in range(0, len(resumed), self.batch_size):
+            batch = resumed[i:i + self.batch_size]
+            self.stats["written"] += self._write(batch, [checkpoint[node["hash"]] for node in batch])
+        self.stats["from_checkpoint"] = len(resumed)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(batch: List[Dict]):
+            async with semaphore:
+                vectors = await self._embed([node["text"] for node in batch])
+            self._append_checkpoint(batch, vectors)
+            self.stats["embedded"] += len(batch)
+            # Neo4j writes go through the sync driver; keep them off the event loop
+            written = await asyncio.to_thread(self._write, batch, vectors)
+            self.stats["written"] += written
+            logging.info(f"Embedded {self.stats['embedded']}/{len(to_embed)} Advice nodes")
+
+        self._prepare_inputs(to_embed)
+        if self.stats["truncated"]:
+            logging.warning(f"Truncated {self.stats['truncated']} Advice texts to {MAX_INPUT_TOKENS} tokens for embedding")
+        batches = token_batches(to_embed, self.batch_size, self.batch_tokens)
+        await asyncio.gather(*(process(batch) for batch in batches))
+
+        # Everything is in the graph now, so the checkpoint is no longer needed
+        if self.checkpoint_path is not None and self.checkpoint_path.exists():
+            self.checkpoint_path.unlink()
+
+        elapsed = time.perf_counter() - start_time
+        self.stats["seconds"] = elapsed
+        logging.info(f"Embedding stage finished in {elapsed:.2f}s: {self.stats}")
+        return dict(self.stats)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Embed Advice nodes that are missing or have stale embeddings")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per embedding request")
+    parser.add_argument("--batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS, help="Tokens per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT_PATH, help="Checkpoint file for resuming")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = Config()
+    with neo4j.GraphDatabase.driver(config.URI, auth=config.AUTH) as driver:
+        stage = EmbeddingStage(
+            driver,
+            model=getattr(config, "embedding_model_name", DEFAULT_EMBEDDING_MODEL),
+            batch_size=args.batch_size,
+            batch_tokens=args.batch_tokens,
+            concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint,
+        )
+        await stage.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
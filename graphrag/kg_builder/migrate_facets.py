@@ -0,0 +1,139 @@
+"""
+Collapse duplicate facet nodes in an existing knowledge graph.
+
+Graphs built before facet nodes were MERGEd on their name contain one Topic,
+SubTopic, AgeGroup, GuidanceStyle, TemporalContext, Author and Source node per
+Advice. This migration:
+
+1. Backfills `name` on AgeGroup/GuidanceStyle/TemporalContext from their legacy
+   label properties and moves Source URLs onto the CITED_FROM relationships.
+2. For every facet label, keeps one node per name, re-points the Advice
+   relationships of the duplicates at it and deletes the duplicates.
+3. Creates the uniqueness constraints the builder relies on.
+
+Usage:
+    python -m graphrag.kg_builder.migrate_facets [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import Dict
+
+import neo4j
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from graphrag.config import Config
+from graphrag.kg_builder.neo4j_builder_2 import FACET_KEY, FACET_RELATIONSHIPS, ensure_facet_constraints
+
+# Properties the older builder used instead of `name` for some facet labels
+LEGACY_KEYS = {
+    "AgeGroup": "age_label",
+    "GuidanceStyle": "style_name",
+    "TemporalContext": "context_label",
+}
+
+
+def count_facet_nodes(session) -> Dict[str, int]:
+    """Return the number of nodes per facet label"""
+    counts = {}
+    for label in FACET_RELATIONSHIPS:
+        counts[label] = session.run(f"MATCH (n:{label}) RETURN count(n) AS count").single()["count"]
+    return counts
+
+
+def count_duplicates(session) -> Dict[str, int]:
+    """Return how many nodes per facet label would be removed by the migration"""
+    duplicates = {}
+    for label in FACET_RELATIONSHIPS:
+        legacy = LEGACY_KEYS.get(label, FACET_KEY)
+        record = session.run(
+            f"""
+            MATCH (n:{label})
+            WITH coalesce(n.{FACET_KEY}, n.{legacy}) AS key, count(n) AS copies
+            WHERE key IS NOT NULL AND copies > 1
+            RETURN coalesce(sum(copies - 1), 0) AS duplicates
+            """
+        ).single()
+        duplicates[label] = record["duplicates"]
+    return duplicates
+
+
+def backfill_keys(session):
+    """Give every facet node a `name` and move Source URLs onto CITED_FROM"""
+    for label, legacy in LEGACY_KEYS.items():
+        session.run(
+            f"MATCH (n:{label}) WHERE n.{FACET_KEY} IS NULL AND n.{legacy} IS NOT NULL "
+            f"SET n.{FACET_KEY} = n.{legacy}"
+        )
+    session.run(
+        """
+        MATCH ()-[r:CITED_FROM]->(s:Source)
+        WHERE s.url IS NOT NULL AND r.url IS NULL
+        SET r.url = s.url
+        """
+    )
+    session.run("MATCH (s:Source) WHERE s.url IS NOT NULL REMOVE s.url")
+
+
+def collapse_label(session, label: str, rel_type: str) -> int:
+    """Merge all nodes of `label` sharing a name into one and return how many were deleted"""
+    def _collapse(tx):
+        record = tx.run(
+            f"""
+            MATCH (n:{label})
+            WHERE n.{FACET_KEY} IS NOT NULL
+            WITH n.{FACET_KEY} AS key, collect(n) AS nodes
+            WHERE size(nodes) > 1
+            WITH head(nodes) AS keep, tail(nodes) AS duplicates
+            UNWIND duplicates AS duplicate
+            OPTIONAL MATCH (a)-[r:{rel_type}]->(duplicate)
+            FOREACH (_ IN CASE WHEN r IS NULL THEN [] ELSE [1] END |
+                MERGE (a)-[moved:{rel_type}]->(keep)
+                SET moved += properties(r)
+            )
+            WITH DISTINCT duplicate
+            DETACH DELETE duplicate
+            RETURN count(*) AS deleted
+            """
+        ).single()
+        return record["deleted"]
+
+    return session.execute_write(_collapse)
+
+
+def migrate(driver, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """Run the facet migration and return node counts before and after"""
+    with driver.session() as session:
+        before = count_facet_nodes(session)
+        logging.info(f"Facet nodes before migration: {before}")
+        logging.info(f"Duplicate facet nodes: {count_duplicates(session)}")
+        if dry_run:
+            return {"before": before, "after": before}
+
+        backfill_keys(session)
+        for label, rel_type in FACET_RELATIONSHIPS.items():
+            deleted = collapse_label(session, label, rel_type)
+            logging.info(f"Collapsed {deleted} duplicate {label} nodes")
+
+        ensure_facet_constraints(session)
+
+        after = count_facet_nodes(session)
+        logging.info(f"Facet nodes after migration: {after}")
+        logging.info(f"Removed {sum(before.values()) - sum(after.values())} facet nodes in total")
+        return {"before": before, "after": after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collapse duplicate facet nodes into canonical shared nodes")
+    parser.add_argument("--dry-run", action="store_true", help="Only report duplicate counts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = Config()
+    with neo4j.GraphDatabase.driver(config.URI, auth=config.AUTH) as driver:
+        migrate(driver, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
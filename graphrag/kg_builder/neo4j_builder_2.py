@@ -1,11 +1,18 @@
+import argparse
 import json
 import neo4j
 from dotenv import load_dotenv
 from openai import AzureOpenAI
 import logging
 from dataclasses import dataclass
-from typing import List, Dict, Optional,Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import asyncio
+import gzip
+import itertools
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
 from pathlib import Path
 
 from neo4j_graphrag.llm import AzureOpenAILLM, OpenAILLM
@@ -15,6 +22,8 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from graphrag.config import Config
+from graphrag.kg_builder.embedding_stage import DEFAULT_EMBEDDING_MODEL, EmbeddingStage
+from graphrag.kg_builder.row_identity import diff_rows, identify_rows
 from neo4j_graphrag.experimental.pipeline.kg_builder import SimpleKGPipeline
 
 @dataclass
@@ -29,6 +38,29 @@ class GraphSchema:
             "relationships": self.relationships
         }
 
+# Facet labels are shared between Advice nodes: one node per distinct name,
+# reached from Advice through the given relationship type
+FACET_RELATIONSHIPS = {
+    "Topic": "HAS_TOPIC",
+    "SubTopic": "HAS_SUBTOPIC",
+    "AgeGroup": "RECOMMENDED_FOR",
+    "GuidanceStyle": "USES_STYLE",
+    "TemporalContext": "SUGGESTED_AT",
+    "Author": "WRITTEN_BY",
+    "Source": "CITED_FROM",
+}
+FACET_KEY = "name"
+
+
+def ensure_facet_constraints(session):
+    """Create a uniqueness constraint on the natural key of every facet label"""
+    for label in FACET_RELATIONSHIPS:
+        session.run(
+            f"CREATE CONSTRAINT {label.lower()}_{FACET_KEY}_unique IF NOT EXISTS "
+            f"FOR (n:{label}) REQUIRE n.{FACET_KEY} IS UNIQUE"
+        )
+
+
 class PromptTemplate:
     """Manages prompt templates for knowledge graph construction using ERExtractionTemplate"""
 
@@ -54,29 +86,72 @@ class PromptTemplate:
 
         return self.template.format(schema=schema_dict, examples=examples, text=text)
 
-    def load_jsonl(self, file_path):
-        resources = []
-        with open(file_path, encoding='utf-8') as f:
+    def iter_jsonl(self, file_path, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Yield resources one at a time, skipping blank and malformed lines
+
+        Files ending in `.gz` are decompressed while reading. Reading stops as
+        soon as `limit` resources have been yielded.
+        """
+        count = 0
+        opener = gzip.open if str(file_path).endswith('.gz') else open
+        with opener(file_path, 'rt', encoding='utf-8') as f:
             for i, line in enumerate(f, 1):
+                if limit is not None and count >= limit:
+                    break
                 try:
                     # Skip empty lines
                     if not line.strip():
                         continue
                     resource = json.loads(line)
-                    resources.append(resource)
                     # Debug the first few resources
                     if i <= 3:
                         logging.debug(f"Resource {i} structure: {json.dumps(resource, indent=2)}")
                 except json.JSONDecodeError as e:
                     logging.error(f"Error parsing line {i}: {e}")
+                    continue
+                if not isinstance(resource, dict):
+                    logging.error(f"Skipping line {i}: expected a JSON object")
+                    continue
+                count += 1
+                yield resource
+
+    def load_jsonl(self, file_path):
+        resources = list(self.iter_jsonl(file_path))
         logging.info(f"Loaded {len(resources)} resources from {file_path}")
         return resources
 
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of `size` items without materializing it"""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 class KnowledgeGraphBuilder:
     """Manages the construction of the knowledge graph"""
 
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        batch_size: int = 1000,
+        concurrency: int = 8,
+        read_batch_size: int = 500,
+        use_llm_extraction: bool = False
+    ):
         self.config = config
+        # Rows per UNWIND statement when writing nodes and relationships
+        self.batch_size = batch_size
+        # Resources processed at the same time during a build
+        self.concurrency = concurrency
+        # Rows read, extracted and written together while streaming the source file
+        self.read_batch_size = read_batch_size
+        self._write_indexes_ready = False
+        # Tag extraction preserves the full text content better than the LLM pipeline
+        self.use_llm_extraction = use_llm_extraction
+        self._pipeline: Optional[SimpleKGPipeline] = None
         self.schema = GraphSchema(
             nodes=[
                 "Advice", "Topic", "SubTopic", "AgeGroup", "GuidanceStyle",
@@ -117,6 +192,14 @@ class KnowledgeGraphBuilder:
             from_pdf=False
         )
 
+    def _get_pipeline(self) -> SimpleKGPipeline:
+        """Return the shared extraction pipeline, creating it (and its examples) once"""
+        if self._pipeline is None:
+            # Set up the example annotations for the template
+            self.prompt_template.template.examples = self._get_example_annotations()
+            self._pipeline = self._create_pipeline()
+        return self._pipeline
+
     def _extract_entities_from_tags(self, resource: Dict) -> Dict:
         """Extract entities from the tags field of a resource"""
         entities = []
@@ -128,6 +211,11 @@ class KnowledgeGraphBuilder:
             "title": resource.get('title', 'Unknown Advice')
         }
 
+        # Stable row identity used by incremental rebuilds
+        if '_source_id' in resource:
+            advice_properties["source_id"] = resource['_source_id']
+            advice_properties["row_hash"] = resource['_row_hash']
+
         # Add full text content if available - store in both name and content properties
         # to ensure compatibility with retrievers that might use either property
         if 'full_text' in resource and isinstance(resource['full_text'], dict) and 'content' in resource['full_text']:
@@ -219,7 +307,8 @@ class KnowledgeGraphBuilder:
                     age_node = {
                         "id": age_id,
                         "label": "AgeGroup",
-                        "properties": {"age_label": age}
+                        # name is the canonical key shared with the other facet labels
+                        "properties": {"age_label": age, "name": age}
                     }
                     entities.append(age_node)
 
@@ -238,7 +327,7 @@ class KnowledgeGraphBuilder:
                     style_node = {
                         "id": style_id,
                         "label": "GuidanceStyle",
-                        "properties": {"style_name": style}
+                        "properties": {"style_name": style, "name": style}
                     }
                     entities.append(style_node)
 
@@ -279,19 +368,19 @@ class KnowledgeGraphBuilder:
                 "id": source_id,
                 "label": "Source",
                 "properties": {
-                    "name": source.get('name', 'Unknown Source'),
-                    "type": source.get('type', ''),
-                    "url": source.get('url', '')
+                    "name": source.get('name') or 'Unknown Source',
+                    "type": source.get('type', '')
                 }
             }
             entities.append(source_node)
 
-            # Create relationship from Advice to Source
+            # Create relationship from Advice to Source; the URL identifies the cited
+            # page rather than the source itself, so it lives on the relationship
             relationships.append({
                 "type": "CITED_FROM",
                 "start_node_id": advice_id,
                 "end_node_id": source_id,
-                "properties": {}
+                "properties": {"url": source.get('url', '')}
             })
 
         # Process temporal context
@@ -300,7 +389,10 @@ class KnowledgeGraphBuilder:
             context_node = {
                 "id": context_id,
                 "label": "TemporalContext",
-                "properties": {"context_label": resource['temporal_context']}
+                "properties": {
+                    "context_label": resource['temporal_context'],
+                    "name": resource['temporal_context']
+                }
             }
             entities.append(context_node)
 
@@ -365,16 +457,9 @@ class KnowledgeGraphBuilder:
         logging.info(f"Extracted {len(tag_entities['nodes'])} nodes and {len(tag_entities['relationships'])} relationships from tags")
 
         # Decide whether to use LLM extraction or just tag extraction
-        # Set to False to use only tag extraction which preserves the full text content better
-        use_llm_extraction = False  # Using tag extraction to preserve full text content
-
-        if use_llm_extraction:
-            # Set up the example annotations for the template
-            examples = self._get_example_annotations()
-            self.prompt_template.template.examples = examples  # Set the examples on the template
-
-            # Create the pipeline with the template
-            pipeline = self._create_pipeline()
+        if self.use_llm_extraction:
+            # One pipeline is shared by every resource in the build
+            pipeline = self._get_pipeline()
 
             try:
                 logging.info(f"Starting pipeline for resource: {resource_title}")
@@ -435,65 +520,408 @@ Output:
 }}
 """
 
-    async def build_knowledge_graph(self, resources_path: Path, limit: int = None):
+    async def build_knowledge_graph(
+        self,
+        resources_path: Path,
+        limit: int = None,
+        embed: bool = True,
+        incremental: bool = False
+    ) -> Dict[str, int]:
         """Build the complete knowledge graph from all resources
 
+        The source file is streamed: rows are read, extracted and written in
+        batches of `read_batch_size`, so memory use does not grow with file size.
+
         Args:
-            resources_path: Path to the JSONL file containing resources
+            resources_path: Path to the JSONL (or gzip-compressed .jsonl.gz) file containing resources
             limit: Optional limit on number of resources to process (for testing)
-        """
-        resources = self.prompt_template.load_jsonl(resources_path)
+            embed: Run the embedding stage on Advice nodes after writing the graph
+            incremental: Only write rows whose content hash changed since the last build
+                and delete rows that disappeared from the source file
 
-        # Limit the number of resources if specified
+        Returns:
+            Dict with the number of rows read and processed and of nodes and relationships written
+        """
+        timings = defaultdict(float)
+        start_time = time.perf_counter()
         if limit is not None:
-            logging.info(f"Processing limited set of {limit} resources (out of {len(resources)} total)")
-            resources = resources[:limit]
+            logging.info(f"Processing limited set of {limit} resources")
         else:
-            logging.info(f"Processing all {len(resources)} resources")
+            logging.info(f"Processing all resources in {resources_path}")
+
+        summary = {"read": 0, "processed": 0, "nodes": 0, "relationships": 0}
+        changes = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        occurrences: Dict[str, int] = defaultdict(int)
+        seen_ids = set()
+        existing = None
+        if incremental:
+            step_start = time.perf_counter()
+            existing = self._existing_row_hashes()
+            timings["diff"] += time.perf_counter() - step_start
+
+        rows = self.prompt_template.iter_jsonl(resources_path, limit=limit)
+        for batch in _chunked(rows, self.read_batch_size):
+            summary["read"] += len(batch)
+            identify_rows(batch, occurrences)
+
+            seen_ids.update(r['_source_id'] for r in batch)
+            if incremental:
+                step_start = time.perf_counter()
+                diff = diff_rows(batch, existing, detect_removed=False)
+                for key in ("added", "updated", "unchanged"):
+                    changes[key] += len(diff[key])
+                updated_ids = [r['_source_id'] for r in diff["updated"]]
+                batch = diff["added"] + diff["updated"]
+                timings["diff"] += time.perf_counter() - step_start
+            else:
+                # A full build rewrites every row, so any Advice it already wrote is reset first
+                updated_ids = [r['_source_id'] for r in batch]
+
+            step_start = time.perf_counter()
+            results = await self.process_resources(batch)
+            summary["processed"] += len(results)
+            timings["extract"] += time.perf_counter() - step_start
+
+            if updated_ids:
+                step_start = time.perf_counter()
+                self._reset_advice(updated_ids, [])
+                timings["delete"] += time.perf_counter() - step_start
+
+            # Actually create the nodes and relationships in Neo4j
+            step_start = time.perf_counter()
+            written = await self._create_graph_entities(results)
+            summary["nodes"] += written["nodes"]
+            summary["relationships"] += written["relationships"]
+            timings["write"] += time.perf_counter() - step_start
+
+        logging.info(f"Processed {summary['processed']}/{summary['read']} resources successfully")
+
+        # With a limit we only see part of the file, so absent rows are not removals.
+        # A full build also removes keyed Advice whose row left the file; Advice
+        # from builds that predate source ids can't be matched and are left alone.
+        if limit is None:
+            step_start = time.perf_counter()
+            if existing is None:
+                existing = self._existing_row_hashes(allow_unkeyed=True)
+            removed = sorted(set(existing) - seen_ids)
+            changes["removed"] = len(removed)
+            self._reset_advice([], removed)
+            timings["delete"] += time.perf_counter() - step_start
+
+        if embed:
+            step_start = time.perf_counter()
+            await self.embed_advice()
+            timings["embed"] = time.perf_counter() - step_start
+
+        # Bump the version stamp so cached answers built on the old graph are invalidated
+        if not incremental or changes["added"] or changes["updated"] or changes["removed"]:
+            self._stamp_kg_version()
+
+        if incremental:
+            timings["total"] = time.perf_counter() - start_time
+            self._log_change_manifest(changes, timings)
+
+        return summary
+
+    async def process_resources(self, resources: List[Dict]) -> List:
+        """Process resources through a pool of at most `concurrency` concurrent workers
+
+        Results keep the order of `resources` regardless of which finishes first,
+        with failed resources left out.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        total = len(resources)
+        start_time = time.perf_counter()
+
+        async def worker(i: int, resource: Dict):
+            async with semaphore:
+                logging.info(f"Processing resource {i}/{total}: {resource.get('title', 'Unknown Title')}")
+                try:
+                    return await self.process_resource(resource)
+                except Exception as e:
+                    logging.error(f"Error processing resource {i}: {e}")
+                    return None
+
+        outcomes = await asyncio.gather(*(worker(i, r) for i, r in enumerate(resources, 1)))
 
         results = []
-        for i, resource in enumerate(resources, 1):
-            logging.info(f"Processing resource {i}/{len(resources)}: {resource.get('title', 'Unknown Title')}")
-            result = await self.process_resource(resource)
+        for i, result in enumerate(outcomes, 1):
             if result:
                 results.append(result)
-                logging.info(f"Successfully added resource {i} to knowledge graph")
             else:
                 logging.warning(f"Failed to process resource {i}")
 
-        logging.info(f"Processed {len(results)}/{len(resources)} resources successfully")
-        
-        # Actually create the nodes and relationships in Neo4j
-        await self._create_graph_entities(results)
-        
+        elapsed = time.perf_counter() - start_time
+        throughput = total / elapsed if elapsed > 0 else float('inf')
+        logging.info(
+            f"Processed {len(results)}/{total} resources successfully in {elapsed:.2f}s "
+            f"({throughput:.1f} resources/sec, concurrency {self.concurrency})"
+        )
         return results
+
+    def _existing_row_hashes(self, allow_unkeyed: bool = False) -> Dict[str, str]:
+        """Return {source_id: row_hash} for every Advice node written by an earlier build
+
+        Args:
+            allow_unkeyed: Ignore Advice nodes without a source_id instead of raising
+
+        Raises:
+            RuntimeError: If any Advice node has no source_id (unless allowed). Such
+                nodes come from a build that predates row identities; they can't be
+                matched to rows, so an incremental build would write every row again
+                next to them.
+        """
+        with self.neo4j_driver.session() as session:
+            records = list(session.run(
+                """
+                MATCH (a:Advice)
+                RETURN a.source_id AS source_id, a.row_hash AS row_hash
+                """
+            ))
+        unkeyed = sum(1 for record in records if record["source_id"] is None)
+        if unkeyed and not allow_unkeyed:
+            raise RuntimeError(
+                f"{unkeyed} Advice nodes have no source_id, so they can't be matched to source rows. "
+                "Clear them and run a full build (without --incremental) before building incrementally."
+            )
+        return {record["source_id"]: record["row_hash"] for record in records if record["source_id"] is not None}
+
+    def _reset_advice(self, updated_ids: List[str], removed_ids: List[str]):
+        """Clear out rows that changed or disappeared before the new versions are written
+
+        Updated Advice nodes keep their identity (and embedding, which the embedding
+        stage refreshes only if the content changed) but lose their relationships,
+        private child nodes and row properties, which are recreated from the new row.
+        Removed Advice nodes are deleted outright. Facet nodes left without any
+        Advice are dropped.
+        """
+        def _reset(tx):
+            tx.run(
+                """
+                UNWIND $ids AS id
+                MATCH (a:Advice {source_id: id})
+                OPTIONAL MATCH (a)-[:HAS_ACTIONABLE_ADVICE|HAS_SCENARIO_NOTE]->(child)
+                DETACH DELETE child
+                WITH DISTINCT a
+                OPTIONAL MATCH (a)-[r]->()
+                DELETE r
+                WITH DISTINCT a
+                // Drop properties the new row may no longer have
+                SET a = {source_id: a.source_id, embedding: a.embedding, embedding_hash: a.embedding_hash}
+                """,
+                ids=updated_ids + removed_ids
+            )
+            tx.run(
+                """
+                UNWIND $ids AS id
+                MATCH (a:Advice {source_id: id})
+                DETACH DELETE a
+                """,
+                ids=removed_ids
+            )
+            tx.run(
+                """
+                MATCH (f)
+                WHERE any(label IN labels(f) WHERE label IN $facets) AND NOT (f)--()
+                DELETE f
+                """,
+                facets=list(FACET_RELATIONSHIPS)
+            )
+
+        if updated_ids or removed_ids:
+            with self.neo4j_driver.session() as session:
+                session.execute_write(_reset)
+
+    def _log_change_manifest(self, changes: Dict[str, int], timings: Dict[str, float]):
+        """Log what an incremental build changed and how long each step took"""
+        lines = ["Incremental build change manifest:"]
+        lines += [f"  {key:<10} {count}" for key, count in changes.items()]
+        lines += [f"  {step:<10} {seconds:.2f}s" for step, seconds in timings.items()]
+        logging.info("\n".join(lines))
+
+    async def embed_advice(self) -> Dict[str, float]:
+        """Embed Advice nodes whose content changed since they were last embedded"""
+        stage = EmbeddingStage(
+            self.neo4j_driver,
+            model=getattr(self.config, "embedding_model_name", DEFAULT_EMBEDDING_MODEL)
+        )
+        return await stage.run()
+
+    def _stamp_kg_version(self) -> str:
+        """Record a new knowledge graph version on the singleton :KGMeta node"""
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        with self.neo4j_driver.session() as session:
+            session.run(
+                """
+                MERGE (m:KGMeta {name: 'hestia'})
+                SET m.version = $version, m.updated_at = datetime()
+                """,
+                version=version
+            )
+        logging.info(f"Stamped knowledge graph version {version}")
+        return version
     
-    async def _create_graph_entities(self, results):
-        """Create the extracted entities and relationships in Neo4j"""
+    def _group_for_bulk_write(self, results) -> Tuple[Dict[str, List[Dict]], Dict[Tuple[str, str, str], List[Dict]]]:
+        """Group extracted entities into per-label node rows and per-type relationship rows
+
+        Facet nodes (see FACET_RELATIONSHIPS) are keyed by their name and deduplicated
+        across resources, and Advice nodes by their source_id. Every other node gets a
+        `kg_key` built from the Advice source_id (or a uuid) and its local id, so
+        relationships can be linked by keys generated here rather than by the local
+        index strings, which are only unique within one resource.
+        """
+        nodes_by_label: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        rels_by_type: Dict[Tuple[str, str, str], List[Dict]] = defaultdict(list)
+
+        for result in results:
+            if not (isinstance(result, dict) and 'nodes' in result):
+                continue
+
+            advice = next((n for n in result['nodes'] if n['label'] == "Advice"), None)
+            resource_key = (advice or {}).get('properties', {}).get('source_id') or uuid.uuid4().hex
+            labels = {}
+            for node in result['nodes']:
+                if node['label'] not in self.schema.nodes:
+                    logging.warning(f"Skipping node with unknown label: {node['label']}")
+                    continue
+                if node['label'] in FACET_RELATIONSHIPS:
+                    key = node['properties'].get(FACET_KEY)
+                    if not key:
+                        logging.warning(f"Skipping {node['label']} node without a {FACET_KEY}")
+                        continue
+                elif node['label'] == "Advice":
+                    key = resource_key
+                else:
+                    key = f"{resource_key}:{node['id']}"
+                labels[node['id']] = (node['label'], key)
+                nodes_by_label[node['label']][key] = {"key": key, "properties": node['properties']}
+
+            for rel in result['relationships']:
+                start = labels.get(rel['start_node_id'])
+                end = labels.get(rel['end_node_id'])
+                if rel['type'] not in self.schema.relationships or start is None or end is None:
+                    logging.warning(f"Skipping relationship {rel['type']} with unknown type or endpoints")
+                    continue
+                rels_by_type[(rel['type'], start[0], end[0])].append({
+                    "start": start[1],
+                    "end": end[1],
+                    "properties": rel.get('properties', {})
+                })
+
+        return {label: list(rows.values()) for label, rows in nodes_by_label.items()}, rels_by_type
+
+    @staticmethod
+    def _key_property(label: str) -> str:
+        """Property that identifies nodes of `label` during bulk writes"""
+        if label in FACET_RELATIONSHIPS:
+            return FACET_KEY
+        return "source_id" if label == "Advice" else "kg_key"
+
+    def _batches(self, rows: List[Dict]):
+        """Yield successive `batch_size` slices of rows"""
+        for i in range(0, len(rows), self.batch_size):
+            yield rows[i:i + self.batch_size]
+
+    def _ensure_key_indexes(self, session, labels):
+        """Make sure every key used to link relationships is backed by an index
+
+        Facet labels get uniqueness constraints on their name and Advice on its
+        source_id; the rest get a range index on kg_key.
+        """
+        ensure_facet_constraints(session)
+        session.run(
+            "CREATE CONSTRAINT advice_source_id_unique IF NOT EXISTS "
+            "FOR (n:Advice) REQUIRE n.source_id IS UNIQUE"
+        )
+        for label in labels:
+            if label not in FACET_RELATIONSHIPS and label != "Advice":
+                session.run(f"CREATE INDEX {label.lower()}_kg_key IF NOT EXISTS FOR (n:{label}) ON (n.kg_key)")
+
+    async def _create_graph_entities(self, results) -> Dict[str, float]:
+        """Create the extracted entities and relationships in Neo4j
+
+        Nodes are grouped by label and relationships by (type, start label, end label),
+        then written with parameterized UNWIND statements of `batch_size` rows, each
+        inside its own write transaction.
+
+        Returns:
+            Dict with node/relationship counts, elapsed seconds and rows per second
+        """
+        nodes_by_label, rels_by_type = self._group_for_bulk_write(results)
+
+        def write_nodes(tx, label, rows):
+            # MERGE on the generated key keeps re-runs idempotent; shared facet nodes
+            # reuse the existing node for their name, and `+=` keeps Advice embeddings
+            key = self._key_property(label)
+            tx.run(
+                f"""
+                UNWIND $rows AS row
+                MERGE (n:{label} {{{key}: row.key}})
+                SET n += row.properties
+                """,
+                rows=rows
+            )
+
+        def write_relationships(tx, rel_type, start_label, end_label, rows):
+            start_key = self._key_property(start_label)
+            end_key = self._key_property(end_label)
+            tx.run(
+                f"""
+                UNWIND $rows AS row
+                MATCH (a:{start_label} {{{start_key}: row.start}})
+                MATCH (b:{end_label} {{{end_key}: row.end}})
+                MERGE (a)-[r:{rel_type}]->(b)
+                SET r += row.properties
+                """,
+                rows=rows
+            )
+
+        node_count = sum(len(rows) for rows in nodes_by_label.values())
+        rel_count = sum(len(rows) for rows in rels_by_type.values())
+        start_time = time.perf_counter()
+
         with self.neo4j_driver.session() as session:
-            for result in results:
-                if isinstance(result, dict) and 'nodes' in result:
-                    # Create nodes
-                    for node in result['nodes']:
-                        query = f"""
-                        CREATE (n:{node['label']} $properties)
-                        """
-                        session.run(query, properties=node['properties'])
-                    
-                    # Create relationships
-                    for rel in result['relationships']:
-                        query = f"""
-                        MATCH (a), (b)
-                        WHERE id(a) = $start_id AND id(b) = $end_id
-                        CREATE (a)-[:{rel['type']}]->(b)
-                        """
-                        session.run(query, 
-                                  start_id=int(rel['start_node_id']), 
-                                  end_id=int(rel['end_node_id']))
-        
-        logging.info("Successfully created all entities in Neo4j")
+            if not self._write_indexes_ready:
+                self._ensure_key_indexes(session, self.schema.nodes)
+                self._write_indexes_ready = True
+
+            for label, rows in nodes_by_label.items():
+                for batch in self._batches(rows):
+                    session.execute_write(write_nodes, label, batch)
+
+            for (rel_type, start_label, end_label), rows in rels_by_type.items():
+                for batch in self._batches(rows):
+                    session.execute_write(write_relationships, rel_type, start_label, end_label, batch)
+
+        elapsed = time.perf_counter() - start_time
+        rows_per_sec = (node_count + rel_count) / elapsed if elapsed > 0 else float('inf')
+        logging.info(
+            f"Created {node_count} nodes and {rel_count} relationships in {elapsed:.2f}s "
+            f"({rows_per_sec:.0f} rows/sec, batch size {self.batch_size})"
+        )
+        return {
+            "nodes": node_count,
+            "relationships": rel_count,
+            "seconds": elapsed,
+            "rows_per_sec": rows_per_sec
+        }
 
 async def main():
+    parser = argparse.ArgumentParser(description="Build the Hestia knowledge graph from a JSONL export")
+    parser.add_argument("resources_path", nargs="?", type=Path,
+                        default=Path("/Users/matthewtaruno/dev/hestia/data/brain.jsonl"),
+                        help="JSONL file with one resource per line, optionally gzip-compressed (.jsonl.gz)")
+    parser.add_argument("--limit", type=int, default=None, help="Only process the first N resources")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only write changed rows and delete rows removed from the file "
+                             "(needs a graph built with row identities)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per UNWIND write")
+    parser.add_argument("--no-embed", action="store_true", help="Skip the embedding stage")
+    parser.add_argument("--concurrency", type=int, default=8, help="Resources processed at the same time")
+    parser.add_argument("--read-batch-size", type=int, default=500,
+                        help="Rows read, extracted and written together while streaming")
+    args = parser.parse_args()
+
     # Set up logging with more details
     logging.basicConfig(
         level=logging.INFO,
@@ -505,23 +933,30 @@ async def main():
     )
 
     config = Config()
-    resources_path = Path("/Users/matthewtaruno/dev/hestia/data/brain.jsonl")
+    resources_path = args.resources_path
 
-    # Process only 5 resources first to test
-    limit = None  # Set to None to process all resources
+    # Use --limit 5 to process only a few resources first to test
+    limit = args.limit
 
-    builder = KnowledgeGraphBuilder(config)
+    builder = KnowledgeGraphBuilder(
+        config,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        read_batch_size=args.read_batch_size
+    )
     logging.info(f"Starting knowledge graph building process with limit={limit}")
-    results = await builder.build_knowledge_graph(resources_path, limit=limit)
+    summary = await builder.build_knowledge_graph(
+        resources_path,
+        limit=limit,
+        embed=not args.no_embed,
+        incremental=args.incremental
+    )
 
-    logging.info(f"Processed {len(results)} resources successfully")
+    logging.info(f"Processed {summary['processed']} resources successfully")
 
     # Log some statistics about the knowledge graph
-    if results:
-        total_nodes = sum(len(result.nodes) if hasattr(result, 'nodes') else 0 for result in results)
-        total_relationships = sum(len(result.relationships) if hasattr(result, 'relationships') else 0 for result in results)
-        logging.info(f"Total nodes created: {total_nodes}")
-        logging.info(f"Total relationships created: {total_relationships}")
+    logging.info(f"Total nodes written: {summary['nodes']}")
+    logging.info(f"Total relationships written: {summary['relationships']}")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Stable identities and content hashes for source rows, used by incremental builds
+
+Kept free of Neo4j and LLM imports so the diffing logic can be used (and tested) on its own.
+"""
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+
+def row_identity(resource: Dict) -> str:
+    """Stable id for a source row, derived from its title and source URL"""
+    title = " ".join(str(resource.get('title', '')).split()).casefold()
+    source = resource.get('source') if isinstance(resource.get('source'), dict) else {}
+    url = str(source.get('url', '')).strip()
+    return hashlib.sha1(f"{title}|{url}".encode("utf-8")).hexdigest()[:16]
+
+
+def row_hash(resource: Dict) -> str:
+    """Hash of everything in a source row; any edit to the row changes it"""
+    row = {k: v for k, v in resource.items() if not k.startswith('_')}
+    return hashlib.sha256(json.dumps(row, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def identify_rows(resources: List[Dict], seen: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """Stamp each resource with `_source_id` and `_row_hash`
+
+    Rows sharing a title and URL get an occurrence suffix so their ids stay unique
+    (and stable as long as their relative order does not change). Pass the same
+    `seen` dict when identifying a file batch by batch.
+    """
+    if seen is None:
+        seen = {}
+    for resource in resources:
+        base = row_identity(resource)
+        seen[base] = seen.get(base, 0) + 1
+        resource['_source_id'] = base if seen[base] == 1 else f"{base}-{seen[base]}"
+        resource['_row_hash'] = row_hash(resource)
+    return resources
+
+
+def diff_rows(resources: List[Dict], existing: Dict[str, str], detect_removed: bool = True) -> Dict:
+    """Compare identified resources against the {source_id: row_hash} already in the graph
+
+    Returns:
+        Dict with the `added`, `updated` and `unchanged` resources and the `removed` source ids
+    """
+    diff = {"added": [], "updated": [], "unchanged": [], "removed": []}
+    incoming = set()
+    for resource in resources:
+        source_id = resource['_source_id']
+        incoming.add(source_id)
+        if source_id not in existing:
+            diff["added"].append(resource)
+        elif existing[source_id] != resource['_row_hash']:
+            diff["updated"].append(resource)
+        else:
+            diff["unchanged"].append(resource)
+    if detect_removed:
+        diff["removed"] = sorted(set(existing) - incoming)
+    return diff
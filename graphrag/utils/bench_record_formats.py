@@ -0,0 +1,118 @@
+"""
+Benchmark plain JSONL against gzip-compressed JSONL.
+
+Generates a synthetic CSV shaped like the brain.csv form export, converts it
+to both formats with csv_to_jsonl.convert_csv and times how long each takes
+to write and to load back the way the builder reads it.
+
+Usage:
+    python graphrag/utils/bench_record_formats.py [--rows 100000] [--workers 4]
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from graphrag.utils.csv_to_jsonl import convert_csv
+
+COLUMNS = [
+    "Timestamp",
+    "What type of source is this?",
+    "Source Name",
+    "Source URL ",
+    "Title of Advice",
+    "Paragraph or Advice Text (Main Content Here)",
+    "Main Topic Entities",
+    "Sub-entities (If multiple other give as comma separated entries)",
+    "Intervention Suggested (Actionable)",
+    "Child Age Range (check all applicable)",
+    "Guidance Style",
+    "What scenario would this be especially useful for? (e.g. tone, cultural fit, edge cases, or special considerations)",
+    "Temporal Context (Only add if relevant)",
+    "Author",
+    "Credentials / Area of Expertise\ne.g. Ph.D. in Child Psychology, Licensed Clinical Psychologist",
+]
+
+WORDS = (
+    "child toddler calm routine bedtime choices connection limits empathy play "
+    "tantrum sleep feelings listen praise boundaries patience siblings meals screen"
+).split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def write_synthetic_csv(path, rows: int, seed: int = 7):
+    """Write `rows` random advice rows with the export's column layout"""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            writer.writerow([
+                "4/29/2025 23:58:50",
+                rng.choice(["Book", "Website Article", "Podcast"]),
+                f"Source {i % 500}",
+                f"https://example.org/advice/{i}",
+                f"Advice {i}: {_sentence(rng, 4)}",
+                " ".join(_sentence(rng, 18) for _ in range(5)),
+                ", ".join(rng.sample(WORDS, 2)),
+                ", ".join(rng.sample(WORDS, 3)),
+                _sentence(rng, 14),
+                ", ".join(rng.sample(["2 years old", "3 years old", "4 years old", "5 years old", "Any"], 2)),
+                rng.choice(["Empathic / Supportive", "Directive", "Playful"]),
+                _sentence(rng, 20),
+                rng.choice(["", "Morning", "Bedtime", "Mealtime"]),
+                rng.choice(["", "Dr. Jane Doe"]),
+                "",
+            ])
+
+
+def load_jsonl(path) -> int:
+    """Load JSONL (or .jsonl.gz) the way PromptTemplate.iter_jsonl does"""
+    count = 0
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                json.loads(line)
+                count += 1
+    return count
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSONL and .jsonl.gz write/load times")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic rows to generate")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used by the converter")
+    parser.add_argument("--repeat", type=int, default=3, help="Load repetitions (best time is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "synthetic.csv")
+        write_synthetic_csv(csv_path, args.rows)
+        print(f"Generated {args.rows} rows ({os.path.getsize(csv_path) / 1e6:.1f} MB CSV)\n")
+
+        print(f"{'format':<8} {'write s':>9} {'load s':>9} {'rows/s':>12} {'size MB':>9}")
+        for fmt, suffix in (("jsonl", ".jsonl"), ("gzip", ".jsonl.gz")):
+            out_path = os.path.join(tmp, f"synthetic{suffix}")
+            _, write_time = _timed(convert_csv, csv_path, out_path, output_format=fmt, workers=args.workers)
+            load_time = min(_timed(load_jsonl, out_path)[1] for _ in range(args.repeat))
+            size = os.path.getsize(out_path) / 1e6
+            print(f"{fmt:<8} {write_time:>9.2f} {load_time:>9.2f} {args.rows / load_time:>12,.0f} {size:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,166 @@
+"""
+Convert the brain.csv form export into builder input.
+
+Usage:
+    python graphrag/utils/csv_to_jsonl.py [input.csv] [output.jsonl|output.jsonl.gz]
+        [--format jsonl|gzip] [--chunk-size 5000] [--workers 4]
+
+The CSV is streamed in chunks of rows. Each chunk is converted (and
+serialized) in a worker process when --workers > 1, and chunks are written
+back in input order. `--format gzip` compresses each chunk as its own gzip
+member in the worker. Concatenated members form a standard `.jsonl.gz` file,
+about a fifth the size of plain JSONL, which the builder reads directly.
+"""
+import argparse
 import csv
+import gzip
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
 
-input_csv_path = '/Users/matthewtaruno/dev/hestia/data/brain.csv'  # path to your CSV file
-output_jsonl_path = '/Users/matthewtaruno/dev/hestia/data/brain.jsonl'  # where the JSONL file will go
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+input_csv_path = os.path.join(root_dir, 'data', 'brain.csv')  # path to your CSV file
+output_jsonl_path = os.path.join(root_dir, 'data', 'brain.jsonl')  # where the JSONL file will go
+# Fast compression: conversion stays CPU-cheap and the output is still ~5x smaller
+GZIP_LEVEL = 1
 
-def convert_csv_to_jsonl(csv_path, jsonl_path):
-    with open(csv_path, newline='', encoding='utf-8') as csvfile, open(jsonl_path, 'w', encoding='utf-8') as jsonlfile:
+
+def _split(value: str) -> List[str]:
+    return [e.strip() for e in value.split(",") if e.strip()]
+
+
+def convert_row(row: Dict[str, str]) -> Optional[Dict]:
+    """Turn one CSV row into a builder resource, or None if it has no content"""
+    main_text = (row.get('Paragraph or Advice Text (Main Content Here)') or '').strip()
+    if not main_text:
+        return None  # skip rows without content
+
+    # Get the actionable advice from the Intervention Suggested column
+    actionable_advice = (row.get("Intervention Suggested (Actionable)") or "").strip()
+
+    # Combine the main text with the actionable advice if available
+    full_content = main_text
+    if actionable_advice:
+        # Add the actionable advice as a separate paragraph
+        full_content = f"{main_text}\n\nActionable Advice: {actionable_advice}"
+
+    return {
+        "title": (row.get("Title of Advice") or "").strip(),
+        "full_text": {
+            "content": full_content
+        },
+        "source": {
+            "type": (row.get("What type of source is this?") or "").strip(),
+            "name": (row.get("Source Name") or "").strip(),
+            "url": (row.get("Source URL ") or "").strip()
+        },
+        "tags": {
+            "Main Topic Entities": _split(row.get("Main Topic Entities") or ""),
+            "Sub-entities": _split(row.get("Sub-entities (If multiple other give as comma separated entries)") or ""),
+            "Age Range": _split(row.get("Child Age Range (check all applicable)") or ""),
+            "Guidance Style": _split(row.get("Guidance Style") or "")
+        },
+        "author": (row.get("Author") or "").strip(),
+        "credentials": (row.get("Credentials / Area of Expertise\ne.g. Ph.D. in Child Psychology, Licensed Clinical Psychologist") or "").strip(),
+        "temporal_context": (row.get("Temporal Context (Only add if relevant)") or "").strip(),
+        "scenario_notes": (row.get("What scenario would this be especially useful for? (e.g. tone, cultural fit, edge cases, or special considerations)") or "").strip(),
+        "actionable_advice": actionable_advice  # Also store it separately for direct access
+    }
+
+
+def convert_chunk(rows: List[Dict[str, str]], output_format: str = "jsonl"):
+    """Convert and serialize a chunk of rows; returns (record count, bytes to write)"""
+    records = [record for record in map(convert_row, rows) if record is not None]
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+    if output_format == "gzip":
+        return len(records), gzip.compress(lines, compresslevel=GZIP_LEVEL)
+    return len(records), lines
+
+
+def read_chunks(csv_path, chunk_size: int) -> Iterator[List[Dict[str, str]]]:
+    """Stream the CSV as lists of at most `chunk_size` rows"""
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
 
         # Print all column names to verify we're capturing everything
         print("CSV Columns:", reader.fieldnames)
 
+        chunk = []
         for row in reader:
-            main_text = row['Paragraph or Advice Text (Main Content Here)'].strip()
-            if not main_text:
-                continue  # skip rows without content
-
-            # Get the actionable advice from the Intervention Suggested column
-            actionable_advice = row.get("Intervention Suggested (Actionable)", "").strip()
-
-            # Combine the main text with the actionable advice if available
-            full_content = main_text
-            if actionable_advice:
-                # Add the actionable advice as a separate paragraph
-                full_content = f"{main_text}\n\nActionable Advice: {actionable_advice}"
-
-            data = {
-                "title": row["Title of Advice"].strip(),
-                "full_text": {
-                    "content": full_content
-                },
-                "source": {
-                    "type": row.get("What type of source is this?", "").strip(),
-                    "name": row.get("Source Name", "").strip(),
-                    "url": row.get("Source URL ", "").strip()
-                },
-                "tags": {
-                    "Main Topic Entities": [e.strip() for e in row.get("Main Topic Entities", "").split(",") if e.strip()],
-                    "Sub-entities": [s.strip() for s in row.get("Sub-entities (If multiple other give as comma separated entries)", "").split(",") if s.strip()],
-                    "Age Range": [a.strip() for a in row.get("Child Age Range (check all applicable)", "").split(",") if a.strip()],
-                    "Guidance Style": [g.strip() for g in row.get("Guidance Style", "").split(",") if g.strip()]
-                },
-                "author": row.get("Author", "").strip(),
-                "credentials": row.get("Credentials / Area of Expertise\ne.g. Ph.D. in Child Psychology, Licensed Clinical Psychologist", "").strip(),
-                "temporal_context": row.get("Temporal Context (Only add if relevant)", "").strip(),
-                "scenario_notes": row.get("What scenario would this be especially useful for? (e.g. tone, cultural fit, edge cases, or special considerations)", "").strip(),
-                "actionable_advice": actionable_advice  # Also store it separately for direct access
-            }
-
-            json.dump(data, jsonlfile, ensure_ascii=False)
-            jsonlfile.write('\n')
-
-    print(f"✅ Converted CSV to JSONL at {jsonl_path}")
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _converted_chunks(chunks, output_format: str, workers: int):
+    """Yield converted chunks in input order, keeping at most 2x`workers` chunks in flight"""
+    if workers <= 1:
+        for chunk in chunks:
+            yield convert_chunk(chunk, output_format)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(convert_chunk, chunk, output_format))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def convert_csv(csv_path, output_path, output_format: str = None, chunk_size: int = 5000, workers: int = 1) -> int:
+    """
+    Convert a CSV export to JSONL, optionally gzip-compressed.
+
+    Args:
+        csv_path: Form export to read
+        output_path: File to write
+        output_format: "jsonl" or "gzip"; inferred from the output suffix when omitted
+        chunk_size: Rows converted (and compressed) per chunk
+        workers: Processes used to convert chunks in parallel
+
+    Returns:
+        int: Number of records written
+    """
+    if output_format is None:
+        output_format = "gzip" if str(output_path).endswith(".gz") else "jsonl"
+
+    start_time = time.perf_counter()
+    total = 0
+
+    def payloads():
+        nonlocal total
+        for count, payload in _converted_chunks(read_chunks(csv_path, chunk_size), output_format, workers):
+            total += count
+            yield payload
+
+    with open(output_path, 'wb') as jsonlfile:
+        for payload in payloads():
+            jsonlfile.write(payload)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Converted {total} rows to {output_format.upper()} at {output_path} in {elapsed:.2f}s")
+    return total
+
+
+def convert_csv_to_jsonl(csv_path, jsonl_path):
+    return convert_csv(csv_path, jsonl_path, output_format="jsonl")
+
 
 if __name__ == "__main__":
-    convert_csv_to_jsonl(input_csv_path, output_jsonl_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert the advice CSV export into builder input")
+    parser.add_argument("input", nargs="?", default=input_csv_path, help="CSV file to convert")
+    parser.add_argument("output", nargs="?", default=output_jsonl_path, help="Output .jsonl or .jsonl.gz file")
+    parser.add_argument("--format", choices=["jsonl", "gzip"], default=None,
+                        help="Output format (defaults to the output file's suffix)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows converted per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Processes converting chunks in parallel")
+    args = parser.parse_args()
+
+    convert_csv(args.input, args.output, output_format=args.format, chunk_size=args.chunk_size, workers=args.workers)
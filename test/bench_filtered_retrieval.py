@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compare latency and result counts of unfiltered, post-filtered and pre-filtered retrieval
+
+Needs the same Neo4j/OpenAI environment as the deployed functions:
+    python test/bench_filtered_retrieval.py [--limit 5] [--repeat 3]
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+sys.path.append('functions')
+
+from get_auto_response.retriever_community import run_graphrag_retrieval
+
+QUERIES = [
+    "How do I handle toddler tantrums?",
+    "My 3-year-old won't go to sleep",
+    "How can I set limits without yelling?",
+    "Helping my child share with siblings",
+]
+
+# (age_filter, guidance_style) combinations, from broad to narrow
+FILTERS = [
+    ("2 years old", None),
+    (None, "Empathic / Supportive"),
+    ("5 years old", "Directive"),
+]
+
+
+def timed_retrieval(query, limit, **kwargs):
+    """Run one retrieval with its console output suppressed; returns (seconds, result count)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run_graphrag_retrieval(query=query, limit=limit, return_results=True, **kwargs)
+    return time.perf_counter() - start, len(results)
+
+
+def bench(limit, repeat):
+    rows = []
+    for age_filter, guidance_style in [(None, None)] + FILTERS:
+        modes = ["none"] if age_filter is None and guidance_style is None else ["postfilter", "prefilter"]
+        for mode in modes:
+            kwargs = {"age_filter": age_filter, "guidance_style": guidance_style,
+                      "filter_mode": "prefilter" if mode == "none" else mode}
+            latencies, counts = [], []
+            for query in QUERIES:
+                # First call warms the embedding cache and retriever; keep the rest
+                timed_retrieval(query, limit, **kwargs)
+                for _ in range(repeat):
+                    seconds, count = timed_retrieval(query, limit, **kwargs)
+                    latencies.append(seconds)
+                    counts.append(count)
+            rows.append((age_filter or "-", guidance_style or "-", mode,
+                         statistics.median(latencies) * 1000, statistics.mean(counts)))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark filtered vs unfiltered retrieval")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'age':<14} {'style':<24} {'mode':<11} {'p50 ms':>8} {'results':>8}")
+    for age, style, mode, p50, count in bench(args.limit, args.repeat):
+        print(f"{age:<14} {style:<24} {mode:<11} {p50:>8.1f} {count:>5.1f}/{args.limit}")
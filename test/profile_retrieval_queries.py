@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""PROFILE the old OPTIONAL MATCH retrieval query against the pattern-comprehension rewrite
+
+Runs both versions behind the same vector search for a fixed query set and
+records db hits, rows produced by all operators and server time. Needs the
+same Neo4j/OpenAI environment as the deployed functions:
+    python test/profile_retrieval_queries.py [--top-k 5] [--out profile.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+sys.path.append('functions')
+
+from ai_query.neo4j_graphrag_retriever import RETRIEVAL_QUERY, embedder, registry
+
+QUERIES = [
+    "How do I handle toddler tantrums?",
+    "My 3-year-old won't go to sleep",
+    "How can I set limits without yelling?",
+    "Helping my child share with siblings",
+    "How do I avoid passing on my insecurities to my child through my words?",
+]
+
+VECTOR_SEARCH = """
+CALL db.index.vector.queryNodes($vector_index_name, $top_k, $query_vector)
+YIELD node, score
+"""
+
+# The query as it was before the rewrite (anchored on `node` so both versions
+# expand the same Advice nodes and only the expansion strategy differs)
+LEGACY_RETRIEVAL_QUERY = """
+        WITH node AS a, score
+        WHERE a.name IS NOT NULL OR a.content IS NOT NULL
+        OPTIONAL MATCH (a)-[:HAS_TOPIC]->(topic:Topic)
+        OPTIONAL MATCH (a)-[:HAS_SUBTOPIC]->(subtopic:SubTopic)
+        OPTIONAL MATCH (a)-[:RECOMMENDED_FOR]->(age:AgeGroup)
+        OPTIONAL MATCH (a)-[:USES_STYLE]->(style:GuidanceStyle)
+        OPTIONAL MATCH (a)-[:HAS_ACTIONABLE_ADVICE]->(actionable:ActionableAdvice)
+        OPTIONAL MATCH (a)-[:HAS_SCENARIO_NOTE]->(scenario:ScenarioNote)
+        OPTIONAL MATCH (a)-[:WRITTEN_BY]->(author:Author)
+        WITH a,
+             collect(DISTINCT topic) AS topics,
+             collect(DISTINCT subtopic) AS subtopics,
+             collect(DISTINCT age) AS age_groups,
+             collect(DISTINCT style) AS guidance_styles,
+             collect(DISTINCT actionable) AS actionable_advice,
+             collect(DISTINCT scenario) AS scenario_notes,
+             collect(DISTINCT author) AS authors,
+             score
+        WITH a, topics, subtopics, age_groups, guidance_styles,
+             actionable_advice, scenario_notes, authors,
+             score
+                + CASE WHEN size(actionable_advice) > 0 THEN 0.2 ELSE 0 END
+                + CASE WHEN size(scenario_notes) > 0 THEN 0.1 ELSE 0 END AS final_score
+        RETURN
+            a.id AS id,
+            CASE WHEN a.content IS NOT NULL THEN a.content ELSE a.name END AS text,
+            [topic IN topics | topic.name] AS topics,
+            [subtopic IN subtopics | subtopic.name] AS subtopics,
+            [age IN age_groups | age.name] AS age_groups,
+            [style IN guidance_styles | style.name] AS guidance_styles,
+            [advice IN actionable_advice | CASE WHEN advice.content IS NOT NULL THEN advice.content ELSE advice.name END] AS actionable_advice,
+            [note IN scenario_notes | CASE WHEN note.name IS NOT NULL THEN note.name ELSE '' END] AS scenario_notes,
+            [author IN authors | author.name] AS authors,
+            final_score AS score
+        ORDER BY score DESC
+        LIMIT $top_k
+"""
+
+VERSIONS = {
+    "optional_match": LEGACY_RETRIEVAL_QUERY,
+    "pattern_comprehension": RETRIEVAL_QUERY,
+}
+
+
+def profile_totals(plan):
+    """Sum db hits and rows over every operator in a PROFILE plan tree"""
+    db_hits = plan.get("dbHits", 0)
+    rows = plan.get("rows", 0)
+    for child in plan.get("children", []):
+        child_hits, child_rows = profile_totals(child)
+        db_hits += child_hits
+        rows += child_rows
+    return db_hits, rows
+
+
+def profile_query(driver, cypher, parameters):
+    """Run `PROFILE cypher` and return db hits, operator rows, result rows and server ms"""
+    with driver.session(database=registry.database) as session:
+        result = session.run("PROFILE " + VECTOR_SEARCH + cypher, parameters)
+        records = list(result)
+        summary = result.consume()
+    db_hits, rows = profile_totals(summary.profile)
+    return {
+        "db_hits": db_hits,
+        "operator_rows": rows,
+        "results": len(records),
+        "ms": (summary.result_available_after or 0) + (summary.result_consumed_after or 0),
+    }
+
+
+def run(top_k, index_name="advice_embedding"):
+    measurements = {name: [] for name in VERSIONS}
+    for query in QUERIES:
+        parameters = {
+            "vector_index_name": index_name,
+            "top_k": top_k,
+            "query_vector": embedder.embed_query(query),
+        }
+        for name, cypher in VERSIONS.items():
+            # First run plans the query; profile the second so both use a cached plan
+            registry.run(lambda driver: profile_query(driver, cypher, parameters))
+            stats = registry.run(lambda driver: profile_query(driver, cypher, parameters))
+            measurements[name].append({"query": query, **stats})
+    return measurements
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PROFILE retrieval query versions")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--out", help="Write per-query measurements to this JSON file")
+    args = parser.parse_args()
+
+    measurements = run(args.top_k)
+
+    print(f"{'version':<22} {'db hits':>10} {'op rows':>10} {'ms p50':>8}")
+    for name, runs in measurements.items():
+        print(f"{name:<22} {statistics.mean(r['db_hits'] for r in runs):>10.0f} "
+              f"{statistics.mean(r['operator_rows'] for r in runs):>10.0f} "
+              f"{statistics.median(r['ms'] for r in runs):>8.1f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(measurements, f, indent=2)
+        print(f"\nPer-query measurements written to {args.out}")
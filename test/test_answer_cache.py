@@ -0,0 +1,31 @@
+"""Unit tests for the semantic answer cache's handling of KG versions."""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common.answer_cache import SemanticAnswerCache
+
+
+def test_hit_for_same_version_and_cleared_on_new_version():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("q", [1.0, 0.0], "answer", kg_version="v1")
+
+    assert cache.lookup([1.0, 0.01], kg_version="v1") == "answer"
+    assert cache.lookup([1.0, 0.0], kg_version="v2") is None
+    assert cache.lookup([1.0, 0.0], kg_version="v1") is None
+    assert cache.report()["invalidations"] == 1
+
+
+def test_unknown_version_bypasses_without_clearing():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("q", [1.0, 0.0], "answer", kg_version="v1")
+
+    # A failed version read neither serves, stores nor invalidates
+    assert cache.lookup([1.0, 0.0], kg_version=None) is None
+    cache.store("other", [0.0, 1.0], "other answer", kg_version=None)
+
+    assert cache.lookup([1.0, 0.0], kg_version="v1") == "answer"
+    report = cache.report()
+    assert report["entries"] == 1
+    assert report["invalidations"] == 0
+    assert report["unversioned"] == 1
@@ -0,0 +1,114 @@
+"""Unit tests for the prompt context packer, using an offline byte-level encoding."""
+import os
+import sys
+
+import pytest
+import tiktoken
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common import tokens
+from common.context_packer import TRUNCATION_MARKER, ContextPacker, format_turn
+
+# One token per byte and no merges, so every count is a byte length
+BYTE_ENCODING = tiktoken.Encoding(
+    "test-bytes",
+    pat_str=r"""\S+|\s+""",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+MARKER_TOKENS = len(TRUNCATION_MARKER.encode("utf-8"))
+
+
+@pytest.fixture(autouse=True)
+def byte_encoding(monkeypatch):
+    tokens.get_encoding.cache_clear()
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", lambda model: BYTE_ENCODING)
+    monkeypatch.setattr(tokens, "_counts", type(tokens._counts)())
+    yield
+    tokens.get_encoding.cache_clear()
+
+
+def turn(role, content):
+    return {"role": role, "content": content}
+
+
+def size(text):
+    return len(text.encode("utf-8"))
+
+
+def test_history_capped_at_share_dropping_oldest_first():
+    history = [turn("user", "1111"), turn("assistant", "2222"), turn("user", "3333")]
+    assert [size(format_turn(t)) for t in history] == [12, 12, 12]
+    packer = ContextPacker(budget=100, history_share=0.3, min_truncated_tokens=10)
+
+    packed = packer.pack([], history)
+
+    # 30 history tokens hold the two newest turns; 6 left is too few to truncate into
+    assert packed.history == history[1:]
+    assert packed.dropped == 1 and packed.truncated == 0
+    assert packed.tokens == 24
+
+
+def test_unused_history_share_goes_to_passages():
+    packer = ContextPacker(budget=100, history_share=0.5, min_truncated_tokens=10)
+    packed = packer.pack(["x" * 80], [turn("user", "hi")])
+
+    assert packed.passages == ["x" * 80]
+    assert packed.passage_tokens == 80
+    assert packed.tokens == 80 + size("Parent: hi")
+
+
+def test_truncates_only_when_enough_tokens_remain():
+    packer = ContextPacker(budget=50, history_share=0.0, min_truncated_tokens=10)
+
+    packed = packer.pack(["a" * 45, "b" * 20, "c" * 5])
+    assert packed.passages == ["a" * 45]
+    assert packed.dropped == 2 and packed.truncated == 0
+
+    packed = packer.pack(["a" * 30, "b" * 40, "c" * 5])
+    assert packed.passages == ["a" * 30, "b" * (20 - MARKER_TOKENS) + TRUNCATION_MARKER]
+    assert packed.dropped == 1 and packed.truncated == 1
+    assert packed.tokens == 50
+
+
+def test_truncated_history_turn_keeps_its_role():
+    packer = ContextPacker(budget=100, history_share=0.3, min_truncated_tokens=10)
+    packed = packer.pack([], [turn("assistant", "z" * 50)])
+
+    assert packed.truncated == 1
+    assert packed.history[0]["role"] == "assistant"
+    assert format_turn(packed.history[0]) == "Hestia: " + "z" * (30 - 8 - MARKER_TOKENS) + TRUNCATION_MARKER
+
+
+def test_turn_is_dropped_when_only_its_label_would_fit():
+    # 10 tokens left: enough to truncate into, but "Hestia: " plus the marker uses 12
+    packer = ContextPacker(budget=22, history_share=1.0, min_truncated_tokens=5)
+    history = [turn("assistant", "okay " * 7), turn("user", "why?")]
+    packed = packer.pack([], history)
+
+    assert packed.history == [turn("user", "why?")]
+    assert packed.dropped == 1 and packed.truncated == 0
+    assert packed.tokens == 12
+
+
+def test_truncation_that_grows_on_recount_is_shortened():
+    # Cutting "é" (two bytes) in half decodes to a three-byte replacement character
+    packer = ContextPacker(budget=21, history_share=0.0, min_truncated_tokens=5)
+    packed = packer.pack(["é" * 20])
+
+    assert packed.truncated == 1
+    assert packed.passages[0].endswith(TRUNCATION_MARKER)
+    assert packed.tokens == size(packed.passages[0]) <= 21
+
+
+@pytest.mark.parametrize("budget", [0, 7, 33, 48, 64, 101, 250])
+def test_result_stays_within_budget(budget):
+    passages = ["é" * 17, "word " * 9, "ü" * 31, "plain passage text"]
+    history = [turn("user", "ñ" * 13), turn("assistant", "okay " * 7), turn("user", "why?")]
+    packer = ContextPacker(budget=budget, history_share=0.35, min_truncated_tokens=5)
+
+    packed = packer.pack(passages, history)
+
+    assert packed.tokens <= budget
+    assert packed.passage_tokens == sum(size(p) for p in packed.passages)
+    assert packed.tokens == packed.passage_tokens + sum(size(format_turn(t)) for t in packed.history)
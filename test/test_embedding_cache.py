@@ -0,0 +1,208 @@
+"""Unit tests for the embedding cache tiers and batched embedding, with a fake clock and stubs."""
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import tiktoken
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+import pytest
+
+from common import embedding_cache, llm_clients, tokens
+from common.embedding_cache import CachedEmbedder, EmbeddingCache
+from common.llm_clients import PooledOpenAIEmbeddings
+
+class FakeTime:
+    """Stands in for the time module: monotonic and wall clock move together."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(embedding_cache, "time", fake)
+    return fake
+
+
+# One token per byte, so request sizes are easy to predict
+BYTE_ENCODING = tiktoken.Encoding(
+    "test-bytes",
+    pat_str=r"""\S+|\s+""",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+
+def key(text):
+    return EmbeddingCache.make_key("model", text)
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = EmbeddingCache(max_size=2, ttl=None)
+    cache.put(key("a"), [1.0])
+    cache.put(key("b"), [2.0])
+    assert cache.get(key("a")) == [1.0]
+    cache.put(key("c"), [3.0])
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == [1.0]
+    assert cache.get(key("c")) == [3.0]
+    assert cache.report()["size"] == 2
+
+
+def test_memory_entries_expire_after_ttl(clock):
+    cache = EmbeddingCache(max_size=2, ttl=10)
+    cache.put(key("a"), [1.0])
+    clock.now += 10
+    assert cache.get(key("a")) == [1.0]
+    clock.now += 1
+    assert cache.get(key("a")) is None
+    assert cache.report()["size"] == 0
+
+
+def test_disk_tier_survives_a_new_cache_and_keeps_its_age(clock, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(max_size=2, ttl=10, disk_path=path).put(key("How do I  handle tantrums?"), [1.0, 2.0])
+
+    clock.now += 8
+    cache = EmbeddingCache(max_size=2, ttl=10, disk_path=path)
+    assert cache.get(key("how do i handle tantrums?")) == [1.0, 2.0]
+    assert cache.report()["disk_hits"] == 1
+
+    # Promoted to memory with its disk age: it expires 10s after it was first stored
+    clock.now += 3
+    assert cache.get(key("how do i handle tantrums?")) is None
+    assert cache.report()["memory_hits"] == 0
+
+
+def test_expired_disk_rows_are_deleted(clock, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(max_size=2, ttl=10, disk_path=path)
+    cache.put(key("old"), [1.0])
+    cache.put(key("read"), [2.0])
+    clock.now += 5
+    cache.put(key("fresh"), [3.0])
+    clock.now += 6
+
+    # Expired on read
+    cache.clear()
+    assert cache.get(key("read")) is None
+
+    # Expired when the store is opened
+    EmbeddingCache(max_size=2, ttl=10, disk_path=path)
+    rows = cache.disk._conn.execute("SELECT query FROM embeddings ORDER BY query").fetchall()
+    assert rows == [("fresh",)]
+
+
+class StubEmbedder:
+    """Records each batch request and embeds a text as [its length]."""
+
+    def __init__(self):
+        self.requests = []
+
+    def embed_documents(self, texts):
+        self.requests.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_embed_documents_sends_one_request_for_uncached_texts():
+    stub = StubEmbedder()
+    embedder = CachedEmbedder(stub, "model", cache=EmbeddingCache())
+    embedder.cache.put(EmbeddingCache.make_key("model", "cached"), [9.0])
+
+    vectors = embedder.embed_documents(["a", "bb", "a", "cached"])
+
+    assert vectors == [[1.0], [2.0], [1.0], [9.0]]
+    assert stub.requests == [["a", "bb"]]
+
+
+def test_embed_documents_reuses_earlier_batches():
+    stub = StubEmbedder()
+    embedder = CachedEmbedder(stub, "model", cache=EmbeddingCache())
+    embedder.embed_documents(["a", "bb"])
+
+    assert embedder.embed_documents(["bb", "a"]) == [[2.0], [1.0]]
+    assert embedder.embed_documents([]) == []
+    assert stub.requests == [["a", "bb"]]
+
+
+class AsyncStubEmbedder:
+    """Counts query embeddings and embeds a text as [its length]."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def async_embed_query(self, text):
+        self.calls += 1
+        return [float(len(text))]
+
+
+def test_async_embed_query_reads_and_writes_disk_off_the_loop(tmp_path):
+    cache = EmbeddingCache(disk_path=str(tmp_path / "cache.sqlite"))
+    disk_threads = []
+    for name in ("get", "put"):
+        method = getattr(cache.disk, name)
+
+        def recorded(*args, _method=method):
+            disk_threads.append(threading.get_ident())
+            return _method(*args)
+
+        setattr(cache.disk, name, recorded)
+    stub = AsyncStubEmbedder()
+    embedder = CachedEmbedder(stub, "model", cache=cache)
+
+    async def run():
+        first = await embedder.async_embed_query("abc")
+        cache.clear()
+        second = await embedder.async_embed_query("ABC ")
+        return threading.get_ident(), first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first == second == [3.0]
+    assert stub.calls == 1
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 1}
+    # get (miss), put, get (hit), all on worker threads
+    assert len(disk_threads) == 3 and loop_thread not in disk_threads
+
+
+class StubEmbeddingsAPI:
+    """Records each embeddings.create input list and embeds a text as [its length]."""
+
+    def __init__(self):
+        self.requests = []
+        self.embeddings = SimpleNamespace(create=self.create)
+
+    def create(self, input, model, **kwargs):
+        self.requests.append(list(input))
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+def test_pooled_embed_documents_splits_requests_by_inputs_and_tokens(monkeypatch):
+    api = StubEmbeddingsAPI()
+    tokens.get_encoding.cache_clear()
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", lambda model: BYTE_ENCODING)
+    monkeypatch.setattr(llm_clients, "get_openai_client", lambda api_key=None: api)
+    monkeypatch.setattr(llm_clients, "EMBEDDING_BATCH_SIZE", 3)
+    monkeypatch.setattr(llm_clients, "EMBEDDING_BATCH_TOKENS", 10)
+    monkeypatch.setattr(llm_clients, "MAX_EMBEDDING_INPUT_TOKENS", 8)
+    embedder = PooledOpenAIEmbeddings(model="test-embedding", api_key="x")
+
+    try:
+        vectors = embedder.embed_documents(["a", "b", "c", "d", "eeeeee", "ffff", "g" * 20])
+    finally:
+        tokens.get_encoding.cache_clear()
+
+    # At most 3 inputs and 10 tokens per request; the long input is cut to 8 tokens
+    assert api.requests == [["a", "b", "c"], ["d", "eeeeee"], ["ffff"], ["g" * 8]]
+    assert vectors == [[1.0], [1.0], [1.0], [1.0], [6.0], [4.0], [8.0]]
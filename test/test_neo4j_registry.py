@@ -0,0 +1,40 @@
+"""Unit tests for the Neo4j registry's KG version memoization, without a database."""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common import neo4j_registry
+from common.neo4j_registry import Neo4jRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_failed_version_read_is_not_retried_until_the_interval_passes(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(neo4j_registry.time, "monotonic", clock)
+    registry = Neo4jRegistry("neo4j://unused", ("neo4j", "x"))
+    attempts = []
+
+    def unreachable(work):
+        attempts.append(clock.now)
+        raise OSError("connect timed out")
+
+    monkeypatch.setattr(registry, "run", unreachable)
+    assert registry.kg_version() is None
+    clock.now += neo4j_registry.KG_VERSION_RETRY_INTERVAL - 1
+    assert registry.kg_version() is None
+    assert len(attempts) == 1
+
+    clock.now += 1
+    monkeypatch.setattr(registry, "run", lambda work: "v2")
+    assert registry.kg_version() == "v2"
+    # A successful read is cached for max_age as before
+    monkeypatch.setattr(registry, "run", unreachable)
+    assert registry.kg_version() == "v2"
+    assert len(attempts) == 1
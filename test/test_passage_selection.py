@@ -0,0 +1,149 @@
+"""Unit tests for passage ordering, near-duplicate removal and selection, using an offline byte-level encoding."""
+import os
+import sys
+
+import pytest
+import tiktoken
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common import tokens
+from common.context_packer import ContextPacker
+from common.passage_selection import PassageSelector, drop_near_duplicates, order_by_score
+
+# One token per byte and no merges, so every count is a byte length
+BYTE_ENCODING = tiktoken.Encoding(
+    "test-bytes",
+    pat_str=r"""\S+|\s+""",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+TANTRUMS = "Stay calm and name the feeling when a toddler has a tantrum in public"
+SLEEP = "Keep the same bedtime routine every night so children fall asleep faster"
+
+
+@pytest.fixture(autouse=True)
+def byte_encoding(monkeypatch):
+    tokens.get_encoding.cache_clear()
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", lambda model: BYTE_ENCODING)
+    monkeypatch.setattr(tokens, "_counts", type(tokens._counts)())
+    yield
+    tokens.get_encoding.cache_clear()
+
+
+def result(id, text, score=0.5, embedding=None):
+    row = {"id": id, "text": text, "score": score}
+    if embedding is not None:
+        row["embedding"] = embedding
+    return row
+
+
+def ids(results):
+    return [r["id"] for r in results]
+
+
+def test_order_by_score_keeps_ties_in_retrieval_order():
+    results = [
+        result("a", "", 0.5), result("b", "", 0.9), result("c", "", 0.5),
+        result("d", "", None), result("e", "", 0.9),
+    ]
+    assert ids(order_by_score(results)) == ["b", "e", "a", "c", "d"]
+
+
+def test_embeddings_decide_when_both_results_have_them():
+    # Same text but orthogonal embeddings: not duplicates
+    kept, dropped = drop_near_duplicates([
+        result("a", TANTRUMS, embedding=[1.0, 0.0]),
+        result("b", TANTRUMS, embedding=[0.0, 1.0]),
+    ])
+    assert ids(kept) == ["a", "b"] and dropped == 0
+
+    # Different text but near-identical embeddings: the later one is dropped
+    kept, dropped = drop_near_duplicates([
+        result("a", TANTRUMS, embedding=[1.0, 0.0]),
+        result("b", SLEEP, embedding=[1.0, 0.01]),
+        result("c", SLEEP, embedding=[0.0, 1.0]),
+    ])
+    assert ids(kept) == ["a", "c"] and dropped == 1
+
+
+def test_shingles_decide_when_an_embedding_is_missing():
+    kept, dropped = drop_near_duplicates([
+        result("a", TANTRUMS, embedding=[1.0, 0.0]),
+        result("b", TANTRUMS.upper() + "!"),
+        result("c", SLEEP),
+    ])
+    assert ids(kept) == ["a", "c"] and dropped == 1
+
+    # A mixed pair with unrelated text stays, even though the other has a matching embedding
+    kept, dropped = drop_near_duplicates([
+        result("a", SLEEP),
+        result("b", TANTRUMS, embedding=[1.0, 0.0]),
+        result("c", TANTRUMS + " today", embedding=[0.0, 1.0]),
+    ], text_threshold=0.95)
+    assert ids(kept) == ["a", "b", "c"] and dropped == 0
+
+
+def test_thresholds_are_inclusive():
+    kept, _ = drop_near_duplicates(
+        [result("a", "x", embedding=[1.0, 0.0]), result("b", "y", embedding=[1.0, 0.0])],
+        embedding_threshold=1.0,
+    )
+    assert ids(kept) == ["a"]
+
+
+def format_passages(results):
+    return [f"Passage {i + 1}: {r['text']}" for i, r in enumerate(results)]
+
+
+def size(text):
+    return len(text.encode("utf-8"))
+
+
+def test_select_orders_dedupes_and_counts_saved_tokens():
+    calls = []
+
+    def recording_format(results):
+        calls.append(ids(results))
+        return format_passages(results)
+
+    selector = PassageSelector(ContextPacker(budget=1000, history_share=0.0))
+    results = [
+        result("sleep", SLEEP, 0.7),
+        result("dup", TANTRUMS, 0.5),
+        result("tantrums", TANTRUMS, 0.9),
+    ]
+
+    packed = selector.select(results, recording_format)
+
+    assert packed.passages == [f"Passage 1: {TANTRUMS}", f"Passage 2: {SLEEP}"]
+    assert packed.duplicates == 1
+    # Only the dropped passage is counted on top of the kept ones
+    assert packed.tokens_saved == size(f"Passage 1: {TANTRUMS}")
+    # Kept passages are formatted once, dropped ones separately
+    assert calls == [["tantrums", "sleep"], ["dup"]]
+
+    report = selector.report()
+    assert report["requests"] == 1 and report["passages_in"] == 3 and report["duplicates"] == 1
+    assert report["tokens_in"] == packed.passage_tokens + packed.tokens_saved
+    assert report["saved_rate"] == pytest.approx(packed.tokens_saved / report["tokens_in"], abs=1e-3)
+
+
+def test_tokens_saved_includes_budget_cuts():
+    selector = PassageSelector(ContextPacker(budget=60, history_share=0.0, min_truncated_tokens=10))
+    results = [result("tantrums", TANTRUMS, 0.9), result("sleep", SLEEP, 0.7)]
+
+    packed = selector.select(results, format_passages)
+
+    tokens_in = sum(size(p) for p in format_passages(results))
+    assert packed.duplicates == 0
+    assert packed.truncated == 1 or packed.dropped == 1
+    assert packed.passage_tokens <= 60
+    assert packed.tokens_saved == tokens_in - packed.passage_tokens
+
+
+def test_select_without_results():
+    selector = PassageSelector(ContextPacker(budget=100))
+    packed = selector.select([], format_passages)
+    assert packed.passages == [] and packed.tokens_saved == 0
+    assert selector.report()["saved_rate"] == 0.0
@@ -0,0 +1,103 @@
+"""Unit tests for the priority rate limiter, using a fake clock and a stub OpenAI client."""
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common import rate_limiter
+from common.rate_limiter import BACKGROUND, INTERACTIVE, RateLimiter, parse_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StubClient:
+    """Records chat completion requests and reports fixed token usage."""
+
+    def __init__(self, total_tokens):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.total_tokens = total_tokens
+
+    def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=self.total_tokens))
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_parse_limits():
+    assert parse_limits("gpt-4o=500:30000, ada=3000:") == {"gpt-4o": (500.0, 30000.0), "ada": (3000.0, None)}
+    assert parse_limits("") == {}
+
+
+def test_unlisted_model_is_not_throttled():
+    limiter = RateLimiter({}, clock=FakeClock())
+    for _ in range(100):
+        assert limiter.acquire("gpt-4o", 10_000).waited == 0
+    assert limiter.report()["interactive"]["granted"] == 100
+
+
+def test_interactive_calls_jump_ahead_of_background_calls():
+    clock = FakeClock()
+    # One request per minute; the first call empties the bucket
+    limiter = RateLimiter({"gpt-4o": (1, None)}, clock=clock, max_wait=0.01)
+    limiter.acquire("gpt-4o", 1)
+    order = []
+
+    def call(name, priority):
+        limiter.acquire("gpt-4o", 1, priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=call, args=(f"background-{i}", BACKGROUND)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: limiter.queue_depth("gpt-4o") == 2)
+    threads.append(threading.Thread(target=call, args=("chat", INTERACTIVE)))
+    threads[-1].start()
+    wait_for(lambda: limiter.queue_depth("gpt-4o") == 3)
+
+    for expected in range(1, 4):
+        clock.advance(60.0)
+        limiter.notify()
+        wait_for(lambda: len(order) == expected)
+    for thread in threads:
+        thread.join()
+
+    assert order == ["chat", "background-0", "background-1"]
+    report = limiter.report()
+    assert report["queue_depth"] == 0
+    assert report["background"]["max_waiting"] == 2
+    assert report["background"]["max_wait_seconds"] == 180.0
+    assert report["interactive"]["max_wait_seconds"] == 60.0
+
+
+def test_token_budget_is_settled_with_real_usage(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "count_message_tokens", lambda messages, model: 100)
+    limiter = RateLimiter({"gpt-4o": (None, 1200)}, clock=clock)
+    client = StubClient(total_tokens=150)
+
+    # Estimate is 100 prompt + 1000 completion tokens; the stub reports 150 used
+    limiter.chat_completion(client, model="gpt-4o", messages=[], max_tokens=1000)
+    budget = limiter._budgets["gpt-4o"].tokens
+    assert budget.level == 1200 - 150
+    assert client.requests[0]["max_tokens"] == 1000
+
+    # 1050 left covers another 1100-token estimate only after 50 tokens refill (2.5s at 20/s)
+    assert budget.delay(1100) == 2.5
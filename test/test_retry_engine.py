@@ -0,0 +1,115 @@
+"""Unit tests for the deadline-bounded retry engine, driven by a fake clock."""
+import asyncio
+import os
+import sys
+
+import httpx
+import openai
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common.retry import DeadlineExceeded, RetryEngine, is_retryable, retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+def api_error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("error", response=response, body=None)
+
+
+def make_engine(clock, **kwargs):
+    return RetryEngine(clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep, rand=lambda: 1.0, **kwargs)
+
+
+def flaky(errors, result="ok"):
+    errors = list(errors)
+
+    def fn(timeout):
+        if errors:
+            raise errors.pop(0)
+        return result
+    return fn
+
+
+def test_classification():
+    assert is_retryable(api_error(openai.RateLimitError, 429))
+    assert is_retryable(api_error(openai.InternalServerError, 503))
+    assert is_retryable(api_error(openai.APIStatusError, 408))
+    assert not is_retryable(api_error(openai.BadRequestError, 400))
+    assert not is_retryable(api_error(openai.AuthenticationError, 401))
+    assert not is_retryable(ValueError("bug"))
+
+
+def test_retry_after_headers():
+    assert retry_after(api_error(openai.RateLimitError, 429, {"retry-after": "7"})) == 7.0
+    assert retry_after(api_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(api_error(openai.RateLimitError, 429)) is None
+
+
+def test_backoff_doubles_and_honors_retry_after():
+    clock = FakeClock()
+    engine = make_engine(clock, base_delay=1.0, max_delay=8.0)
+    errors = [
+        api_error(openai.InternalServerError, 500),
+        api_error(openai.InternalServerError, 500),
+        api_error(openai.RateLimitError, 429, {"retry-after": "5"}),
+    ]
+    assert engine.call(flaky(errors)) == "ok"
+    assert clock.sleeps == [1.0, 2.0, 5.0]
+    report = engine.report()
+    assert report["attempts"] == 4 and report["retries"] == 3 and report["successes"] == 1
+
+
+def test_fatal_error_is_not_retried():
+    clock = FakeClock()
+    engine = make_engine(clock)
+    with pytest.raises(openai.BadRequestError):
+        engine.call(flaky([api_error(openai.BadRequestError, 400)]))
+    assert clock.sleeps == []
+    assert engine.report()["fatal_errors"] == 1
+
+
+def test_deadline_stops_retries_and_bounds_attempt_timeouts():
+    clock = FakeClock()
+    engine = make_engine(clock, deadline=10.0, base_delay=4.0, max_delay=4.0)
+    timeouts = []
+
+    def always_rate_limited(timeout):
+        timeouts.append(timeout)
+        raise api_error(openai.RateLimitError, 429)
+
+    with pytest.raises(DeadlineExceeded):
+        engine.call(always_rate_limited)
+    assert timeouts == [10.0, 6.0, 2.0]
+    assert clock.now < 10.0
+    assert engine.report()["deadline_exceeded"] == 1
+
+
+def test_async_entry_point():
+    clock = FakeClock()
+    engine = make_engine(clock, base_delay=1.0)
+    errors = [api_error(openai.RateLimitError, 429)]
+
+    async def fn(timeout):
+        if errors:
+            raise errors.pop(0)
+        return "done"
+
+    assert asyncio.run(engine.acall(fn)) == "done"
+    assert clock.sleeps == [1.0]
@@ -0,0 +1,63 @@
+"""Unit tests for the row identities and diffing used by incremental knowledge graph builds."""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from graphrag.kg_builder.row_identity import diff_rows, identify_rows, row_hash, row_identity
+
+
+def make_row(title="Bedtime routines", url="https://example.com/a", **extra):
+    return {"title": title, "source": {"url": url}, **extra}
+
+
+def test_row_identity_ignores_case_and_whitespace():
+    assert row_identity(make_row("Bedtime routines")) == row_identity(make_row("  bedtime\n ROUTINES "))
+    assert len(row_identity(make_row())) == 16
+
+
+def test_row_identity_depends_on_title_and_url():
+    base = row_identity(make_row())
+    assert row_identity(make_row(title="Screen time")) != base
+    assert row_identity(make_row(url="https://example.com/b")) != base
+    # Rows without a source dict still get an id
+    assert row_identity({"title": "Bedtime routines", "source": "n/a"}) == row_identity({"title": "Bedtime routines"})
+
+
+def test_row_hash_ignores_private_keys():
+    row = make_row(body="Keep it short")
+    stamped = dict(row, _source_id="x", _row_hash="y")
+    assert row_hash(row) == row_hash(stamped)
+    assert row_hash(row) != row_hash(make_row(body="Keep it shorter"))
+
+
+def test_identify_rows_suffixes_repeats_across_batches():
+    seen = {}
+    first = identify_rows([make_row(), make_row(title="Screen time")], seen)
+    second = identify_rows([make_row()], seen)
+    base = row_identity(make_row())
+    assert first[0]["_source_id"] == base
+    assert first[1]["_source_id"] == row_identity(make_row(title="Screen time"))
+    assert second[0]["_source_id"] == f"{base}-2"
+    assert first[0]["_row_hash"] == row_hash(make_row())
+
+
+def test_diff_rows_sorts_rows_into_changes():
+    added, updated, unchanged = identify_rows([
+        make_row(title="New"),
+        make_row(title="Edited", body="v2"),
+        make_row(title="Same", body="v1"),
+    ])
+    old_edited = identify_rows([make_row(title="Edited", body="v1")])[0]
+    existing = {
+        updated["_source_id"]: old_edited["_row_hash"],
+        unchanged["_source_id"]: unchanged["_row_hash"],
+        "gone": "hash",
+    }
+
+    diff = diff_rows([added, updated, unchanged], existing)
+    assert diff["added"] == [added]
+    assert diff["updated"] == [updated]
+    assert diff["unchanged"] == [unchanged]
+    assert diff["removed"] == ["gone"]
+
+    assert diff_rows([added, updated, unchanged], existing, detect_removed=False)["removed"] == []
@@ -0,0 +1,110 @@
+"""Unit tests for the rate-limited Firestore streaming writer, with a fake document and clock."""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common.streaming import StreamingMessageWriter
+
+FIELDS = {"sender": "assistant", "type": "text"}
+
+
+class FakeDocRef:
+    """Records set/update calls like a Firestore DocumentReference."""
+
+    def __init__(self):
+        self.calls = []
+
+    def set(self, data):
+        self.calls.append(("set", dict(data)))
+
+    def update(self, data):
+        self.calls.append(("update", dict(data)))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def timed_chunks(clock, chunks):
+    """Yield (seconds_elapsed_before, text) pairs, advancing the fake clock."""
+    for elapsed, text in chunks:
+        clock.now += elapsed
+        yield text
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def doc_ref():
+    return FakeDocRef()
+
+
+def test_first_chunk_creates_document(clock, doc_ref):
+    writer = StreamingMessageWriter(doc_ref, FIELDS, min_interval=1.0, clock=clock)
+    writer.write_stream(timed_chunks(clock, [(0.3, "Hello")]))
+    assert doc_ref.calls == [("set", {**FIELDS, "content": "Hello", "streaming": True})]
+    assert writer.stats["time_to_first_token"] == pytest.approx(0.3)
+
+
+def test_updates_at_most_once_per_interval(clock, doc_ref):
+    writer = StreamingMessageWriter(doc_ref, FIELDS, min_interval=1.0, clock=clock)
+    chunks = [(0.1, "a"), (0.4, "b"), (0.4, "c"), (0.3, "d"), (0.2, ""), (0.5, "e"), (0.6, "f")]
+    text = writer.write_stream(timed_chunks(clock, chunks))
+    assert text == "abcdef"
+    # Flushes at t=0.1 (first chunk), t=1.2 ("d") and t=2.3 ("f"); empty chunks are skipped
+    assert doc_ref.calls == [
+        ("set", {**FIELDS, "content": "a", "streaming": True}),
+        ("update", {"content": "abcd", "streaming": True}),
+        ("update", {"content": "abcdef", "streaming": True}),
+    ]
+    assert writer.stats["seconds"] == pytest.approx(2.5)
+
+
+def test_finalize_marks_reply_complete(clock, doc_ref):
+    writer = StreamingMessageWriter(doc_ref, FIELDS, min_interval=1.0, clock=clock)
+    text = writer.write_stream(timed_chunks(clock, [(0.1, "a"), (0.1, "b")]))
+    writer.finalize(text)
+    assert doc_ref.calls[-1] == ("update", {"content": "ab", "streaming": False})
+    assert writer.stats["writes"] == 2
+
+
+def test_finalize_without_chunks_creates_document(clock, doc_ref):
+    writer = StreamingMessageWriter(doc_ref, FIELDS, clock=clock)
+    writer.finalize(writer.write_stream([]))
+    assert doc_ref.calls == [("set", {**FIELDS, "content": "", "streaming": False})]
+
+
+def test_error_mid_stream_writes_partial_text(clock, doc_ref):
+    writer = StreamingMessageWriter(doc_ref, FIELDS, min_interval=1.0, clock=clock)
+
+    def failing():
+        yield from timed_chunks(clock, [(0.1, "par"), (0.1, "tial")])
+        raise ConnectionError("stream dropped")
+
+    with pytest.raises(ConnectionError):
+        writer.write_stream(failing())
+    assert doc_ref.calls == [
+        ("set", {**FIELDS, "content": "par", "streaming": True}),
+        ("update", {"content": "partial", "streaming": False}),
+    ]
+
+
+def test_error_before_first_chunk_writes_nothing(clock, doc_ref):
+    writer = StreamingMessageWriter(doc_ref, FIELDS, clock=clock)
+
+    def failing():
+        raise ConnectionError("stream dropped")
+        yield
+
+    with pytest.raises(ConnectionError):
+        writer.write_stream(failing())
+    assert doc_ref.calls == []
@@ -0,0 +1,64 @@
+"""Unit tests for the shared token counter, using an offline byte-level encoding."""
+import os
+import sys
+
+import pytest
+import tiktoken
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common import tokens
+
+# One token per byte, with a special token, so counts are easy to predict
+BYTE_ENCODING = tiktoken.Encoding(
+    "test-bytes",
+    pat_str=r"""\S+|\s+""",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={"<|endoftext|>": 256},
+)
+
+
+@pytest.fixture(autouse=True)
+def byte_encoding(monkeypatch):
+    calls = []
+
+    def encoding_for_model(model):
+        calls.append(model)
+        return BYTE_ENCODING
+
+    tokens.get_encoding.cache_clear()
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", encoding_for_model)
+    monkeypatch.setattr(tokens, "_counts", type(tokens._counts)())
+    yield calls
+    tokens.get_encoding.cache_clear()
+
+
+def test_encoding_resolved_once_per_model(byte_encoding):
+    for _ in range(3):
+        tokens.count_tokens("hello", "gpt-4o")
+        tokens.count_tokens("hello again", "gpt-4o")
+    tokens.count_tokens("hello", "gpt-4")
+    assert byte_encoding == ["gpt-4o", "gpt-4"]
+
+
+def test_special_token_text_is_counted_as_text():
+    assert tokens.count_tokens("<|endoftext|>") == len("<|endoftext|>")
+
+
+def test_batch_matches_single_counts():
+    texts = ["ab", "xyz", "ab", "", "longer text here"]
+    assert tokens.count_tokens_batch(texts) == [tokens.count_tokens(text) for text in texts]
+
+
+def test_every_message_is_counted_with_overhead():
+    messages = [
+        {"role": "system", "content": "abc"},
+        {"role": "user", "content": "hello", "name": "sam"},
+    ]
+    content = len("system") + len("abc") + len("user") + len("hello") + len("sam")
+    assert tokens.count_message_tokens(messages, "gpt-4o") == content + 3 * 2 + 1 + 3
+    assert tokens.count_message_tokens(messages, "gpt-3.5-turbo-0301") == content + 4 * 2 - 1 + 3
+
+
+def test_truncate_keeps_leading_tokens():
+    assert tokens.truncate_to_tokens("abcdef", 4) == "abcd"
+    assert tokens.truncate_to_tokens("abc", 4) == "abc"
@@ -0,0 +1,153 @@
+"""Unit tests for the in-memory Advice vector index and the memory-mapped KG snapshot."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions"))
+from common.kg_snapshot import KGSnapshot, write_snapshot
+from common.vector_index import InMemoryVectorIndex
+
+
+def make_corpus(n=40, dims=8, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(n, dims)).astype(np.float32)
+    rows = [
+        {
+            "id": f"advice-{i}",
+            "text": f"Advice {i}",
+            "actionable_advice": ["Do it"] if i % 3 == 0 else [],
+            "scenario_notes": ["At bedtime"] if i % 4 == 0 else [],
+        }
+        for i in range(n)
+    ]
+    return rows, embeddings
+
+
+def brute_force(rows, embeddings, query, top_k):
+    """Cosine top_k by similarity, then re-ordered by boosted score, like the Cypher query."""
+    matrix = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = matrix @ (query / np.linalg.norm(query))
+    nearest = np.argsort(-similarities)[:top_k]
+    scored = []
+    for i in nearest:
+        boost = (0.2 if rows[i]["actionable_advice"] else 0.0) + (0.1 if rows[i]["scenario_notes"] else 0.0)
+        scored.append((rows[i]["id"], (1 + similarities[i]) / 2 + boost))
+    return sorted(scored, key=lambda item: -item[1])
+
+
+def ids_and_scores(results):
+    return [(result["id"], result["score"]) for result in results]
+
+
+def assert_same_ranking(results, expected):
+    assert [row_id for row_id, _ in ids_and_scores(results)] == [row_id for row_id, _ in expected]
+    assert [score for _, score in ids_and_scores(results)] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+
+def test_exact_search_matches_brute_force():
+    rows, embeddings = make_corpus()
+    index = InMemoryVectorIndex(rows, embeddings)
+    query = np.random.default_rng(1).normal(size=8)
+
+    results = index.search(query, top_k=5)
+    assert_same_ranking(results, brute_force(rows, embeddings, query, 5))
+    assert "embedding" in results[0] and np.linalg.norm(results[0]["embedding"]) == pytest.approx(1.0)
+
+
+def test_boosts_applied():
+    rows = [
+        {"id": "plain", "actionable_advice": [], "scenario_notes": []},
+        {"id": "actionable", "actionable_advice": ["x"], "scenario_notes": []},
+        {"id": "both", "actionable_advice": ["x"], "scenario_notes": ["y"]},
+    ]
+    # Identical embeddings, so only the boosts separate the rows
+    index = InMemoryVectorIndex(rows, [[1.0, 0.0]] * 3)
+    results = index.search([1.0, 0.0], top_k=3)
+    assert ids_and_scores(results) == [
+        ("both", pytest.approx(1.3)),
+        ("actionable", pytest.approx(1.2)),
+        ("plain", pytest.approx(1.0)),
+    ]
+
+
+def test_empty_index():
+    index = InMemoryVectorIndex([], [])
+    assert len(index) == 0
+    assert index.search([1.0, 0.0], top_k=5) == []
+    assert InMemoryVectorIndex([], [], approximate=True).search([1.0, 0.0]) == []
+
+
+def test_top_k_larger_than_corpus():
+    rows, embeddings = make_corpus(n=4)
+    index = InMemoryVectorIndex(rows, embeddings)
+    query = np.ones(8)
+    results = index.search(query, top_k=10)
+    assert len(results) == 4
+    assert_same_ranking(results, brute_force(rows, embeddings, query, 4))
+    assert index.search(query, top_k=0) == []
+
+
+def test_mismatched_rows_rejected():
+    rows, embeddings = make_corpus(n=4)
+    with pytest.raises(ValueError):
+        InMemoryVectorIndex(rows[:3], embeddings)
+
+
+def test_normalized_embeddings_used_as_is():
+    rows, embeddings = make_corpus()
+    unit = np.ascontiguousarray(embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True), dtype=np.float32)
+    index = InMemoryVectorIndex(rows, unit, normalized=True)
+    assert np.shares_memory(index.matrix, unit)
+    query = np.random.default_rng(2).normal(size=8)
+    assert_same_ranking(index.search(query, top_k=5), brute_force(rows, embeddings, query, 5))
+
+
+def test_ivf_probing_every_cluster_equals_exact():
+    rows, embeddings = make_corpus(n=100)
+    exact = InMemoryVectorIndex(rows, embeddings)
+    approximate = InMemoryVectorIndex(rows, embeddings, approximate=True, nlist=6, nprobe=6)
+    assert approximate.centroids is not None and len(approximate.lists) == 6
+    for seed in range(5):
+        query = np.random.default_rng(10 + seed).normal(size=8)
+        assert ids_and_scores(approximate.search(query, top_k=7)) == \
+            [(row_id, pytest.approx(score)) for row_id, score in ids_and_scores(exact.search(query, top_k=7))]
+
+
+def test_snapshot_round_trip(tmp_path):
+    rows, embeddings = make_corpus(n=10)
+    path = str(tmp_path / "kg.hsnap")
+    header = write_snapshot(path, rows, embeddings, "v1")
+
+    snapshot = KGSnapshot.open(path)
+    assert snapshot.version == "v1"
+    assert snapshot.rows == rows
+    assert snapshot.header == header
+    assert header["embeddings_offset"] % 64 == 0
+    assert isinstance(snapshot.embeddings, np.memmap)
+    assert np.allclose(snapshot.embeddings, embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True))
+
+    query = np.random.default_rng(3).normal(size=8)
+    index = InMemoryVectorIndex(snapshot.rows, snapshot.embeddings, version=snapshot.version, normalized=True)
+    assert_same_ranking(index.search(query, top_k=3), brute_force(rows, embeddings, query, 3))
+
+
+def test_snapshot_empty_and_invalid(tmp_path):
+    path = str(tmp_path / "empty.hsnap")
+    write_snapshot(path, [], [], None)
+    snapshot = KGSnapshot.open(path)
+    assert snapshot.rows == [] and snapshot.embeddings.shape == (0, 0)
+
+    bogus = tmp_path / "bogus.hsnap"
+    bogus.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        KGSnapshot.open(str(bogus))
+
+    rows, embeddings = make_corpus(n=10)
+    truncated = str(tmp_path / "truncated.hsnap")
+    write_snapshot(truncated, rows, embeddings, "v1")
+    with open(truncated, "r+b") as f:
+        f.truncate(os.path.getsize(truncated) - 4)
+    with pytest.raises(ValueError):
+        KGSnapshot.open(truncated)